@@ -7,11 +7,13 @@ import gc
 import base64
 import time
 import tempfile
+import logging
 import yaml
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
+logger = logging.getLogger("DocumentSearchTool")
 # from crewai import Agent, Crew, Process, Task, LLM
 # from crewai.tasks.task_output import TaskOutput
 try:
@@ -23,6 +25,7 @@ from src.agentic_rag.tools.custom_tool import DocumentSearchTool
 from src.agentic_rag.crew import build_langgraph_workflow
 try:
     from src.agentic_rag.tools.chat_history import ChatHistoryStore
+    from src.agentic_rag.tools.qdrant_clients import run_async
 except Exception:
     ChatHistoryStore = None
 import pytesseract
@@ -327,7 +330,8 @@ if "chat_store" not in st.session_state:
         if ChatHistoryStore is not None:
             qdrant_url = os.getenv("QDRANT_URL2")
             qdrant_api_key = os.getenv("QDRANT_API_KEY2")
-            if qdrant_url:
+            # VECTOR_STORE=qdrant-local/numpy เก็บประวัติใน Qdrant แบบ embedded โดยไม่ต้องมี server
+            if qdrant_url or os.getenv("VECTOR_STORE", "qdrant").lower() != "qdrant":
                 st.session_state.chat_store = ChatHistoryStore(
                     collection_name="rag_chat_history",
                     qdrant_url=qdrant_url,
@@ -342,7 +346,7 @@ if "chat_store" not in st.session_state:
                 st.session_state.messages = st.session_state.chat_store.list_messages(st.session_state.session_id)
             else:
                 st.session_state.chat_store = None
-                st.info("Chat history disabled. Set QDRANT_URL2 to enable Qdrant-backed history.")
+                st.info("Chat history disabled. Set QDRANT_URL2 (or VECTOR_STORE=qdrant-local) to enable Qdrant-backed history.")
         else:
             st.session_state.chat_store = None
     except Exception as e:
@@ -391,6 +395,13 @@ def build_conversation_context(messages, max_turns=3):
     
     return "\n".join(context)
 
+def _report_save_result(future):
+    """done-callback ของการบันทึกประวัติแบบ async (ทำงานบน thread ของ I/O loop)"""
+    if future.cancelled():
+        logger.warning("บันทึกประวัติผู้ใช้ถูกยกเลิก")
+    elif future.exception() is not None:
+        logger.error(f"บันทึกประวัติผู้ใช้ไม่สำเร็จ: {future.exception()}")
+
 def reset_chat():
     """ล้างประวัติการสนทนา"""
     try:
@@ -565,11 +576,14 @@ if prompt:
     st.session_state.messages.append({"role": "user", "content": prompt})
     try:
         if st.session_state.get("chat_store"):
-            st.session_state.chat_store.add_message(
+            # บันทึกแบบ async บน I/O loop เบื้องหลัง ทำงานซ้อนกับการเรียก LLM ของ workflow
+            user_saved = run_async(st.session_state.chat_store.aadd_message(
                 session_id=st.session_state.session_id,
                 role="user",
                 content=prompt,
-            )
+                ts=time.time(),
+            ))
+            user_saved.add_done_callback(_report_save_result)
     except Exception as e:
         st.warning(f"บันทึกประวัติผู้ใช้ไม่สำเร็จ: {e}")
     with st.chat_message("user", avatar="👤"):
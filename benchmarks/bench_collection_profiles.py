@@ -0,0 +1,136 @@
+"""
+เปรียบเทียบ recall / latency / หน่วยความจำของ collection profile ใน config/collections.yaml
+(ต้องมี Qdrant server — โหมด embedded ไม่ใช้ HNSW และ quantization)
+
+    python benchmarks/bench_collection_profiles.py --url http://localhost:6333
+    python benchmarks/bench_collection_profiles.py --synthetic 100000 --dim 384 --force-index
+
+- recall@k เทียบกับการค้นหาแบบ exact (brute force) บน collection เดียวกัน
+- latency p50/p95 ของการค้นหาทีละคำถามด้วย search params ของ profile
+- RAM โดยประมาณของเวกเตอร์ (ต้นฉบับใน RAM หรือบนดิสก์ + ชุด quantized)
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, OptimizersConfigDiff, PointStruct, SearchParams, VectorParams
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agentic_rag.tools.collection_profiles import (  # noqa: E402
+    get_profile,
+    hnsw_config,
+    load_collection_config,
+    quantization_config,
+    search_params,
+)
+
+
+def knowledge_vectors(directory: str, limit: int) -> np.ndarray:
+    from agentic_rag.tools.chunking import iter_chunks
+    from agentic_rag.tools.embedder_registry import get_embedder
+    from agentic_rag.tools.pdf_extractor import iter_pdf_pages
+
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(".pdf"))
+    texts: List[str] = []
+    for chunk in iter_chunks(iter_pdf_pages(paths)):
+        texts.append(chunk["text"])
+        if len(texts) >= limit:
+            break
+    return np.asarray(get_embedder().encode_many(texts), dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 200), dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def estimated_ram(profile, count: int, dim: int) -> int:
+    original = 0 if profile["on_disk"] else count * dim * 4
+    quantization = (profile.get("quantization") or "none").lower()
+    quantized = {"scalar": count * dim, "binary": count * dim // 8}.get(quantization, 0)
+    return original + quantized
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recall/latency/memory trade-off of Qdrant collection profiles")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL") or "http://localhost:6333")
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_API_KEY"))
+    parser.add_argument("--profiles", nargs="+", default=None)
+    parser.add_argument("--knowledge", default="knowledge")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random clustered vectors instead of the PDFs")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--force-index", action="store_true", help="build HNSW even for small collections")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else knowledge_vectors(args.knowledge, args.chunks)
+    count, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, count, args.queries)] + 0.05 * rng.normal(size=(args.queries, dim))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    print(f"{count} vectors x {dim} dims, {args.queries} queries, recall@{args.k}")
+
+    client = QdrantClient(url=args.url, api_key=args.api_key)
+    profiles = args.profiles or list((load_collection_config().get("profiles") or {"default": {}}).keys())
+    print(f"{'profile':<10} {'build s':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'RAM MB':>7}")
+    for name in profiles:
+        profile = get_profile("bench", name)
+        collection = f"bench_profile_{name}"
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        hnsw = hnsw_config(profile)
+        optimizers = None
+        if args.force_index:
+            hnsw.full_scan_threshold = 1
+            optimizers = OptimizersConfigDiff(indexing_threshold=1)
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=profile["on_disk"]),
+            hnsw_config=hnsw,
+            quantization_config=quantization_config(profile),
+            on_disk_payload=profile["on_disk_payload"],
+            optimizers_config=optimizers,
+        )
+        started = time.perf_counter()
+        for start in range(0, count, 1000):
+            client.upsert(
+                collection_name=collection,
+                points=[
+                    PointStruct(id=start + i, vector=vector.tolist(), payload={"i": start + i})
+                    for i, vector in enumerate(vectors[start:start + 1000])
+                ],
+                wait=True,
+            )
+        while client.get_collection(collection).status.value != "green":
+            time.sleep(0.2)
+        build_seconds = time.perf_counter() - started
+
+        params = search_params(profile)
+        exact = SearchParams(exact=True)
+        hits, latencies = 0, []
+        for query in queries:
+            truth = {p.id for p in client.query_points(collection, query=query.tolist(), limit=args.k, search_params=exact).points}
+            started = time.perf_counter()
+            found = client.query_points(collection, query=query.tolist(), limit=args.k, search_params=params).points
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(truth & {p.id for p in found})
+        recall = hits / (args.k * len(queries))
+        print(
+            f"{name:<10} {build_seconds:>8.2f} {recall:>7.3f} {np.percentile(latencies, 50):>7.2f} "
+            f"{np.percentile(latencies, 95):>7.2f} {estimated_ram(profile, count, dim) / 2**20:>7.1f}"
+        )
+        client.delete_collection(collection)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
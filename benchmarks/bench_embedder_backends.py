@@ -0,0 +1,104 @@
+"""
+Parity check + benchmark ของ embedding backend (fp32 torch เทียบกับ ONNX int8) บนเอกสารใน knowledge/
+
+    python benchmarks/bench_embedder_backends.py --backends torch onnx-int8 --min-cosine 0.98
+
+- Parity: cosine ระหว่างเวกเตอร์ของแต่ละ backend กับ fp32 (ค่าต่ำสุดและค่าเฉลี่ย) และ
+  recall@5 ของการค้นหาด้วยคำถามตัวอย่าง; exit code 1 หากต่ำกว่า --min-cosine
+- Benchmark: sentences/sec ตอน ingest และ latency ของการ encode คำถามทีละประโยค (p50/p95)
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agentic_rag.tools.chunking import iter_chunks  # noqa: E402
+from agentic_rag.tools.embedding_backends import create_backend  # noqa: E402
+from agentic_rag.tools.pdf_extractor import iter_pdf_pages  # noqa: E402
+
+QUERIES = [
+    "ข้อมูลส่วนบุคคลคืออะไร",
+    "สิทธิของเจ้าของข้อมูลส่วนบุคคลมีอะไรบ้าง",
+    "ผู้ควบคุมข้อมูลส่วนบุคคลมีหน้าที่อย่างไร",
+    "การขอความยินยอมต้องทำอย่างไร",
+    "โทษทางอาญาตาม PDPA",
+    "การส่งข้อมูลไปต่างประเทศ",
+    "เจ้าหน้าที่คุ้มครองข้อมูลส่วนบุคคล",
+    "การแจ้งเหตุการละเมิดข้อมูลส่วนบุคคล",
+]
+
+
+def load_chunks(directory: str, limit: int) -> List[str]:
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(".pdf"))
+    texts = []
+    for chunk in iter_chunks(iter_pdf_pages(paths)):
+        texts.append(chunk["text"])
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare embedding backends for parity and speed")
+    parser.add_argument("--knowledge", default="knowledge")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx-int8"])
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    texts = load_chunks(args.knowledge, args.chunks)
+    print(f"{len(texts)} chunks from {args.knowledge}, model {args.model}")
+
+    reference = None
+    failed = False
+    print(f"{'backend':<10} {'load s':>7} {'sent/s':>8} {'q p50 ms':>9} {'q p95 ms':>9} {'cos min':>8} {'cos mean':>9} {'recall@5':>9}")
+    for name in dict.fromkeys(["torch", *args.backends]):
+        started = time.perf_counter()
+        backend = create_backend(args.model, name)
+        load_seconds = time.perf_counter() - started
+
+        backend.encode(texts[:8], batch_size=args.batch_size)  # warm-up
+        started = time.perf_counter()
+        doc_vectors = backend.encode(texts, batch_size=args.batch_size)
+        rate = len(texts) / (time.perf_counter() - started)
+
+        latencies = []
+        query_vectors = []
+        for query in QUERIES * 4:
+            started = time.perf_counter()
+            query_vectors.append(backend.encode([query])[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_vectors = np.stack(query_vectors[:len(QUERIES)])
+
+        if reference is None:
+            reference = (doc_vectors, query_vectors)
+        ref_docs, ref_queries = reference
+        cosine = (doc_vectors * ref_docs).sum(axis=1) / (
+            np.linalg.norm(doc_vectors, axis=1) * np.linalg.norm(ref_docs, axis=1)
+        )
+        ref_top = top_k(ref_queries, ref_docs, 5)
+        own_top = top_k(query_vectors, doc_vectors, 5)
+        recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(ref_top, own_top)])
+        print(
+            f"{name:<10} {load_seconds:>7.2f} {rate:>8.1f} {np.percentile(latencies, 50):>9.2f} "
+            f"{np.percentile(latencies, 95):>9.2f} {cosine.min():>8.4f} {cosine.mean():>9.4f} {recall:>9.2f}"
+        )
+        if cosine.min() < args.min_cosine:
+            failed = True
+            print(f"  parity FAILED: min cosine {cosine.min():.4f} < {args.min_cosine}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+วัด throughput ของ embedding service เมื่อมีผู้ใช้พร้อมกันหลายคน (encode คำถามทีละประโยค)
+
+    python -m agentic_rag.tools.embedding_service --port 8765 &
+    python benchmarks/bench_embedding_service.py --url http://127.0.0.1:8765 --clients 1 4 16 32
+
+เทียบ requests/sec และ latency p50/p95 เมื่อเพิ่มจำนวน client พร้อมกับขนาด batch เฉลี่ยของ server
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agentic_rag.tools.embedding_service import RemoteEmbedder  # noqa: E402
+
+QUERIES = [
+    "ข้อมูลส่วนบุคคลคืออะไร",
+    "สิทธิของเจ้าของข้อมูลส่วนบุคคลมีอะไรบ้าง",
+    "ผู้ควบคุมข้อมูลส่วนบุคคลมีหน้าที่อย่างไร",
+    "การขอความยินยอมต้องทำอย่างไร",
+]
+
+
+def run(url: str, clients: int, requests_per_client: int):
+    embedder = RemoteEmbedder(url)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n: int):
+        own = []
+        for i in range(requests_per_client):
+            # ข้อความไม่ซ้ำกัน เพื่อไม่ให้วัดแคช embedding ของ server
+            text = f"{QUERIES[i % len(QUERIES)]} #{n}-{i}-{time.time_ns()}"
+            started = time.perf_counter()
+            embedder.encode(text)
+            own.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test of the embedding service")
+    parser.add_argument("--url", default=os.getenv("EMBEDDING_SERVICE_URL") or "http://127.0.0.1:8765")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10}")
+    for clients in args.clients:
+        rate, p50, p95 = run(args.url, clients, args.requests)
+        stats = RemoteEmbedder(args.url)._request("GET", "/health")["stats"]
+        print(f"{clients:>7} {rate:>8.1f} {p50:>8.2f} {p95:>8.2f} {stats['avg_batch_texts']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+เปรียบเทียบคุณภาพการค้นหาแบบ dense / sparse (BM25) / hybrid (RRF) บนเอกสารใน knowledge/
+
+    python benchmarks/bench_retrieval_modes.py --k 3 5
+
+คำถามสร้างจากเลขมาตราที่พบในเอกสาร ("มาตรา 26") และถือว่า hit เมื่อ chunk ที่ได้มีข้อความ
+"มาตรา 26" อยู่จริง รายงาน hit@k, จำนวนตัวอักษรของ context ที่ต้องส่งให้ LLM และ latency
+(ใช้ NumpyVectorStore ใน process จึงไม่ต้องมี Qdrant server)
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agentic_rag.tools.chunking import iter_chunks  # noqa: E402
+from agentic_rag.tools.embedder_registry import get_embedder  # noqa: E402
+from agentic_rag.tools.pdf_extractor import iter_pdf_pages  # noqa: E402
+from agentic_rag.tools.vector_store import NumpyVectorStore  # noqa: E402
+
+ARTICLE = re.compile(r"มาตรา\s*(\d+)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="hit@k of dense vs BM25 vs hybrid retrieval on article queries")
+    parser.add_argument("--knowledge", default="knowledge")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.knowledge, f) for f in os.listdir(args.knowledge) if f.lower().endswith(".pdf"))
+    chunks = [dict(chunk, id=i) for i, chunk in enumerate(iter_chunks(iter_pdf_pages(paths)))]
+    articles = sorted({int(n) for chunk in chunks for n in ARTICLE.findall(chunk["text"])})[:args.queries]
+    if not articles:
+        print("No article references (มาตรา N) found in the documents")
+        return 1
+    print(f"{len(chunks)} chunks, {len(articles)} article queries")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = NumpyVectorStore("bench_modes", get_embedder(), directory=directory)
+        store.add_many(chunks)
+        print(f"{'mode':<8} " + " ".join(f"{'hit@' + str(k):>7} {'chars@' + str(k):>9}" for k in args.k) + f" {'p50 ms':>7}")
+        for mode in ("dense", "sparse", "hybrid"):
+            os.environ["RETRIEVAL_MODE"] = mode
+            hits = {k: 0 for k in args.k}
+            chars = {k: 0 for k in args.k}
+            latencies = []
+            for article in articles:
+                started = time.perf_counter()
+                results = store.search(f"มาตรา {article}", limit=max(args.k))
+                latencies.append((time.perf_counter() - started) * 1000)
+                for k in args.k:
+                    top = results[:k]
+                    hits[k] += any(article in map(int, ARTICLE.findall(r["text"])) for r in top)
+                    chars[k] += sum(len(r["text"]) for r in top)
+            row = " ".join(f"{hits[k] / len(articles):>7.2f} {chars[k] / len(articles):>9.0f}" for k in args.k)
+            print(f"{mode:<8} {row} {np.percentile(latencies, 50):>7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
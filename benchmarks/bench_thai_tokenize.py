@@ -0,0 +1,109 @@
+"""
+Micro-benchmark ของ engine ตัดคำ pythainlp บนเอกสารใน knowledge/
+
+    python benchmarks/bench_thai_tokenize.py --engines newmm longest mm --pages 50
+
+รายงานความเร็ว (ตัวอักษร/วินาที) และความตรงกันของ token เทียบกับ engine อ้างอิง
+(ค่า F1 ของขอบเขตคำ) เพื่อใช้เลือก THAI_WORD_ENGINE ที่เร็วที่สุดและยังแม่นยำพอ
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List, Set, Tuple
+
+from pythainlp.util import reorder_vowels
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agentic_rag.tools.pdf_extractor import iter_pdf_pages  # noqa: E402
+from agentic_rag.tools.thai_text import build_tokenizer, process_thai_texts  # noqa: E402
+
+
+def load_pages(directory: str, limit: int) -> List[str]:
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(".pdf"))
+    pages = []
+    for record in iter_pdf_pages(paths):
+        # ตัดคำใหม่จากข้อความดิบ (ข้อความจาก extractor ผ่านการตัดคำมาแล้ว)
+        text = record["text"].replace(" ", "")
+        if text.strip():
+            pages.append(reorder_vowels(text))
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def boundaries(tokens: List[str]) -> Set[Tuple[int, int]]:
+    spans, pos = set(), 0
+    for token in tokens:
+        spans.add((pos, pos + len(token)))
+        pos += len(token)
+    return spans
+
+
+def f1(reference: List[List[str]], candidate: List[List[str]]) -> float:
+    hit = ref_total = cand_total = 0
+    for ref, cand in zip(reference, candidate):
+        ref_spans, cand_spans = boundaries(ref), boundaries(cand)
+        hit += len(ref_spans & cand_spans)
+        ref_total += len(ref_spans)
+        cand_total += len(cand_spans)
+    if not hit:
+        return 0.0
+    precision, recall = hit / cand_total, hit / ref_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare pythainlp word tokenizers on the knowledge PDFs")
+    parser.add_argument("--knowledge", default="knowledge")
+    parser.add_argument("--engines", nargs="+", default=["newmm", "longest", "mm", "attacut", "deepcut", "nercut"])
+    parser.add_argument("--reference", default="newmm")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    pages = load_pages(args.knowledge, args.pages)
+    total_chars = sum(len(p) for p in pages)
+    print(f"{len(pages)} pages, {total_chars} chars")
+
+    results = {}
+    for engine in dict.fromkeys([args.reference, *args.engines]):
+        try:
+            started = time.perf_counter()
+            tokenizer = build_tokenizer(engine)
+            load_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            tokens = [tokenizer.word_tokenize(p) for p in pages]
+            seconds = time.perf_counter() - started
+        except Exception as e:
+            print(f"{engine:<10} unavailable: {str(e).splitlines()[0]}")
+            continue
+        results[engine] = (tokens, load_seconds, seconds)
+
+    if args.reference not in results:
+        print(f"reference engine {args.reference} unavailable")
+        return 1
+    reference = results[args.reference][0]
+    print(f"{'engine':<10} {'load s':>8} {'tokenize s':>11} {'chars/s':>10} {'F1 vs ' + args.reference:>14}")
+    for engine, (tokens, load_seconds, seconds) in results.items():
+        rate = total_chars / seconds if seconds else float("inf")
+        print(f"{engine:<10} {load_seconds:>8.2f} {seconds:>11.2f} {rate:>10.0f} {f1(reference, tokens):>14.3f}")
+
+    # ผลของ batch API (ตัดประโยค + ตัดคำ ด้วย THAI_WORD_ENGINE ปัจจุบัน)
+    started = time.perf_counter()
+    process_thai_texts(pages, workers=1)
+    serial = time.perf_counter() - started
+    started = time.perf_counter()
+    process_thai_texts(pages, workers=1)
+    cached = time.perf_counter() - started
+    # worker process แต่ละตัวมี LRU ของตัวเอง จึงวัดแบบไม่มีแคช
+    started = time.perf_counter()
+    process_thai_texts(pages, workers=args.workers)
+    parallel = time.perf_counter() - started
+    print(f"process_thai_texts: serial {serial:.2f}s, {args.workers} workers {parallel:.2f}s, memoized {cached:.4f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
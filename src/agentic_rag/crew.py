@@ -4,6 +4,7 @@ from .tools.custom_tool import DocumentSearchTool
 from .tools.qdrant_storage import QdrantStorage, MyEmbedder
 from langgraph.graph import StateGraph
 import logging
+import threading
 from typing import Dict, Any
 # Security filter for guardrails
 from .tools.security_filter import SecurityFilter
@@ -24,9 +25,26 @@ except ImportError:
 OLLAMA_MODEL = "hf.co/scb10x/typhoon2.1-gemma3-4b-gguf:Q4_K_M"
 LLAMA_CPP_BASE_URL = "http://localhost:8080/v1"
 
+DEFAULT_PDF_PATH = os.path.join(os.path.dirname(__file__), '../../knowledge/pdpa.pdf')
+
 AGENTS_YAML = os.path.join(os.path.dirname(__file__), 'config', 'agents.yaml')
 TASKS_YAML = os.path.join(os.path.dirname(__file__), 'config', 'tasks.yaml')
 
+_default_tool = None
+_default_tool_lock = threading.Lock()
+
+
+def get_default_tool():
+    """
+    DocumentSearchTool สำรองสำหรับ retrieval_node เมื่อไม่มี pdf_tool
+    สร้างครั้งเดียวต่อ process แทนการสร้างใหม่ (และโหลดโมเดลใหม่) ทุกคำถาม
+    """
+    global _default_tool
+    with _default_tool_lock:
+        if _default_tool is None:
+            _default_tool = DocumentSearchTool(file_path=DEFAULT_PDF_PATH)
+        return _default_tool
+
 # Helper to call llama.cpp (OpenAI-compatible) LLM
 
 def call_llm(prompt, system=None):
@@ -123,7 +141,7 @@ def build_langgraph_workflow(pdf_tool=None, use_knowledge_base=True):
     def retrieval_node(state):
         progress_log = append_progress(state, "🟡 [LangGraph] กำลังค้นข้อมูล (Retrieving from PDF/Knowledge)...")
         query = state.get("query", "")  # ใช้ query เดิม ไม่ใช้ refined_question
-        tool = pdf_tool if pdf_tool else DocumentSearchTool(file_path=os.path.join(os.path.dirname(__file__), '../../knowledge/pdpa.pdf'))
+        tool = pdf_tool if pdf_tool else get_default_tool()
         retrieved = tool._run(query)
         try:
             print("\n===== DocumentSearchTool Result (truncated) =====")
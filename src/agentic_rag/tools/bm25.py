@@ -0,0 +1,246 @@
+import os
+import zlib
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .thai_text import get_tokenizer, tokenize
+
+logger = logging.getLogger("DocumentSearchTool")
+
+RETRIEVAL_MODES = ("dense", "hybrid", "sparse")
+# ชื่อ sparse vector ใน collection ของ Qdrant
+SPARSE_VECTOR_NAME = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# ค่าคงที่ของ reciprocal rank fusion: score = sum(1 / (RRF_K + rank))
+RRF_K = 60
+# จำนวนผู้สมัครจากแต่ละวิธี (dense / sparse) = limit * HYBRID_CANDIDATES ก่อนรวมอันดับ
+HYBRID_CANDIDATES = 4
+# เลขไทย -> เลขอารบิก ให้ "มาตรา ๒๖" ตรงกับ "มาตรา 26"
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+
+def get_retrieval_mode() -> str:
+    """
+    RETRIEVAL_MODE: "hybrid" (ค่าเริ่มต้น, dense + BM25 รวมด้วย RRF), "dense" หรือ "sparse"
+    """
+    mode = (os.getenv("RETRIEVAL_MODE") or "hybrid").strip().lower()
+    if mode not in RETRIEVAL_MODES:
+        logger.warning(f"Unknown RETRIEVAL_MODE {mode!r}, using hybrid")
+        return "hybrid"
+    return mode
+
+
+def _avg_doc_length() -> float:
+    try:
+        return max(1.0, float(os.getenv("BM25_AVG_DOC_LEN") or 200))
+    except ValueError:
+        return 200.0
+
+
+def term_id(term: str) -> int:
+    """
+    term -> id แบบ hash (crc32) คงที่ข้าม process จึงไม่ต้องเก็บ vocabulary
+    (ชนกันได้บ้างแต่กระทบคะแนนน้อยมาก)
+    """
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def terms(tokens: Iterable[str]) -> List[str]:
+    """
+    คำที่ใช้ทำ BM25: ตัดช่องว่าง/เครื่องหมาย แปลงเป็นตัวพิมพ์เล็กและเลขอารบิก
+    และเพิ่มคำคู่ "คำ ตัวเลข" (เช่น "มาตรา 26") เพื่อให้อ้างอิงเลขมาตราตรงตัว
+    """
+    words = [token.strip().lower().translate(THAI_DIGITS) for token in tokens]
+    words = [word for word in words if word and any(ch.isalnum() for ch in word)]
+    pairs = [f"{a} {b}" for a, b in zip(words, words[1:]) if b.isdigit() and not a.isdigit()]
+    return words + pairs
+
+
+def document_terms(text: str) -> Dict[int, int]:
+    """term id -> term frequency ของ chunk (ไม่ผ่าน cache ของ tokenize เพราะแต่ละ chunk ใช้ครั้งเดียว)"""
+    counts: Dict[int, int] = {}
+    for term in terms(get_tokenizer().word_tokenize(text)):
+        key = term_id(term)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def query_terms(text: str) -> List[int]:
+    return sorted({term_id(term) for term in terms(tokenize(text))})
+
+
+def document_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    """
+    ค่าฝั่งเอกสารสำหรับ sparse vector ของ Qdrant: ส่วน term frequency ของ BM25
+    (ความยาวเฉลี่ยใช้ค่าคงที่ BM25_AVG_DOC_LEN) ส่วน IDF ให้ Qdrant คำนวณด้วย Modifier.IDF
+    """
+    counts = document_terms(text)
+    length = sum(counts.values())
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / _avg_doc_length())
+    indices = sorted(counts)
+    return indices, [counts[i] * (BM25_K1 + 1) / (counts[i] + norm) for i in indices]
+
+
+def query_sparse_vector(text: str) -> Tuple[List[int], List[float]]:
+    indices = query_terms(text)
+    return indices, [1.0] * len(indices)
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict[str, Any]]],
+    limit: int,
+    key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    k: int = RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    รวมหลายอันดับ (payload dicts เรียงจากดีที่สุด) ด้วย reciprocal rank fusion
+    ไม่ขึ้นกับสเกลคะแนนของแต่ละวิธี chunk ที่ติดอันดับต้นทั้งสองวิธีจะได้อันดับดีที่สุด
+    """
+    key = key or (lambda payload: payload["id"] if "id" in payload else payload.get("text"))
+    scores: Dict[Any, float] = {}
+    payloads: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, payload in enumerate(ranking):
+            item = key(payload)
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+            payloads.setdefault(item, payload)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [payloads[item] for item in ranked[:limit]]
+
+
+class BM25Index:
+    """
+    Inverted index ใน process สำหรับ BM25 (ใช้โดย NumpyVectorStore)
+    - posting list เก็บเป็น array แบบ CSR: terms (uint32, เรียง), offsets, docs (int32), tfs (float32)
+    - เอกสารใหม่ต่อท้ายเป็นส่วนย่อยแล้วรวมเป็น CSR ครั้งเดียวตอนค้นหา
+    - การให้คะแนนอ่านเฉพาะ posting ของคำในคำถาม (vectorized) ไม่ไล่ทุก chunk
+    """
+
+    def __init__(self):
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self._terms = np.zeros(0, dtype=np.uint32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, texts: List[str]) -> None:
+        """เพิ่มเอกสารต่อท้าย (ตำแหน่ง len(self) เป็นต้นไป ตรงกับแถวของเวกเตอร์)"""
+        start = len(self)
+        term_ids: List[int] = []
+        docs: List[int] = []
+        tfs: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for offset, text in enumerate(texts):
+            counts = document_terms(text)
+            lengths[offset] = sum(counts.values())
+            term_ids.extend(counts)
+            docs.extend([start + offset] * len(counts))
+            tfs.extend(counts.values())
+        self.doc_lengths = np.concatenate([self.doc_lengths, lengths])
+        if term_ids:
+            self._pending.append((
+                np.asarray(term_ids, dtype=np.uint32),
+                np.asarray(docs, dtype=np.int32),
+                np.asarray(tfs, dtype=np.float32),
+            ))
+
+    def _postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """คืน (terms, docs, tfs) แบบ COO ของทุก posting"""
+        counts = np.diff(self._offsets)
+        parts = [(np.repeat(self._terms, counts), self._docs, self._tfs)] + self._pending
+        return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+    def _compact(self) -> None:
+        if not self._pending:
+            return
+        term_ids, docs, tfs = self._postings()
+        order = np.lexsort((docs, term_ids))
+        term_ids, self._docs, self._tfs = term_ids[order], docs[order], tfs[order]
+        self._terms, starts = np.unique(term_ids, return_index=True)
+        self._offsets = np.append(starts, len(term_ids)).astype(np.int64)
+        self._pending = []
+
+    def search(self, query: str, limit: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        BM25 ของเอกสารที่ mask เป็น True คืน [(ตำแหน่งเอกสาร, คะแนน)] เรียงจากมากไปน้อย
+        สถิติ (จำนวนเอกสาร, ความยาวเฉลี่ย) นับเฉพาะเอกสารที่ยังอยู่
+        """
+        self._compact()
+        if not len(self) or not limit:
+            return []
+        alive = mask if mask is not None else np.ones(len(self), dtype=bool)
+        n_docs = int(alive.sum())
+        if not n_docs:
+            return []
+        avg_length = max(float(self.doc_lengths[alive].mean()), 1.0)
+        matched_docs, matched_scores = [], []
+        for term in query_terms(query):
+            i = int(np.searchsorted(self._terms, term))
+            if i >= len(self._terms) or self._terms[i] != term:
+                continue
+            docs = self._docs[self._offsets[i]:self._offsets[i + 1]]
+            tfs = self._tfs[self._offsets[i]:self._offsets[i + 1]]
+            keep = alive[docs]
+            docs, tfs = docs[keep], tfs[keep]
+            if not len(docs):
+                continue
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / avg_length)
+            matched_docs.append(docs)
+            matched_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+        if not matched_docs:
+            return []
+        # รวมคะแนนเฉพาะเอกสารที่มีคำตรง (ไม่สร้าง array ขนาดทั้งคลัง)
+        candidates, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+        k = min(limit, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def remap(self, keep: np.ndarray) -> None:
+        """
+        เก็บเฉพาะเอกสารในตำแหน่ง keep (เรียงจากน้อยไปมาก) และเลื่อนตำแหน่งให้ตรงกับแถวใหม่
+        (ใช้ตอน NumpyVectorStore บีบอัดแถวที่ถูกลบ)
+        """
+        new_positions = np.full(len(self), -1, dtype=np.int64)
+        new_positions[keep] = np.arange(len(keep))
+        term_ids, docs, tfs = self._postings()
+        moved = new_positions[docs]
+        alive = moved >= 0
+        self.doc_lengths = self.doc_lengths[keep]
+        self._terms = np.zeros(0, dtype=np.uint32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._pending = [(term_ids[alive], moved[alive].astype(np.int32), tfs[alive])]
+        self._compact()
+
+    def save(self, path: str) -> None:
+        self._compact()
+        np.savez(
+            path,
+            doc_lengths=self.doc_lengths,
+            terms=self._terms,
+            offsets=self._offsets,
+            docs=self._docs,
+            tfs=self._tfs,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        with np.load(path) as data:
+            index.doc_lengths = data["doc_lengths"]
+            index._terms = data["terms"]
+            index._offsets = data["offsets"]
+            index._docs = data["docs"]
+            index._tfs = data["tfs"]
+        return index
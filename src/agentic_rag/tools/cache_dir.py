@@ -0,0 +1,11 @@
+import os
+
+
+def get_cache_dir(*parts: str) -> str:
+    """
+    โฟลเดอร์เก็บแคชถาวรบนดิสก์ (ตั้งค่าได้ด้วย RAG_CACHE_DIR) สร้างให้อัตโนมัติถ้ายังไม่มี
+    """
+    base = os.getenv("RAG_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "agentic_rag")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
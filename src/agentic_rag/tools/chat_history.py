@@ -1,8 +1,10 @@
 from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
 from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, VectorParams, Distance, PayloadSchemaType
 import uuid
 import time
+import asyncio
+
+from .qdrant_clients import get_async_qdrant_client, get_qdrant_client, on_io_loop
 
 
 class ChatHistoryStore:
@@ -10,11 +12,17 @@ class ChatHistoryStore:
     Simple Qdrant-backed chat history with a separate collection from vector DB.
     - Uses a tiny 1-dim dummy vector [0.0] for compatibility
     - Filters by session_id; sorts by timestamp client-side
+    - qdrant_url may be ":memory:" or "path:/dir", and VECTOR_STORE=qdrant-local/numpy
+      keeps history in the embedded Qdrant under QDRANT_PATH (no server round-trips)
+    - Sessions share one process-wide client per server (see qdrant_clients);
+      aadd_message / alist_messages use AsyncQdrantClient
     """
 
-    def __init__(self, collection_name: str, qdrant_url: str, qdrant_api_key: Optional[str] = None):
+    def __init__(self, collection_name: str, qdrant_url: Optional[str] = None, qdrant_api_key: Optional[str] = None):
         self.collection_name = collection_name
-        self.client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+        self.qdrant_url = qdrant_url
+        self.qdrant_api_key = qdrant_api_key
+        self.client = get_qdrant_client(qdrant_url, qdrant_api_key)
         self._ensure_collection()
 
     def _ensure_collection(self) -> None:
@@ -34,7 +42,7 @@ class ChatHistoryStore:
             # Index may already exist or server may not support; ignore
             pass
 
-    def add_message(self, session_id: str, role: str, content: str, ts: Optional[float] = None, extra: Optional[Dict[str, Any]] = None) -> None:
+    def _message_point(self, session_id: str, role: str, content: str, ts: Optional[float], extra: Optional[Dict[str, Any]]) -> PointStruct:
         payload: Dict[str, Any] = {
             "session_id": session_id,
             "role": role,
@@ -43,13 +51,24 @@ class ChatHistoryStore:
         }
         if extra:
             payload.update(extra)
-        point = PointStruct(
+        return PointStruct(
             id=str(uuid.uuid4()),
             vector=[0.0],
             payload=payload,
         )
+
+    def add_message(self, session_id: str, role: str, content: str, ts: Optional[float] = None, extra: Optional[Dict[str, Any]] = None) -> None:
+        point = self._message_point(session_id, role, content, ts, extra)
         self.client.upsert(collection_name=self.collection_name, points=[point])
 
+    async def aadd_message(self, session_id: str, role: str, content: str, ts: Optional[float] = None, extra: Optional[Dict[str, Any]] = None) -> None:
+        point = self._message_point(session_id, role, content, ts, extra)
+        aclient = get_async_qdrant_client(self.qdrant_url, self.qdrant_api_key)
+        if aclient is None:
+            await asyncio.to_thread(self.client.upsert, collection_name=self.collection_name, points=[point])
+        else:
+            await on_io_loop(aclient.upsert(collection_name=self.collection_name, points=[point]))
+
     def list_messages(self, session_id: str, limit: int = 500) -> List[Dict[str, Any]]:
         # Use scroll to fetch payloads by session_id
         flt = Filter(must=[FieldCondition(key="session_id", match=MatchValue(value=session_id))])
@@ -73,6 +92,28 @@ class ChatHistoryStore:
         all_payloads.sort(key=lambda x: x.get("ts", 0.0))
         return all_payloads[:limit] if limit else all_payloads
 
+    async def alist_messages(self, session_id: str, limit: int = 500) -> List[Dict[str, Any]]:
+        aclient = get_async_qdrant_client(self.qdrant_url, self.qdrant_api_key)
+        if aclient is None:
+            return await asyncio.to_thread(self.list_messages, session_id, limit)
+        flt = Filter(must=[FieldCondition(key="session_id", match=MatchValue(value=session_id))])
+        all_payloads: List[Dict[str, Any]] = []
+        next_page = None
+        while True:
+            points, next_page = await on_io_loop(aclient.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=flt,
+                with_payload=True,
+                with_vectors=False,
+                limit=min(256, limit - len(all_payloads)) if limit else 256,
+                offset=next_page,
+            ))
+            all_payloads.extend(p.payload for p in points if p.payload)
+            if not next_page or (limit and len(all_payloads) >= limit):
+                break
+        all_payloads.sort(key=lambda x: x.get("ts", 0.0))
+        return all_payloads[:limit] if limit else all_payloads
+
     def reset_session(self, session_id: str) -> None:
         flt = Filter(must=[FieldCondition(key="session_id", match=MatchValue(value=session_id))])
         self.client.delete(collection_name=self.collection_name, points_selector=flt)
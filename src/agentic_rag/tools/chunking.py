@@ -0,0 +1,120 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from chonkie import SemanticChunker
+
+logger = logging.getLogger("DocumentSearchTool")
+
+CHUNKER_MODEL = "minishlab/potion-base-8M"
+# จำนวนหน้าที่ส่งให้ thread pool แบ่ง chunk พร้อมกันในแต่ละรอบ (จำกัดหน่วยความจำของ streaming)
+CHUNK_WINDOW_PAGES = 16
+
+_chunker: Optional[SemanticChunker] = None
+_chunker_lock = threading.Lock()
+
+
+def get_chunk_workers() -> int:
+    """
+    จำนวน thread ที่ใช้แบ่ง chunk พร้อมกัน (ตั้งค่าได้ด้วย CHUNK_WORKERS)
+    """
+    try:
+        return max(1, int(os.getenv("CHUNK_WORKERS") or min(4, os.cpu_count() or 1)))
+    except ValueError:
+        return 1
+
+
+def get_chunker() -> SemanticChunker:
+    """
+    SemanticChunker หนึ่งตัวต่อ process (โหลดโมเดล embedding เพียงครั้งเดียว ใช้ร่วมกันทุก tool/เอกสาร)
+    """
+    global _chunker
+    if _chunker is None:
+        with _chunker_lock:
+            if _chunker is None:
+                logger.info(f"Loading semantic chunker model {CHUNKER_MODEL}")
+                _chunker = SemanticChunker(
+                    embedding_model=CHUNKER_MODEL,
+                    threshold=0.5,
+                    chunk_size=128,
+                    min_sentences=1
+                )
+    return _chunker
+
+
+def chunk_text(text: str) -> list:
+    """
+    แบ่งข้อความเป็น semantic chunks ด้วย chunker ที่ใช้ร่วมกันทั้ง process
+    """
+    return get_chunker().chunk(text)
+
+
+def chunk_page(record: Dict, chunk_fn: Callable[[str], list] = chunk_text) -> List[Dict]:
+    """
+    แบ่ง chunk ของหน้าเดียว พร้อมที่มา: ไฟล์, ช่วงหน้า และตำแหน่งตัวอักษรภายในหน้า
+    """
+    text = record["text"]
+    if not text.strip():
+        return []
+    chunks = []
+    cursor = 0
+    for chunk in chunk_fn(text):
+        chunk_str = chunk if isinstance(chunk, str) else getattr(chunk, "text", None)
+        if not chunk_str:
+            continue
+        start = getattr(chunk, "start_index", None)
+        if start is None:
+            # chunker ที่คืนเป็น string: หาตำแหน่งจากข้อความต้นฉบับ
+            found = text.find(chunk_str, cursor)
+            start = found if found >= 0 else cursor
+        end = getattr(chunk, "end_index", None) or start + len(chunk_str)
+        cursor = end
+        chunks.append({
+            "text": chunk_str,
+            "source": os.path.basename(record["source"]),
+            # เลขหน้าแบบเริ่มที่ 1 สำหรับการอ้างอิง (page records เริ่มที่ 0)
+            "page_start": record["page"] + 1,
+            "page_end": record["page"] + 1,
+            "char_start": start,
+            "char_end": end,
+        })
+    return chunks
+
+
+def iter_chunks(
+    pages: Iterable[Dict],
+    chunk_fn: Callable[[str], list] = chunk_text,
+    workers: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    แบ่ง chunk ของหลายหน้า/หลายเอกสารพร้อมกันด้วย thread pool (ผลลัพธ์เรียงตามลำดับหน้าเดิม)
+    รับ page records แบบ streaming เป็นช่วงละ CHUNK_WINDOW_PAGES หน้า
+    """
+    workers = workers or get_chunk_workers()
+    if workers <= 1:
+        for record in pages:
+            yield from chunk_page(record, chunk_fn)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunker") as pool:
+        window: List[Dict] = []
+        for record in pages:
+            window.append(record)
+            if len(window) >= CHUNK_WINDOW_PAGES:
+                for page_chunks in pool.map(lambda r: chunk_page(r, chunk_fn), window):
+                    yield from page_chunks
+                window = []
+        for page_chunks in pool.map(lambda r: chunk_page(r, chunk_fn), window):
+            yield from page_chunks
+
+
+def format_citation(chunk: Dict) -> str:
+    """
+    ข้อความอ้างอิงที่มาของ chunk เช่น "pdpa.pdf หน้า 3" หรือ "pdpa.pdf หน้า 3-4"
+    """
+    source = chunk.get("source", "")
+    start, end = chunk.get("page_start"), chunk.get("page_end")
+    if start is None:
+        return source
+    pages = f"{start}" if end in (None, start) else f"{start}-{end}"
+    return f"{source} หน้า {pages}"
@@ -0,0 +1,94 @@
+import os
+import fnmatch
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import yaml
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+)
+
+logger = logging.getLogger("DocumentSearchTool")
+
+COLLECTIONS_YAML = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "collections.yaml")
+
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "hnsw": {"m": 16, "ef_construct": 100},
+    "search": {"hnsw_ef": None},
+    "quantization": "none",
+    "on_disk": False,
+    "on_disk_payload": False,
+}
+
+
+@lru_cache(maxsize=1)
+def load_collection_config(path: str = COLLECTIONS_YAML) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Cannot read collection profiles {path}: {str(e)}")
+        return {}
+
+
+def get_profile(collection_name: str, profile_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Profile for a collection: explicit name, else COLLECTION_PROFILE, else the first
+    matching glob in collections.yaml. Unknown names fall back to the defaults.
+    """
+    config = load_collection_config()
+    profiles = config.get("profiles") or {}
+    name = profile_name or os.getenv("COLLECTION_PROFILE")
+    if not name:
+        for pattern, mapped in (config.get("collections") or {}).items():
+            if fnmatch.fnmatch(collection_name, pattern):
+                name = mapped
+                break
+    profile = profiles.get(name or "default")
+    if profile is None:
+        if name:
+            logger.warning(f"Unknown collection profile {name!r}, using defaults")
+        profile = {}
+    merged = dict(DEFAULT_PROFILE, **profile)
+    merged["name"] = name or "default"
+    return merged
+
+
+def hnsw_config(profile: Dict[str, Any]) -> HnswConfigDiff:
+    hnsw = profile.get("hnsw") or {}
+    return HnswConfigDiff(m=hnsw.get("m"), ef_construct=hnsw.get("ef_construct"))
+
+
+def quantization_config(profile: Dict[str, Any]):
+    kind = (profile.get("quantization") or "none").lower()
+    always_ram = profile.get("quantization_always_ram", True)
+    if kind == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+    return None
+
+
+def search_params(profile: Dict[str, Any]) -> Optional[SearchParams]:
+    search = profile.get("search") or {}
+    quantization = None
+    if quantization_config(profile) is not None:
+        quantization = QuantizationSearchParams(
+            rescore=search.get("rescore", True),
+            oversampling=search.get("oversampling"),
+        )
+    if search.get("hnsw_ef") is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=search.get("hnsw_ef"), quantization=quantization)
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from qdrant_client.http.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# Physical collections are named "<alias>__v<milliseconds>"; the alias keeps the stable name
+VERSION_SEPARATOR = "__v"
+DEFAULT_RETENTION = 1
+# Versions newer than the live one are builds in progress (or crashed builds);
+# gc only removes them once they are this old. Versions left behind by rollback()
+# are recorded in a sidecar and count as superseded instead.
+ORPHAN_GRACE_SECONDS = 3600
+
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_lock = threading.Lock()
+
+
+def get_retention() -> int:
+    """COLLECTION_RETENTION: superseded versions kept for rollback (default 1)"""
+    try:
+        return max(0, int(os.getenv("COLLECTION_RETENTION") or DEFAULT_RETENTION))
+    except ValueError:
+        return DEFAULT_RETENTION
+
+
+def build_lock(alias: str) -> threading.Lock:
+    """Serializes builds of one logical collection within the process"""
+    with _build_locks_lock:
+        return _build_locks.setdefault(alias, threading.Lock())
+
+
+def version_stamp(name: str) -> int:
+    return int(name.rsplit(VERSION_SEPARATOR, 1)[1])
+
+
+class CollectionVersions:
+    """
+    Blue/green versions of a logical collection behind a Qdrant alias.
+    - Readers and writers always use the alias name, so nothing changes for them on a swap
+    - A new version is built under a fresh physical name while the alias keeps serving
+      the old one; swap() repoints the alias in one atomic update_collection_aliases call
+    - gc() keeps the live version plus the newest `retention` superseded ones (for rollback)
+    - rollback() invalidates the corpus manifest and index checkpoint, which describe the
+      build that was live before, and records the abandoned version as superseded
+    A collection created before versioning (a physical collection named like the alias)
+    is replaced on the first swap; that one-time migration has a short gap between the
+    collection being dropped and the alias being created.
+    """
+
+    def __init__(self, client, alias: str):
+        self.client = client
+        self.alias = alias
+        self.prefix = f"{alias}{VERSION_SEPARATOR}"
+        self.state_path = os.path.join(get_cache_dir("collections"), f"{alias}.json")
+
+    def rolled_back(self) -> List[str]:
+        """Versions the alias was rolled back from"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return list(json.load(f).get("rolled_back", []))
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable collection state {self.state_path}: {str(e)}")
+            return []
+
+    def _save_rolled_back(self, names: List[str]) -> None:
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"alias": self.alias, "rolled_back": names}, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _aliases(self) -> Dict[str, str]:
+        return {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+
+    def current(self) -> Optional[str]:
+        """Physical collection the alias points to, or None when the alias does not exist"""
+        return self._aliases().get(self.alias)
+
+    def is_alias(self) -> bool:
+        return self.current() is not None
+
+    def versions(self) -> List[str]:
+        """Physical versions of this collection, oldest first"""
+        names = [c.name for c in self.client.get_collections().collections]
+        versions = []
+        for name in names:
+            if name.startswith(self.prefix):
+                try:
+                    version_stamp(name)
+                except ValueError:
+                    continue
+                versions.append(name)
+        return sorted(versions, key=version_stamp)
+
+    def new_version_name(self) -> str:
+        return f"{self.prefix}{int(time.time() * 1000)}"
+
+    def swap(self, version: str) -> Optional[str]:
+        """
+        Points the alias at `version` atomically and returns the previously live version.
+        """
+        previous = self.current()
+        operations = []
+        if previous is not None:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.alias)))
+        elif self.client.collection_exists(self.alias):
+            logger.warning(f"Replacing unversioned collection {self.alias} with alias -> {version}")
+            self.client.delete_collection(self.alias)
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=version, alias_name=self.alias)))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Alias {self.alias}: {previous or '-'} -> {version}")
+        return previous
+
+    def rollback(self) -> Optional[str]:
+        """
+        Swaps back to the newest version older than the live one; returns it (None if there is none).
+        The corpus manifest and index checkpoint are dropped, so the next sync re-indexes
+        the knowledge directory into the restored version instead of trusting state
+        recorded for the abandoned one.
+        """
+        from .corpus_index import invalidate_corpus_state
+
+        live = self.current()
+        if live is None:
+            return None
+        older = [name for name in self.versions() if version_stamp(name) < version_stamp(live)]
+        if not older:
+            return None
+        self.swap(older[-1])
+        self._save_rolled_back(sorted(set(self.rolled_back()) | {live}, key=version_stamp))
+        invalidate_corpus_state(self.alias)
+        return older[-1]
+
+    def gc(self, retention: Optional[int] = None) -> List[str]:
+        """
+        Deletes superseded versions (older than the live one, or rolled back from) beyond
+        the newest `retention` (COLLECTION_RETENTION) and abandoned builds older than
+        ORPHAN_GRACE_SECONDS. Never touches the live version.
+        """
+        retention = get_retention() if retention is None else retention
+        live = self.current()
+        if live is None:
+            return []
+        rolled_back = self.rolled_back()
+        now_ms = time.time() * 1000
+        superseded, removed = [], []
+        for name in self.versions():
+            if name == live:
+                continue
+            if version_stamp(name) < version_stamp(live) or name in rolled_back:
+                superseded.append(name)
+            elif now_ms - version_stamp(name) > ORPHAN_GRACE_SECONDS * 1000:
+                removed.append(name)
+        removed.extend(superseded[:max(0, len(superseded) - retention)])
+        for name in removed:
+            self.client.delete_collection(name)
+            logger.info(f"Deleted superseded collection version {name}")
+        # Rolled-back versions that are gone or older than the live one need no marker
+        remaining = [
+            name for name in rolled_back
+            if name in superseded and name not in removed and version_stamp(name) > version_stamp(live)
+        ]
+        if remaining != rolled_back:
+            self._save_rolled_back(remaining)
+        return removed
+
+    def describe(self) -> List[Dict]:
+        live = self.current()
+        rolled_back = self.rolled_back()
+        result = []
+        for name in self.versions():
+            try:
+                points = self.client.count(name, exact=False).count
+            except Exception:
+                points = None
+            result.append({
+                "name": name,
+                "live": name == live,
+                "rolled_back": name in rolled_back,
+                "points": points,
+                "created": version_stamp(name) / 1000,
+            })
+        return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .qdrant_clients import get_qdrant_client
+
+    parser = argparse.ArgumentParser(description="Inspect, roll back or garbage-collect versioned Qdrant collections")
+    parser.add_argument("alias", help="stable collection name, e.g. rag_doc_<hash>")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list versions and the live one")
+    sub.add_parser("rollback", help="point the alias back at the previous version (the next sync re-indexes into it)")
+    gc = sub.add_parser("gc", help="delete superseded versions")
+    gc.add_argument("--retention", type=int, help="superseded versions to keep (default COLLECTION_RETENTION)")
+    args = parser.parse_args(argv)
+
+    client = get_qdrant_client(os.getenv("QDRANT_URL", "http://localhost:6333"), os.getenv("QDRANT_API_KEY", None))
+    versions = CollectionVersions(client, args.alias)
+    if args.command == "list":
+        print(json.dumps(versions.describe(), indent=2))
+    elif args.command == "rollback":
+        restored = versions.rollback()
+        print(f"Alias {args.alias} -> {restored}" if restored else "No older version to roll back to")
+    elif args.command == "gc":
+        removed = versions.gc(args.retention)
+        print(f"Removed {len(removed)} version(s): {', '.join(removed) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import os
+import itertools
+import json
+import time
+import hashlib
+import uuid
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .cache_dir import get_cache_dir
+from .fingerprint import file_fingerprint
+from .index_checkpoint import get_index_checkpoint
+from .ingest_pipeline import run_ingestion
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# Namespace for deterministic point ids: uuid5(namespace, "<file fingerprint>:<chunk index>")
+POINT_ID_NAMESPACE = uuid.UUID("6f1c1a52-4c1e-4a8e-9a43-2f6f0b7e5d10")
+
+# 2: chunk payloads carry page_start/page_end/char_start/char_end
+MANIFEST_VERSION = 2
+
+
+def point_id_for(fingerprint: str, index: int) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{fingerprint}:{index}"))
+
+
+def manifest_path_for(collection_name: str) -> str:
+    return os.path.join(get_cache_dir("manifests"), f"{collection_name}.json")
+
+
+class CorpusIndex:
+    """
+    Manifest-driven, per-file incremental index of a knowledge directory.
+    - The manifest records each file's fingerprint and the point ids it owns
+    - sync() only ingests added/changed files and deletes points of changed/removed files
+    - Point ids are derived from (fingerprint, chunk index), so re-ingesting a file
+      after a crash overwrites its partial points instead of duplicating them
+    - New points of a changed file are written before the old ones are deleted,
+      so the file never disappears from search during an update
+    - Progress within a file is checkpointed (see IndexCheckpoint), so an interrupted
+      sync resumes that file after its last committed batch; the completion marker is
+      written once the first full sync has finished
+    - The manifest file is re-read when another process changed or removed it
+      (e.g. invalidate_corpus_state() after a rollback)
+    """
+
+    def __init__(self, directory: str, storage, manifest_path: Optional[str] = None):
+        self.directory = directory
+        self.storage = storage
+        self.manifest_path = manifest_path or manifest_path_for(storage.collection_name)
+        self._manifest_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watch = threading.Event()
+        self.manifest = self._load_manifest()
+        self.checkpoint = get_index_checkpoint(storage.collection_name)
+
+    def _empty_manifest(self) -> Dict:
+        return {"version": MANIFEST_VERSION, "collection": self.storage.collection_name, "files": {}}
+
+    def _load_manifest(self) -> Dict:
+        try:
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION and manifest.get("collection") == self.storage.collection_name:
+                return manifest
+        except FileNotFoundError:
+            self._manifest_mtime = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable corpus manifest {self.manifest_path}: {str(e)}")
+        return self._empty_manifest()
+
+    def _save_manifest(self) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    def _refresh_manifest(self) -> None:
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self.manifest = self._load_manifest()
+
+    def version(self) -> str:
+        """
+        Fingerprint of the indexed corpus (file names + content fingerprints);
+        changes whenever sync() adds, updates or removes a file.
+        """
+        files = self.manifest["files"]
+        signature = sorted((name, entry["fingerprint"]) for name, entry in files.items())
+        return hashlib.sha1(json.dumps(signature).encode("utf-8")).hexdigest()
+
+    def list_files(self) -> List[str]:
+        return sorted(f for f in os.listdir(self.directory) if f.lower().endswith(".pdf"))
+
+    def sync(self, chunks_for: Callable[[str], Iterable[Dict]], on_sync: Optional[Callable[[], None]] = None) -> Dict:
+        """
+        Brings the collection in line with the directory.
+        chunks_for(path) yields chunk dicts for one file (see ingest_pipeline.iter_page_chunks).
+        on_sync() is called at the start of each pass, under the sync lock (e.g. to reset per-sync reports).
+        Returns {"added": [...], "updated": [...], "removed": [...], "unchanged": n}.
+        """
+        with self._lock, self.checkpoint.lock:
+            if on_sync is not None:
+                on_sync()
+            self._refresh_manifest()
+            files = self.manifest["files"]
+            has_data = self.storage.has_data()
+            if files and not has_data:
+                # The collection was reset behind our back; the manifest no longer describes it
+                logger.warning("Corpus manifest exists but collection is empty, re-indexing all files")
+                self.manifest = self._empty_manifest()
+                files = self.manifest["files"]
+            untracked = not files and has_data
+            # Until a full sync has finished the collection is incomplete; later syncs
+            # keep the marker, since old points stay searchable until replaced
+            building = self.checkpoint.status() != "complete" or not files
+
+            summary = {"added": [], "updated": [], "removed": [], "unchanged": 0}
+            current = self.list_files()
+            for filename in current:
+                path = os.path.join(self.directory, filename)
+                fingerprint = file_fingerprint(path)
+                entry = files.get(filename)
+                if entry and entry["fingerprint"] == fingerprint:
+                    summary["unchanged"] += 1
+                    continue
+                started = time.time()
+                start = self.checkpoint.begin(f"{filename}:{fingerprint}", resume=has_data, building=building)
+                if start:
+                    logger.info(f"Resuming {filename} after chunk {start} (last checkpoint)")
+                # Points before the checkpoint are already applied; their ids are deterministic
+                point_ids: List[str] = [point_id_for(fingerprint, i) for i in range(start)]
+                checkpointed_write = self.checkpoint.writer(self.storage, start)
+
+                def write_batch(batch: List[Dict]) -> int:
+                    point_ids.extend(chunk["id"] for chunk in batch)
+                    return checkpointed_write(batch)
+
+                chunks = chunks_for(path)
+                try:
+                    run_ingestion(
+                        itertools.islice(chunks, start, None) if start else chunks,
+                        write_batch,
+                        assign_id=lambda i, fp=fingerprint, offset=start: point_id_for(fp, offset + i),
+                    )
+                finally:
+                    # All new points must be applied before old ones are deleted
+                    self.storage.flush()
+                stale_ids = set(entry["point_ids"]) - set(point_ids) if entry else set()
+                if stale_ids:
+                    self.storage.delete_points(list(stale_ids))
+                elif untracked:
+                    # No manifest for an existing collection: drop whatever this file had before
+                    self.storage.delete_where({"source": filename}, keep_ids=point_ids)
+                files[filename] = {
+                    "fingerprint": fingerprint,
+                    "size": os.path.getsize(path),
+                    "indexed_at": time.time(),
+                    "point_ids": point_ids,
+                }
+                self._save_manifest()
+                self.checkpoint.finish_unit()
+                summary["updated" if entry else "added"].append(filename)
+                logger.info(f"Indexed {filename}: {len(point_ids)} chunks in {time.time() - started:.2f}s")
+
+            for filename in [f for f in files if f not in current]:
+                self.storage.delete_points(files[filename]["point_ids"])
+                del files[filename]
+                self._save_manifest()
+                summary["removed"].append(filename)
+                logger.info(f"Removed {filename} from collection {self.storage.collection_name}")
+
+            changed = summary["added"] or summary["updated"] or summary["removed"]
+            if building or changed:
+                self.checkpoint.mark_complete(self.version(), sum(len(entry["point_ids"]) for entry in files.values()))
+            if changed:
+                logger.info(f"Corpus sync: {summary}")
+            return summary
+
+    def rebuild(self, chunks_for: Callable[[str], Iterable[Dict]]) -> Dict:
+        """
+        Re-indexes every file into a fresh collection version (see VectorStore.rebuild):
+        a staging CorpusIndex syncs the directory into the new version while the live one
+        keeps serving, then the manifest is replaced with the staging one after the swap.
+        Watcher syncs wait until the rebuild has finished.
+        """
+        with self._lock:
+            staged: Dict = {}
+
+            def populate(store) -> None:
+                staging = CorpusIndex(self.directory, store, manifest_path=f"{self.manifest_path}.staging")
+                try:
+                    staged["summary"] = staging.sync(chunks_for)
+                    staged["files"] = staging.manifest["files"]
+                finally:
+                    staging.checkpoint.clear()
+                    try:
+                        os.remove(staging.manifest_path)
+                    except FileNotFoundError:
+                        pass
+
+            self.storage.rebuild(populate)
+            self.manifest = self._empty_manifest()
+            self.manifest["files"] = staged["files"]
+            self._save_manifest()
+            self.checkpoint.mark_complete(self.version(), sum(len(entry["point_ids"]) for entry in staged["files"].values()))
+            return staged["summary"]
+
+    def _directory_signature(self) -> List:
+        signature = []
+        for filename in self.list_files():
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+                signature.append((filename, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                continue
+        return signature
+
+    def watch(
+        self,
+        chunks_for: Callable[[str], Iterable[Dict]],
+        interval: float = 10.0,
+        on_sync: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Polls the directory every `interval` seconds and runs sync() when a PDF is
+        added, removed or modified (hot reload). Runs in a daemon thread.
+        """
+        if self._watcher and self._watcher.is_alive():
+            return
+
+        def loop():
+            last = self._directory_signature()
+            while not self._stop_watch.wait(interval):
+                try:
+                    signature = self._directory_signature()
+                    if signature != last:
+                        self.sync(chunks_for, on_sync)
+                        last = signature
+                except Exception as e:
+                    logger.error(f"Error while syncing watched corpus {self.directory}: {str(e)}")
+
+        self._stop_watch.clear()
+        self._watcher = threading.Thread(target=loop, name=f"corpus-watch-{os.path.basename(self.directory)}", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching {self.directory} for changes every {interval}s")
+
+    def stop_watch(self) -> None:
+        self._stop_watch.set()
+
+
+def invalidate_corpus_state(collection_name: str) -> None:
+    """
+    Drops the manifest and index checkpoint of a collection whose alias was pointed at
+    another version (rollback): they describe the build that was live before, so the
+    next sync() treats the collection as untracked and re-indexes every file into it.
+    """
+    try:
+        os.remove(manifest_path_for(collection_name))
+    except FileNotFoundError:
+        pass
+    get_index_checkpoint(collection_name).clear()
+    logger.info(f"Invalidated corpus manifest and checkpoint of {collection_name}")
+
+
+_indexes: Dict[str, CorpusIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_corpus_index(directory: str, storage) -> CorpusIndex:
+    """
+    Returns the process-wide CorpusIndex for a collection, so concurrent sessions
+    share one manifest, one sync lock and at most one folder watcher.
+    """
+    with _indexes_lock:
+        index = _indexes.get(storage.collection_name)
+        if index is None:
+            index = CorpusIndex(directory, storage)
+            _indexes[storage.collection_name] = index
+        return index
@@ -1,24 +1,32 @@
 import os
+import json
 import warnings
-import pdfplumber
-import fitz  # PyMuPDF สำหรับอ่าน PDF
-import pytesseract
-from PIL import Image, ImageEnhance
-import io
-import cv2
 import numpy as np
-from typing import Type, List, Tuple, Optional, Dict
+from PIL import Image
+from typing import Type, List, Optional, Dict
 from pydantic import BaseModel, Field, ConfigDict
-from chonkie import SemanticChunker
-from pythainlp import word_tokenize, sent_tokenize
-from pythainlp.util import isthai, reorder_vowels
 from dotenv import load_dotenv
 import hashlib
 import time
 import gc
+import threading
+import itertools
 import traceback
 import logging
-from .qdrant_storage import QdrantStorage, MyEmbedder
+from .vector_store import create_vector_store, matches_filter
+from .embedder_registry import get_embedder
+from .pdf_extractor import iter_pdf_pages, preprocess_image, summarize_strategies
+from .thai_text import process_thai_text
+from .bm25 import BM25Index
+from .reranker import get_reranker, rerank_budget_ms, rerank_candidates
+from .result_selection import POOL_FACTOR, drop_vectors, select_chunks, selection_enabled
+from .semantic_cache import cache_metrics, get_semantic_cache
+from .result_cache import ResultCache, get_result_cache, result_cache_metrics
+from .ingest_pipeline import iter_page_chunks, run_ingestion
+from .chunking import chunk_text, format_citation
+from .corpus_index import get_corpus_index
+from .index_checkpoint import get_incomplete_policy, get_index_checkpoint
+from .fingerprint import file_fingerprint
 
 # กรอง Warning ที่ไม่จำเป็น (เช่นจาก library ภายนอก)
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -29,8 +37,8 @@ logger = logging.getLogger("DocumentSearchTool")
 
 load_dotenv()
 
-# หากจำเป็นให้กำหนด path ของ tesseract (ใน Windows ตัวอย่างเช่น)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# raw_text เก็บเพียงตัวอย่างข้อความช่วงต้นเอกสาร (ใช้ตรวจคีย์เวิร์ด) ไม่ใช่ข้อความทั้งหมด
+RAW_TEXT_PREVIEW_CHARS = 200_000
 
 class DocumentSearchToolInput(BaseModel):
     """
@@ -55,32 +63,21 @@ class DocumentSearchTool(object):
         self.file_path = file_path
         self.raw_text = ""
         self.chunks = []
+        self.lexical_index = BM25Index()  # inverted index ของ self.chunks สำหรับการค้นหาเมื่อไม่มี vector DB
+        self.extraction_report = []  # กลยุทธ์การสกัดรายหน้า (fitz / pdfplumber / ocr) ของการ ingest/sync รอบล่าสุด
+        self._report_lock = threading.Lock()  # thread ของ folder watcher เขียนรายงานพร้อมกับ thread หลักได้
         self.initialized = False
         self.use_vector_db = True  # เปิดใช้งาน vector database
         self.vector_db = None
-        # Use file content hash for collection name stability
-        if os.path.isdir(file_path):
-            # For directories, hash all file contents
-            content_hash = hashlib.md5()
-            for filename in sorted(os.listdir(file_path)):
-                if filename.lower().endswith('.pdf'):
-                    with open(os.path.join(file_path, filename), 'rb') as f:
-                        while True:
-                            chunk = f.read(8192)
-                            if not chunk:
-                                break
-                            content_hash.update(chunk)
-            self.file_hash = content_hash.hexdigest()
-        else:
-            # For single file, hash its content
-            with open(file_path, 'rb') as f:
-                content = f.read()
-            self.file_hash = hashlib.md5(content).hexdigest()
-        # เพิ่มตัวแปรสำหรับการจัดการแคชและ garbage collection
-        self.image_cache = {}  # เก็บภาพที่สกัดมาแล้วเพื่อใช้ซ้ำ
-        self.query_cache = {}  # เก็บผลลัพธ์การค้นหาเพื่อใช้ซ้ำ
-        self.last_cache_cleanup = time.time()
-        self.cache_ttl = 3600  # ระยะเวลาที่เก็บแคช (วินาที)
+        self.corpus_index = None
+        self.index_checkpoint = None  # ความคืบหน้า/เครื่องหมายว่า index เสร็จสมบูรณ์ของ collection
+        self._incomplete_warned = False
+        # Use file content hash for collection name stability (computed lazily, see file_hash)
+        self._file_hash = None
+        # รายงานการคัดผลลัพธ์ (MMR / adaptive k) ล่าสุดและยอดรวมตัวอักษร prompt ที่ประหยัดได้
+        self.last_selection = None
+        self.selection_stats = {"queries": 0, "chars_saved": 0}
+        # เพิ่มตัวแปรสำหรับการจัดการ garbage collection (แคชผลการค้นหาดู query_cache)
         self.last_gc_time = time.time()
         self.gc_interval = 300  # ระยะเวลาระหว่างการทำ garbage collection (วินาที)
         # ตรวจสอบว่าเป็นไฟล์หรือโฟลเดอร์
@@ -89,6 +86,27 @@ class DocumentSearchTool(object):
         #else:
         #    self._load_single_file()
 
+    @property
+    def file_hash(self) -> str:
+        """
+        คีย์ของ collection: ไฟล์เดียวใช้ MD5 ของเนื้อหา (ผ่านแคช stat จึงไม่อ่านไฟล์ซ้ำถ้าไม่เปลี่ยน)
+        โฟลเดอร์ใช้ path ของโฟลเดอร์ เนื้อหาแต่ละไฟล์ถูกติดตามโดย CorpusIndex
+        """
+        if self._file_hash is None:
+            if os.path.isdir(self.file_path):
+                self._file_hash = hashlib.md5(os.path.abspath(self.file_path).encode("utf-8")).hexdigest()
+            else:
+                self._file_hash = file_fingerprint(self.file_path, "md5")
+        return self._file_hash
+
+    @property
+    def query_cache(self) -> ResultCache:
+        """
+        แคชผลการค้นหาที่ใช้ร่วมกันทุก instance ของ collection เดียวกัน (LRU + TTL + จำกัดไบต์)
+        มีชั้น SQLite บนดิสก์ ผลที่อุ่นแล้วจึงอยู่รอดข้ามการ restart/deploy
+        """
+        return get_result_cache(f"query:{self.file_hash}")
+
     def _ensure_initialized(self):
         """
         Ensure the tool is initialized before use. This is called lazily on first search.
@@ -107,31 +125,31 @@ class DocumentSearchTool(object):
         """
         try:
             self._initialize_vector_db()
-            # Check if Qdrant already has data for this collection
-            if self.use_vector_db and self.vector_db and self.vector_db.has_data():
-                logger.info("Qdrant collection already has data, skipping all extraction and upload.")
-                self.initialized = True
-                return
-            all_text = []
-            for filename in os.listdir(self.file_path):
-                if filename.lower().endswith('.pdf'):
-                    file_path = os.path.join(self.file_path, filename)
-                    logger.info(f"Loading file: {filename}")
-                    # Force text extraction only for subfiles, avoid premature indexing
-                    temp_tool = DocumentSearchTool(file_path)
-                    temp_tool.use_vector_db = False
-                    temp_tool._ensure_initialized()
-                    if temp_tool.raw_text:
-                        all_text.append(temp_tool.raw_text)
-                        logger.info(f"Successfully loaded {filename} (bytes: {len(temp_tool.raw_text)})")
-                    else:
-                        logger.warning(f"No text extracted from {filename}")
-                    temp_tool.release_resources()
-            if all_text:
-                self.raw_text = "\n\n".join(all_text)
-                self._initialize_tool()
-            else:
+            if self.use_vector_db and self.vector_db:
+                try:
+                    # ซิงก์เฉพาะไฟล์ที่เพิ่ม/แก้ไข/ลบ ตาม manifest (ไม่มีอะไรเปลี่ยนก็ไม่ต้องสกัดใหม่)
+                    self.corpus_index = get_corpus_index(self.file_path, self.vector_db)
+                    self.corpus_index.sync(self._file_chunks, self._reset_report)
+                    watch_interval = float(os.getenv("KNOWLEDGE_WATCH_INTERVAL") or 0)
+                    if watch_interval > 0:
+                        self.corpus_index.watch(self._file_chunks, watch_interval, self._reset_report)
+                    self.initialized = self.vector_db.has_data()
+                    if not self.initialized:
+                        logger.error("No valid PDF files found in the directory")
+                    return
+                except Exception as e:
+                    logger.error(f"Error syncing knowledge directory with Qdrant: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    self.use_vector_db = False
+            paths = [
+                os.path.join(self.file_path, filename)
+                for filename in os.listdir(self.file_path)
+                if filename.lower().endswith('.pdf')
+            ]
+            if not paths:
                 logger.error("No valid PDF files found in the directory")
+                return
+            self._ingest(paths)
         except Exception as e:
             logger.error(f"Error loading directory: {str(e)}")
             logger.error(traceback.format_exc())
@@ -143,100 +161,190 @@ class DocumentSearchTool(object):
         try:
             if self.vector_db is None:
                 self._initialize_vector_db()
-            # Check if Qdrant already has data for this collection
-            if self.use_vector_db and self.vector_db and self.vector_db.has_data():
-                logger.info("Qdrant collection already has data, skipping extraction & indexing; will use existing vectors.")
-                self.initialized = True
+            if not (self.use_vector_db and self.vector_db):
+                self._ingest([self.file_path])
                 return
-            self.raw_text = self._extract_text()
-            if self.raw_text:
-                self._initialize_tool()
+            # ล็อกของ checkpoint ทำให้ session อื่นของ collection เดียวกันรอแทนการ index ซ้ำพร้อมกัน
+            with self.index_checkpoint.lock:
+                # Check if Qdrant already has data for this collection
+                has_data = self.vector_db.has_data()
+                status = self.index_checkpoint.status()
+                if has_data and status == "incomplete":
+                    progress = self.index_checkpoint.progress() or {}
+                    logger.warning(
+                        f"Collection {self.vector_db.collection_name} was not fully indexed "
+                        f"({progress.get('chunks', 0)} chunks checkpointed), resuming"
+                    )
+                elif has_data:
+                    if status == "unknown":
+                        logger.warning(
+                            f"Collection {self.vector_db.collection_name} has no completion marker "
+                            "(indexed before checkpoints), assuming it is complete"
+                        )
+                    logger.info("Qdrant collection already has data, skipping extraction & indexing; will use existing vectors.")
+                    self.initialized = True
+                    return
+                self._ingest([self.file_path], resume=has_data)
         except Exception as e:
             logger.error(f"Error loading single file: {str(e)}")
             logger.error(traceback.format_exc())
 
-    def _initialize_tool(self):
+    def _reset_report(self) -> None:
+        """เริ่มรายงานการสกัดใหม่ทุกรอบ ingest/sync เพื่อไม่ให้โตไม่สิ้นสุดบน tool ที่เปิดนาน"""
+        with self._report_lock:
+            self.extraction_report = []
+
+    def _iter_pages(self, paths: List[str]):
         """
-        เริ่มต้นเครื่องมือหลังจากโหลดเนื้อหา
+        ส่ง page records ต่อแบบ streaming พร้อมเก็บรายงานการสกัดและตัวอย่างข้อความ (raw_text) แบบจำกัดขนาด
+        """
+        for record in iter_pdf_pages(paths):
+            with self._report_lock:
+                self.extraction_report.append({k: v for k, v in record.items() if k != "text"})
+            if len(self.raw_text) < RAW_TEXT_PREVIEW_CHARS:
+                self.raw_text = (self.raw_text + record["text"])[:RAW_TEXT_PREVIEW_CHARS]
+            yield record
+
+    def _ingest(self, paths: List[str], resume: bool = False):
+        """
+        สกัด -> แบ่ง chunk -> embed -> upsert แบบ streaming ทีละ batch
+        หน่วยความจำสูงสุดไม่ขึ้นกับขนาดเอกสาร และค้นหาได้ตั้งแต่ batch แรกถูก index
+        บันทึก checkpoint ทุก INDEX_CHECKPOINT_EVERY batch; resume=True ข้าม chunk ที่ index แล้ว
+        (chunk ของไฟล์เดิมได้ลำดับเดิมเสมอ และ id ตามลำดับจึงเขียนทับจุดเดิม) และเขียนเครื่องหมายเสร็จตอนจบ
+        หากไม่มี vector DB จะเก็บ chunks ไว้ในหน่วยความจำสำหรับการค้นหาแบบ token
+        """
+        total = 0
+        self._reset_report()
+        self.raw_text = ""
+        if self.use_vector_db and self.vector_db:
+            try:
+                checkpoint = self.index_checkpoint
+                start = checkpoint.begin(self.file_hash, resume=resume)
+                if start:
+                    logger.info(f"Resuming indexing of {self.vector_db.collection_name} after chunk {start}")
+                chunks = iter_page_chunks(self._iter_pages(paths), self._create_chunks)
+                try:
+                    # upsert แบบไม่รอ (wait=False) ขนานกันระหว่าง embed batch ถัดไป แล้วรอครั้งเดียวตอนจบ
+                    stats = run_ingestion(
+                        itertools.islice(chunks, start, None) if start else chunks,
+                        checkpoint.writer(self.vector_db, start),
+                        start_id=start,
+                    )
+                finally:
+                    self.vector_db.flush()
+                total = start + stats["chunks"]
+                checkpoint.mark_complete(self.file_hash, total)
+                logger.info(f"Indexed {total} chunks in Qdrant vector database (collection: {self.vector_db.collection_name})")
+            except Exception as e:
+                logger.error(f"Error indexing chunks: {str(e)}")
+                logger.error(traceback.format_exc())
+                self.use_vector_db = False
+        if not self.use_vector_db:
+            # แคชข้อความรายหน้าทำให้การสกัดรอบนี้แทบไม่มีค่าใช้จ่าย
+            self._reset_report()
+            self.raw_text = ""
+            self.chunks = list(iter_page_chunks(self._iter_pages(paths), self._create_chunks))
+            # สร้าง inverted index ครั้งเดียวตอนแบ่ง chunk แทนการตัดคำทุก chunk ทุกคำถาม
+            self.lexical_index = BM25Index()
+            self.lexical_index.add([chunk["text"] for chunk in self.chunks])
+            total = len(self.chunks)
+        with self._report_lock:
+            report = list(self.extraction_report)
+        logger.info(f"Extraction strategies per page: {summarize_strategies(report)}")
+        if not total:
+            logger.warning("No chunks created from the text")
+            return
+        self.initialized = True
+        logger.info(f"DocumentSearchTool initialized successfully with {total} chunks")
+
+    def reindex(self) -> bool:
+        """
+        สร้าง index ใหม่ทั้งชุดแบบ blue/green (เช่นหลังเปลี่ยน COLLECTION_PROFILE หรือโมเดล embedding):
+        index ลง collection รุ่นใหม่ระหว่างที่รุ่นเดิมยังตอบคำถามได้ แล้วสลับ alias แบบ atomic
+        และลบรุ่นเก่าตาม COLLECTION_RETENTION การค้นหาระหว่างนั้นจึงไม่เจอผลว่างหรือข้อมูลไม่ครบ
         """
         try:
-            if not self.raw_text:
-                logger.warning("No text extracted from the document")
-                return
             if self.vector_db is None:
                 self._initialize_vector_db()
-            # Check if data already exists in Qdrant, skip chunk extraction and upload if so
-            if self.use_vector_db and self.vector_db and self.vector_db.has_data():
-                logger.info("Qdrant collection already has data, skipping chunk extraction and upload.")
-                self.initialized = True
-                return
-            # Only extract chunks if not already in Qdrant
-            self.chunks = self._create_chunks(self.raw_text)
-            if not self.chunks:
-                logger.warning("No chunks created from the text")
-                return
-            if self.use_vector_db:
-                self._index_chunks()
-            self.initialized = True
-            logger.info(f"DocumentSearchTool initialized successfully with {len(self.chunks)} chunks")
+            if not (self.use_vector_db and self.vector_db):
+                logger.error("Reindex requires a vector database")
+                return False
+            if os.path.isdir(self.file_path):
+                if self.corpus_index is None:
+                    self.corpus_index = get_corpus_index(self.file_path, self.vector_db)
+                self._reset_report()
+                self.corpus_index.rebuild(self._file_chunks)
+            else:
+                stats = {}
+
+                def populate(store) -> None:
+                    stats.update(run_ingestion(
+                        iter_page_chunks(self._iter_pages([self.file_path]), self._create_chunks),
+                        lambda batch: store.add_many(batch, wait=False),
+                    ))
+
+                with self.index_checkpoint.lock:
+                    self._reset_report()
+                    self.vector_db.rebuild(populate)
+                    self.index_checkpoint.mark_complete(self.file_hash, stats.get("chunks"))
+            self.initialized = self.vector_db.has_data()
+            logger.info(f"Reindexed {self.vector_db.collection_name} (generation {self.vector_db.generation})")
+            return self.initialized
         except Exception as e:
-            logger.error(f"Error initializing DocumentSearchTool: {str(e)}")
+            logger.error(f"Error in reindex: {str(e)}")
             logger.error(traceback.format_exc())
+            return False
+
+    def _file_chunks(self, path: str):
+        """
+        chunk dicts ของไฟล์เดียวแบบ streaming (ใช้โดย CorpusIndex)
+        """
+        return iter_page_chunks(self._iter_pages([path]), self._create_chunks)
 
     def _initialize_vector_db(self):
         """
         Initialize Qdrant vector database
         """
         try:
-            self.embedder = MyEmbedder("all-MiniLM-L6-v2")
-            self.vector_db = QdrantStorage(
+            # โมเดลถูกโหลดครั้งเดียวต่อ process และใช้ร่วมกันทุก tool/session
+            self.embedder = get_embedder("all-MiniLM-L6-v2")
+            # VECTOR_STORE เลือก Qdrant server, Qdrant แบบ embedded หรือ NumPy index ใน process
+            self.vector_db = create_vector_store(
                 type=f"doc_{self.file_hash}",
                 qdrant_location=os.getenv("QDRANT_URL", "http://localhost:6333"),
                 qdrant_api_key=os.getenv("QDRANT_API_KEY", None),
                 embedder=self.embedder
             )
+            self.index_checkpoint = get_index_checkpoint(self.vector_db.collection_name)
             logger.info(f"Qdrant vector database initialized successfully (collection: {self.vector_db.collection_name})")
         except Exception as e:
             logger.error(f"Error initializing Qdrant vector DB: {str(e)}")
             logger.error(traceback.format_exc())
             self.use_vector_db = False
 
-    def _index_chunks(self):
-        """
-        Index chunks in Qdrant vector database
-        """
-        try:
-            if not self.chunks or not self.vector_db:
-                logger.warning("No chunks or vector_db available for indexing")
-                return
-            for i, chunk in enumerate(self.chunks):
-                # Always extract text, even if chunk is a custom object
-                if isinstance(chunk, dict) and "text" in chunk:
-                    chunk_dict = chunk.copy()
-                elif isinstance(chunk, str):
-                    chunk_dict = {"text": chunk}
-                else:
-                    text = getattr(chunk, "text", None)
-                    if text is not None:
-                        chunk_dict = {"text": text}
-                    else:
-                        logger.warning(f"Skipping chunk {i}: cannot extract text (type: {type(chunk)})")
-                        continue
-                chunk_dict["id"] = i  # Use integer index as Qdrant point ID
-                self.vector_db.add(chunk_dict)
-            logger.info(f"Indexed {len(self.chunks)} chunks in Qdrant vector database (collection: {self.vector_db.collection_name})")
-        except Exception as e:
-            logger.error(f"Error indexing chunks: {str(e)}")
-            logger.error(traceback.format_exc())
-            self.use_vector_db = False
-
     def _is_vector_db_ready(self) -> bool:
         return (
             self.use_vector_db and 
             self.vector_db is not None and 
-            self.embedder is not None
+            self.embedder is not None and
+            self._index_usable()
         )
 
+    def _index_usable(self) -> bool:
+        """
+        ตรวจเครื่องหมายว่า collection index เสร็จแล้ว หากยังไม่เสร็จ (ถูกขัดจังหวะหรือกำลัง index อยู่)
+        INDEX_INCOMPLETE_POLICY=warn ค้นหาต่อพร้อมคำเตือน, refuse ไม่ค้นหา (ได้ผลลัพธ์ว่าง)
+        """
+        if self.index_checkpoint is None or self.index_checkpoint.status() != "incomplete":
+            return True
+        if get_incomplete_policy() == "refuse":
+            logger.error(f"Collection {self.vector_db.collection_name} is not fully indexed, refusing to search")
+            return False
+        if not self._incomplete_warned:
+            logger.warning(f"Collection {self.vector_db.collection_name} is not fully indexed, results may be missing")
+            self._incomplete_warned = True
+        return True
+
     def _process_context(self, context: Optional[str], max_length: int = 1000) -> Optional[str]:
         """
         ประมวลผล context โดยจำกัดขนาดและทำความสะอาด
@@ -261,44 +369,239 @@ class DocumentSearchTool(object):
         ค้นหาชิ้นส่วนข้อความ (chunks) ที่ตรงกับคำถาม โดยใช้วิธีเปรียบเทียบ token หรือ vector similarity
         """
         try:
-            self._cleanup_cache()
-            cache_key = self._get_cache_key(query + (context or ""))
-            if cache_key in self.query_cache:
-                timestamp, result = self.query_cache[cache_key]
-                if time.time() - timestamp <= self.cache_ttl:
-                    return result
+            # คีย์ผูกกับเวอร์ชันคลังเอกสาร ผลเก่าจึงไม่ถูกใช้หลังเอกสารเปลี่ยน
+            cache_key = self._get_cache_key(f"{self._corpus_version()}|{query}|{context or ''}")
+            result = self.query_cache.get(cache_key)
+            if result is not None:
+                return result
             processed_query = self._process_thai_text(query)
             processed_context = self._process_context(context)
             if self._is_vector_db_ready():
                 try:
+                    # แคชตามความหมายที่ใช้ร่วมกันทุก session: คำถามซ้ำ/คล้ายกันไม่ต้องค้น Qdrant อีก
+                    semantic_cache = get_semantic_cache(self.vector_db.collection_name, "chunks:5")
+                    version = self._corpus_version()
                     search_query = processed_query
                     if processed_context:
                         search_query = f"Context: {processed_context}\nQuery: {processed_query}"
-                    results = self.vector_db.search(search_query, limit=5)
+                    query_vector = None
+                    if semantic_cache is not None:
+                        # แคชตามความหมาย embed ข้อความเดียวกับที่ใช้ค้น เวกเตอร์จึงใช้ค้นต่อได้โดยไม่ embed ซ้ำ
+                        cached, query_vector = semantic_cache.lookup(
+                            query, version, lambda _: self.embedder.encode(search_query)
+                        )
+                        if cached is not None:
+                            self.query_cache.put(cache_key, cached)
+                            return cached
+                    results = self._retrieve(query, search_query, limit=5, query_vector=query_vector)
                     chunks = [r["text"] for r in results if "text" in r]
-                    self.query_cache[cache_key] = (time.time(), chunks)
+                    self.query_cache.put(cache_key, chunks)
+                    if semantic_cache is not None:
+                        semantic_cache.store(query, version, chunks, query_vector)
                     return chunks
                 except Exception as e:
                     logger.error(f"Error using Qdrant vector DB: {str(e)}")
-            query_tokens = set(word_tokenize(processed_query))
-            results = []
-            for chunk in self.chunks:
-                # ถ้า chunk เป็น dict ให้ใช้ key "text" หากไม่ให้ถือว่าเป็น string
-                chunk_text = chunk.get("text", "") if isinstance(chunk, dict) else chunk
-                tokens_chunk = set(word_tokenize(chunk_text))
-                score = len(query_tokens.intersection(tokens_chunk))
-                if score > 0:
-                    results.append((score, chunk_text))
-            results.sort(key=lambda x: x[0], reverse=True)
-            chunks = [text for score, text in results[:10]]
-            
-            # เก็บผลลัพธ์ในแคช
-            self.query_cache[cache_key] = (time.time(), chunks)
+            chunks = [chunk["text"] for chunk in self._lexical_search(processed_query, limit=10)]
+
+            # เก็บผลลัพธ์ในแคช (ผลว่างอาจมาจาก vector DB ที่ล้มเหลวหรือยังไม่พร้อมชั่วคราว จึงไม่เก็บ)
+            if chunks:
+                self.query_cache.put(cache_key, chunks)
             return chunks
         except Exception as e:
             logger.error(f"Error in _search_chunks: {str(e)}")
             return []
 
+    def search(
+        self,
+        query: str,
+        source: Optional[str] = None,
+        page_from: Optional[int] = None,
+        page_to: Optional[int] = None,
+        limit: int = 5,
+    ) -> List[Dict]:
+        """
+        ค้นหาโดยจำกัดเอกสาร (source) และช่วงหน้า (เริ่มที่ 1) คืน chunk dicts พร้อม "citation"
+        ใช้ payload index ของ Qdrant หรือกรอง chunks ในหน่วยความจำเมื่อไม่มี vector DB
+        """
+        self._ensure_initialized()
+        chunk_filter = self._chunk_filter(source, page_from, page_to)
+        processed_query = self._process_thai_text(query)
+        try:
+            if self._is_vector_db_ready():
+                semantic_cache = get_semantic_cache(
+                    self.vector_db.collection_name,
+                    json.dumps({"filter": chunk_filter, "limit": limit}, sort_keys=True),
+                )
+                version = self._corpus_version()
+                query_vector = None
+                if semantic_cache is not None:
+                    cached, query_vector = semantic_cache.lookup(
+                        query, version, lambda _: self.embedder.encode(processed_query)
+                    )
+                    if cached is not None:
+                        return [dict(chunk) for chunk in cached]
+                results = self._retrieve(
+                    query,
+                    processed_query,
+                    limit=limit,
+                    chunk_filter=chunk_filter or None,
+                    query_vector=query_vector,
+                )
+                results = [dict(chunk, citation=format_citation(chunk)) for chunk in results]
+                if semantic_cache is not None:
+                    semantic_cache.store(query, version, results, query_vector)
+                return [dict(chunk) for chunk in results]
+            results = self._lexical_search(processed_query, limit=limit, chunk_filter=chunk_filter)
+        except Exception as e:
+            logger.error(f"Error in search: {str(e)}")
+            return []
+        return [dict(chunk, citation=format_citation(chunk)) for chunk in results]
+
+    def _corpus_version(self) -> str:
+        """
+        เวอร์ชันของคลังเอกสาร: โฟลเดอร์ใช้ fingerprint ของ manifest (เปลี่ยนเมื่อ sync พบไฟล์เปลี่ยน)
+        ไฟล์เดียวใช้ hash ของเนื้อหาไฟล์
+        """
+        version = self.corpus_index.version() if self.corpus_index is not None else self.file_hash
+        if self.vector_db is not None and self.vector_db.generation:
+            # collection ที่ถูก rebuild (blue/green) ได้ version ใหม่ ผลในแคชของรุ่นเก่าจึงไม่ถูกใช้
+            version = f"{version}@{self.vector_db.generation}"
+        if self.index_checkpoint is not None and self.index_checkpoint.status() == "incomplete":
+            # ผลจาก collection ที่ยังไม่ครบไม่ควรถูกใช้ซ้ำหลัง index เสร็จ
+            progress = self.index_checkpoint.progress() or {}
+            version = f"{version}:partial:{progress.get('chunks', 0)}"
+        return version
+
+    def cache_metrics(self) -> Dict[str, Dict]:
+        """hit rate ของแคชตามความหมายและแคชผลลัพธ์ (ทุก collection ใน process)"""
+        return dict(cache_metrics(), **result_cache_metrics())
+
+    def search_many(
+        self,
+        queries: List[str],
+        source: Optional[str] = None,
+        page_from: Optional[int] = None,
+        page_to: Optional[int] = None,
+        limit: int = 5,
+    ) -> List[Dict]:
+        """
+        ค้นหาหลายคำถามในครั้งเดียว (เช่น query expansion หรือชุดประเมินผล): embed ทุกคำถามใน batch เดียว
+        และใช้ batch query ของ Qdrant (round-trip เดียว) คืน [{"query", "results", "timings"}]
+        ตามลำดับคำถาม โดย results มี "citation" เหมือน search()
+        """
+        self._ensure_initialized()
+        chunk_filter = self._chunk_filter(source, page_from, page_to) or None
+        processed = [self._process_thai_text(query) for query in queries]
+        try:
+            if self._is_vector_db_ready():
+                batch = self.vector_db.search_many(
+                    processed, limit=self._fetch_size(limit), filter=chunk_filter, with_vectors=selection_enabled()
+                )
+                for item, query, processed_query in zip(batch, queries, processed):
+                    item["query"] = query
+                    started = time.perf_counter()
+                    query_vector = item.pop("query_vector", None)
+                    item["results"] = self._post_process(query, processed_query, item["results"], limit, query_vector)
+                    item["timings"]["postprocess_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                    item["timings"]["total_ms"] = round(item["timings"]["total_ms"] + item["timings"]["postprocess_ms"], 3)
+            else:
+                batch = []
+                for query, processed_query in zip(queries, processed):
+                    started = time.perf_counter()
+                    results = self._lexical_search(processed_query, limit=limit, chunk_filter=chunk_filter)
+                    batch.append({"query": query, "results": results, "timings": {"total_ms": round((time.perf_counter() - started) * 1000, 3)}})
+        except Exception as e:
+            logger.error(f"Error in search_many: {str(e)}")
+            return [{"query": query, "results": [], "timings": {}} for query in queries]
+        for item in batch:
+            item["results"] = [dict(chunk, citation=format_citation(chunk)) for chunk in item["results"]]
+        return batch
+
+    def _chunk_filter(self, source: Optional[str], page_from: Optional[int], page_to: Optional[int]) -> Dict:
+        chunk_filter = {}
+        if source:
+            chunk_filter["source"] = os.path.basename(source)
+        # chunk ที่คาบเกี่ยวช่วงหน้า: page_start <= page_to และ page_end >= page_from
+        if page_to is not None:
+            chunk_filter["page_start"] = {"lte": page_to}
+        if page_from is not None:
+            chunk_filter["page_end"] = {"gte": page_from}
+        return chunk_filter
+
+    def _retrieve(
+        self,
+        query: str,
+        search_query: str,
+        limit: int,
+        chunk_filter: Optional[dict] = None,
+        query_vector=None,
+    ) -> List[Dict]:
+        """
+        ค้นหาใน vector DB แล้วคัดผลลัพธ์ด้วย _post_process
+        เมื่อเปิด RETRIEVAL_MMR จะ embed search_query ครั้งเดียวใช้ทั้งค้นหาและคัดผล
+        และขอเวกเตอร์ของผลลัพธ์จาก vector DB แทนการ encode chunk ซ้ำ
+        query_vector: embedding ของ search_query ที่มีอยู่แล้ว (เช่นจากแคชตามความหมาย)
+        """
+        if query_vector is None and selection_enabled():
+            query_vector = self.embedder.encode(search_query)
+        candidates = self.vector_db.search(
+            search_query,
+            limit=self._fetch_size(limit),
+            filter=chunk_filter,
+            query_vector=query_vector,
+            with_vectors=query_vector is not None,
+        )
+        return self._post_process(query, search_query, candidates, limit, query_vector)
+
+    def _fetch_size(self, limit: int) -> int:
+        """จำนวนผู้สมัครที่ดึงจาก vector DB: เผื่อให้ MMR (POOL_FACTOR) และ reranker (RERANK_CANDIDATES)"""
+        pool = limit * POOL_FACTOR if selection_enabled() else limit
+        return rerank_candidates(pool) if get_reranker() is not None else pool
+
+    def _post_process(self, query: str, search_query: str, candidates: List[Dict], limit: int, query_vector=None) -> List[Dict]:
+        """
+        - RERANK: cross-encoder ให้คะแนนกับคำถามเดิม (ไม่ผ่านการตัดคำ) ภายในงบเวลา RERANK_BUDGET_MS
+        - RETRIEVAL_MMR: ตัดคะแนนต่ำ, MMR ตัด chunk ซ้ำ และ adaptive k (ดู result_selection)
+          บันทึกจำนวนตัวอักษร prompt ที่ประหยัดได้ใน self.last_selection / self.selection_stats
+        """
+        pool = limit * POOL_FACTOR if selection_enabled() else limit
+        reranker = get_reranker()
+        if reranker is not None:
+            try:
+                candidates = reranker.rerank(query, candidates, pool, budget_ms=rerank_budget_ms())
+            except Exception as e:
+                logger.error(f"Error reranking results: {str(e)}")
+                candidates = candidates[:pool]
+        if not selection_enabled():
+            return drop_vectors(candidates[:limit])
+        try:
+            chunks, report = select_chunks(search_query, candidates, self.embedder, limit, query_vector)
+        except Exception as e:
+            logger.error(f"Error selecting results: {str(e)}")
+            return drop_vectors(candidates[:limit])
+        self.last_selection = report
+        self.selection_stats["queries"] += 1
+        self.selection_stats["chars_saved"] += report["chars_saved"]
+        logger.info(
+            f"Selected {report['kept']}/{report['candidates']} chunks, "
+            f"prompt chars {report['chars_before']} -> {report['chars_after']} (saved {report['chars_saved']})"
+        )
+        return chunks
+
+    def _lexical_search(self, query: str, limit: int, chunk_filter: Optional[dict] = None) -> List[Dict]:
+        """
+        ค้นหา self.chunks ด้วย BM25 จาก inverted index (อ่านเฉพาะ posting ของคำในคำถาม)
+        ใช้เมื่อไม่มี vector DB; chunk_filter กรองด้วยเงื่อนไขเดียวกับ payload filter ของ Qdrant
+        """
+        if len(self.lexical_index) != len(self.chunks):
+            # chunks ถูกกำหนดจากภายนอก (เช่น tool ที่สร้างไว้ก่อน) ให้สร้าง index ใหม่
+            self.lexical_index = BM25Index()
+            self.lexical_index.add([chunk["text"] for chunk in self.chunks])
+        mask = None
+        if chunk_filter:
+            mask = np.fromiter((matches_filter(chunk, chunk_filter) for chunk in self.chunks), dtype=bool, count=len(self.chunks))
+        return [self.chunks[i] for i, _ in self.lexical_index.search(query, limit, mask)]
+
     def _run(self, query: str, context: Optional[str] = None) -> str:
         """
         รันการค้นหาข้อมูล:
@@ -312,9 +615,6 @@ class DocumentSearchTool(object):
             if not self.initialized:
                 return "เครื่องมือค้นหาเอกสารยังไม่พร้อมใช้งาน กรุณาลองใหม่อีกครั้ง"
             
-            # ทำความสะอาดแคชที่หมดอายุ
-            self._cleanup_cache()
-            
             processed_query = self._process_thai_text(query)
 
             try:
@@ -342,13 +642,13 @@ class DocumentSearchTool(object):
         ปล่อยทรัพยากรที่ใช้ในการประมวลผลเอกสาร
         """
         try:
-            # ล้างแคช
-            self.image_cache.clear()
-            self.query_cache.clear()
+            # ล้างแคช (รวมชั้นดิสก์ เพราะ collection ถูกลบด้วย)
+            self.query_cache.clear(disk=True)
             
             # ล้างข้อมูลที่สกัดมา
             self.raw_text = ""
             self.chunks = []
+            self.lexical_index = BM25Index()
             
             # ลบ collection จาก vector DB ถ้ามี
             if self.vector_db:
@@ -356,6 +656,8 @@ class DocumentSearchTool(object):
                     self.vector_db.delete()
                 except:
                     pass
+                if self.index_checkpoint is not None:
+                    self.index_checkpoint.clear()
             
             # ทำ garbage collection
             gc.collect()
@@ -366,25 +668,6 @@ class DocumentSearchTool(object):
             logger.error(f"Error in release_resources: {str(e)}")
             return False
 
-    def _cleanup_cache(self):
-        """
-        ลบแคชที่หมดอายุเพื่อป้องกันการใช้หน่วยความจำมากเกินไป
-        """
-        try:
-            current_time = time.time()
-            if current_time - self.last_cache_cleanup > 300:  # ทำความสะอาดทุก 5 นาที
-                expired_keys = []
-                for key, (timestamp, _) in self.query_cache.items():
-                    if current_time - timestamp > self.cache_ttl:
-                        expired_keys.append(key)
-                
-                for key in expired_keys:
-                    del self.query_cache[key]
-                
-                self.last_cache_cleanup = current_time
-        except Exception as e:
-            logger.error(f"Error in _cleanup_cache: {str(e)}")
-
     def _get_cache_key(self, query: str) -> str:
         """
         สร้างคีย์สำหรับแคชจากคำถาม
@@ -397,183 +680,20 @@ class DocumentSearchTool(object):
          - ปรับสระลอยให้ถูกต้อง
          - แบ่งประโยคและแยกคำด้วย pythainlp
         """
-        try:
-            fixed_text = reorder_vowels(text)
-            sentences = sent_tokenize(fixed_text)
-            processed_sentences = []
-            for sentence in sentences:
-                words = word_tokenize(sentence)
-                processed_sentence = " ".join(words)
-                processed_sentences.append(processed_sentence)
-            return " ".join(processed_sentences)
-        except Exception as e:
-            logger.error(f"Error in _process_thai_text: {str(e)}")
-            return text  # Return original text if processing fails
+        return process_thai_text(text)
 
     def _preprocess_image(self, image: Image.Image) -> Image.Image:
         """
         ปรับปรุงคุณภาพของภาพก่อนทำ OCR เพื่อเพิ่มความแม่นยำ
         """
-        # แปลงเป็น grayscale
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # ปรับความคมชัด
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
-        
-        # ปรับความสว่าง
-        enhancer = ImageEnhance.Brightness(image)
-        image = enhancer.enhance(1.2)
-        
-        # แปลงเป็น numpy array สำหรับการประมวลผลด้วย OpenCV
-        img_array = np.array(image)
-        
-        # ลด noise
-        img_array = cv2.fastNlMeansDenoising(img_array)
-        
-        # ปรับความคมชัดด้วย adaptive thresholding
-        img_array = cv2.adaptiveThreshold(
-            img_array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
-        # แปลงกลับเป็น PIL Image
-        return Image.fromarray(img_array)
-
-    def _extract_embedded_images(self, doc: fitz.Document) -> List[Tuple[int, Image.Image]]:
-        """
-        สกัดภาพที่ฝังอยู่ใน PDF
-        """
-        images = []
-        for page_num, page in enumerate(doc):
-            # ดึงภาพที่ฝังอยู่ในหน้า
-            image_list = page.get_images(full=True)
-            
-            for img_index, img in enumerate(image_list):
-                try:
-                    # ดึงข้อมูลภาพ
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    
-                    if base_image:
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"]
-                        
-                        # แปลงเป็น PIL Image
-                        pil_image = Image.open(io.BytesIO(image_bytes))
-                        
-                        # เก็บภาพพร้อมกับหมายเลขหน้า
-                        images.append((page_num, pil_image))
-                        
-                        # เก็บในแคช
-                        cache_key = f"{page_num}_{img_index}"
-                        self.image_cache[cache_key] = pil_image
-                except Exception as e:
-                    continue
-        
-        return images
-
-    def _extract_text(self) -> str:
-        """
-        สกัดและประมวลผลข้อความจากไฟล์ PDF โดยใช้ pdfplumber และ fitz
-        เพิ่มการใช้ OCR ในกรณีที่หน้านั้นไม่ได้มีข้อความ (เช่น สแกนมาเป็นรูป)
-        """
-        def extract_with_pdfplumber(path: str) -> str:
-            text_pp = ""
-            try:
-                with pdfplumber.open(path) as pdf:
-                    for page_num, page in enumerate(pdf.pages):
-                        page_text = page.extract_text()
-                        if page_text and page_text.strip():
-                            text_pp += self._process_thai_text(page_text) + "\n"
-                        else:
-                            # ใช้ OCR ผ่าน pytesseract โดยใช้ภาพจาก pdfplumber
-                            try:
-                                # ใช้วิธี to_image() เพื่อแปลงหน้าเป็นภาพ
-                                page_image = page.to_image(resolution=300)
-                                pil_image = page_image.original  # PIL Image
-                                
-                                # ปรับปรุงคุณภาพภาพก่อนทำ OCR
-                                processed_image = self._preprocess_image(pil_image)
-                                
-                                # ทำ OCR ด้วยภาษาไทยและอังกฤษ
-                                ocr_text = pytesseract.image_to_string(processed_image, lang="tha+eng")
-                                if ocr_text.strip():
-                                    text_pp += self._process_thai_text(ocr_text) + "\n"
-                            except Exception as e:
-                                pass
-            except Exception as e:
-                text_pp += ""
-            return text_pp
-
-        def extract_with_fitz(path: str) -> str:
-            text_fitz = ""
-            try:
-                doc = fitz.open(path)
-                
-                # สกัดภาพที่ฝังอยู่ใน PDF
-                embedded_images = self._extract_embedded_images(doc)
-                
-                for page_num, page in enumerate(doc):
-                    page_text = page.get_text().strip()
-                    if not page_text:
-                        # หากไม่มีข้อความ ให้ใช้ OCR โดย render หน้าด้วย fitz
-                        try:
-                            # ตรวจสอบว่ามีภาพที่สกัดมาแล้วหรือไม่
-                            page_images = [img for p_num, img in embedded_images if p_num == page_num]
-                            
-                            if page_images:
-                                # ใช้ภาพที่สกัดมาแล้ว
-                                for img in page_images:
-                                    processed_image = self._preprocess_image(img)
-                                    ocr_text = pytesseract.image_to_string(processed_image, lang="tha+eng")
-                                    if ocr_text.strip():
-                                        page_text += self._process_thai_text(ocr_text) + "\n"
-                            else:
-                                # ถ้าไม่มีภาพที่สกัดมาแล้ว ให้ render หน้าเป็นภาพ
-                                pix = page.get_pixmap(dpi=300)
-                                image_bytes = pix.tobytes("png")
-                                pil_image = Image.open(io.BytesIO(image_bytes))
-                                
-                                # ปรับปรุงคุณภาพภาพก่อนทำ OCR
-                                processed_image = self._preprocess_image(pil_image)
-                                
-                                ocr_text = pytesseract.image_to_string(processed_image, lang="tha+eng")
-                                page_text = ocr_text
-                        except Exception as e:
-                            page_text = ""
-                    if page_text:
-                        text_fitz += self._process_thai_text(page_text) + "\n"
-                doc.close()
-            except Exception as e:
-                text_fitz += ""
-            return text_fitz
-
-        all_text = ""
-        if os.path.isdir(self.file_path):
-            for filename in os.listdir(self.file_path):
-                if filename.lower().endswith('.pdf'):
-                    full_path = os.path.join(self.file_path, filename)
-                    text_pp = extract_with_pdfplumber(full_path)
-                    text_fitz = extract_with_fitz(full_path)
-                    all_text += text_pp + "\n" + text_fitz + "\n"
-        else:
-            all_text = extract_with_pdfplumber(self.file_path) + "\n" + extract_with_fitz(self.file_path)
-        #print(all_text)
-        return all_text
+        return preprocess_image(image)
 
     def _create_chunks(self, raw_text: str) -> list:
         """
         สร้าง semantic chunks จากข้อความที่สกัดมาโดยใช้ SemanticChunker
         """
-        chunker = SemanticChunker(
-            embedding_model="minishlab/potion-base-8M",
-            threshold=0.5,
-            chunk_size=128,
-            min_sentences=1
-        )
-        return chunker.chunk(raw_text)
+        # chunker ใช้ร่วมกันทั้ง process จึงโหลดโมเดลครั้งเดียวไม่ว่าจะมีกี่ไฟล์/กี่ tool
+        return chunk_text(raw_text)
 
     def _perform_gc(self):
         """
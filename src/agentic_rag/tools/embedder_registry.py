@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from .embedding_backends import get_backend_name
+from .qdrant_storage import MyEmbedder
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Keyed by (model name, backend name)
+_embedders: Dict[Tuple[str, str], MyEmbedder] = {}
+_load_info: Dict[Tuple[str, str], Dict] = {}
+_registry_lock = threading.Lock()
+# One lock per model so loading one model does not block lookups of another
+_model_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def _get_remote_embedder(url: str, model_name: str):
+    key = (model_name, f"remote:{url}")
+    with _registry_lock:
+        model_lock = _model_locks.setdefault(key, threading.Lock())
+    with model_lock:
+        if key not in _embedders:
+            from .embedding_service import RemoteEmbedder
+
+            embedder = RemoteEmbedder(url, model_name)
+            _load_info[key] = {"backend": "remote", "url": url, "loaded_at": time.time(), "bytes": 0}
+            _embedders[key] = embedder
+            logger.info(f"Using embedding service at {url} ({embedder.model_name})")
+        return _embedders[key]
+
+
+def get_embedder(model_name: str = DEFAULT_MODEL, backend: Optional[str] = None, local: bool = False) -> MyEmbedder:
+    """
+    Returns the process-wide embedder for model_name on the configured backend
+    (EMBEDDER_BACKEND), loading it on first use.
+    Thread-safe: concurrent callers (Streamlit sessions, sync/watch threads)
+    wait for the single load instead of loading their own copy.
+    When EMBEDDING_SERVICE_URL is set (and local is False) a RemoteEmbedder client of the
+    shared embedding service is returned instead; if the service is unreachable (at
+    startup, or later from within RemoteEmbedder) the model is loaded in-process.
+    """
+    service_url = os.getenv("EMBEDDING_SERVICE_URL")
+    if service_url and not local:
+        try:
+            return _get_remote_embedder(service_url, model_name)
+        except Exception as e:
+            logger.error(f"Embedding service {service_url} unavailable, loading {model_name} in-process: {str(e)}")
+    key = (model_name, backend or get_backend_name())
+    embedder = _embedders.get(key)
+    if embedder is not None:
+        return embedder
+    with _registry_lock:
+        model_lock = _model_locks.setdefault(key, threading.Lock())
+    with model_lock:
+        embedder = _embedders.get(key)
+        if embedder is None:
+            started = time.time()
+            embedder = MyEmbedder(model_name, key[1])
+            _load_info[key] = {
+                "backend": embedder.backend.name,
+                "load_seconds": round(time.time() - started, 2),
+                "loaded_at": time.time(),
+                "bytes": embedder.backend.memory_bytes(),
+            }
+            _embedders[key] = embedder
+            logger.info(f"Loaded embedding model {model_name}: {_load_info[key]}")
+    return embedder
+
+
+def loaded_models() -> Dict[str, Dict]:
+    """
+    Memory report of the models held by the registry:
+    {"model@backend": {"backend", "bytes", "load_seconds", "loaded_at", "vector_size"}}
+    """
+    with _registry_lock:
+        return {
+            f"{name}@{backend}": dict(_load_info.get((name, backend), {}), vector_size=embedder.vector_size)
+            for (name, backend), embedder in _embedders.items()
+        }
+
+
+def release_embedder(model_name: str, backend: Optional[str] = None) -> bool:
+    """
+    Drops the registry reference to a model (it is freed once no tool still holds it).
+    """
+    key = (model_name, backend or get_backend_name())
+    with _registry_lock:
+        _load_info.pop(key, None)
+        return _embedders.pop(key, None) is not None
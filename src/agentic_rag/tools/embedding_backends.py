@@ -0,0 +1,188 @@
+import os
+import re
+import abc
+import json
+import logging
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_BACKEND = "torch"
+ONNX_OPSET = 17
+
+
+def get_backend_name() -> str:
+    """
+    Embedding backend selected by EMBEDDER_BACKEND ("torch" or "onnx-int8").
+    """
+    return (os.getenv("EMBEDDER_BACKEND") or DEFAULT_BACKEND).strip().lower()
+
+
+class EmbeddingBackend(abc.ABC):
+    """
+    Interface of an embedding backend used by MyEmbedder.
+    encode() returns a float32 matrix of shape (len(texts), vector_size).
+    """
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.vector_size = 0
+
+    @abc.abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        raise NotImplementedError
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    fp32 PyTorch SentenceTransformer (reference implementation).
+    """
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        self.model = SentenceTransformer(model_name)
+        self.vector_size = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+    def memory_bytes(self) -> Optional[int]:
+        try:
+            tensors = list(self.model.parameters()) + list(self.model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return None
+
+
+class OnnxInt8Backend(EmbeddingBackend):
+    """
+    The same SentenceTransformer model exported to ONNX with dynamically
+    quantized int8 weights, run on CPU with ONNX Runtime.
+    The export happens once per model and is kept under RAG_CACHE_DIR/onnx;
+    pooling and normalization follow the original SentenceTransformer pipeline.
+    Requires onnxruntime (and torch + onnx for the one-time export).
+    """
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str, model_dir: Optional[str] = None):
+        super().__init__(model_name)
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.model_dir = model_dir or get_cache_dir("onnx", safe_name)
+        self.model_path = os.path.join(self.model_dir, "model.int8.onnx")
+        config_path = os.path.join(self.model_dir, "pipeline.json")
+        if not (os.path.exists(self.model_path) and os.path.exists(config_path)):
+            self._export(config_path)
+        with open(config_path, "r", encoding="utf-8") as f:
+            self.pipeline = json.load(f)
+        self.vector_size = self.pipeline["vector_size"]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        options = ort.SessionOptions()
+        threads = int(os.getenv("EMBEDDER_THREADS") or 0)
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _export(self, config_path: str) -> None:
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Exporting {self.model_name} to ONNX int8 in {self.model_dir} (one-time)")
+        st_model = SentenceTransformer(self.model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        pooling = next((m for m in st_model if m.__class__.__name__ == "Pooling"), None)
+        pipeline = {
+            "model_name": self.model_name,
+            "vector_size": st_model.get_sentence_embedding_dimension(),
+            "max_seq_length": st_model.max_seq_length,
+            "pooling": "cls" if pooling is not None and getattr(pooling, "pooling_mode_cls_token", False) else "mean",
+            "normalize": any(m.__class__.__name__ == "Normalize" for m in st_model),
+        }
+
+        sample = tokenizer(["ตัวอย่าง sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        class _HiddenState(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)))[0]
+
+        fp32_path = os.path.join(self.model_dir, "model.fp32.onnx")
+        export_kwargs = dict(
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+        )
+        with torch.no_grad():
+            try:
+                torch.onnx.export(_HiddenState(transformer), tuple(sample[n] for n in input_names), fp32_path, dynamo=False, **export_kwargs)
+            except TypeError:  # torch < 2.5 has no dynamo argument
+                torch.onnx.export(_HiddenState(transformer), tuple(sample[n] for n in input_names), fp32_path, **export_kwargs)
+        quantize_dynamic(fp32_path, self.model_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+        tokenizer.save_pretrained(self.model_dir)
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(pipeline, f, indent=2)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.pipeline["max_seq_length"],
+                return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self._input_names}
+            hidden = self.session.run(None, feeds)[0]
+            if self.pipeline["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = batch["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.pipeline["normalize"]:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+        if not outputs:
+            return np.zeros((0, self.vector_size), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def memory_bytes(self) -> Optional[int]:
+        try:
+            return os.path.getsize(self.model_path)
+        except OSError:
+            return None
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+
+def create_backend(model_name: str, backend: Optional[str] = None) -> EmbeddingBackend:
+    backend = backend or get_backend_name()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDER_BACKEND {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](model_name)
@@ -0,0 +1,240 @@
+import os
+import re
+import atexit
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MAX_MB = 256
+# The matrix file grows in steps of this many rows
+GROW_ROWS = 4096
+# Fraction of entries evicted (least recently used first) when the cache is full
+EVICT_FRACTION = 0.1
+# index.json is rewritten whole, so during ingestion it is only saved once at least
+# SAVE_MIN_CHANGES entries (and SAVE_FRACTION of the index) changed and SAVE_INTERVAL
+# seconds passed, keeping the writes amortised O(1) per entry; it is always saved at exit
+SAVE_INTERVAL = 5.0
+SAVE_MIN_CHANGES = 1024
+SAVE_FRACTION = 0.25
+DIGEST_SIZE = hashlib.sha1().digest_size
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding store for one embedding model.
+    - vectors.f32: memory-mapped float32 matrix, one row per cached text
+    - keys.sha1: memory-mapped sha1 digest of the text stored in each row
+    - index.json: {sha1(text): [row, last_access]}
+    Rows are reused after least-recently-used eviction once max_bytes is reached.
+    The index is loaded once per process and is not coordinated between processes,
+    so a row may be rewritten by another process (or by this one before a crash)
+    while an index still points at it. Every hit is therefore checked against the
+    row's digest; a mismatch is a miss, never another text's vector.
+    """
+
+    def __init__(self, model_name: str, dim: int, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.model_name = model_name
+        self.dim = dim
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.directory = directory or get_cache_dir("embeddings", f"{safe_name}-{dim}")
+        os.makedirs(self.directory, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("EMBED_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+        self.max_rows = max(0, max_bytes // (dim * 4))
+        self.matrix_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.sha1")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        self._index: Dict[str, list] = self._load_index()
+        self._free: List[int] = []
+        self._matrix: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._rows = 0
+        self._open_matrix()
+        # Index entries changed since the last save
+        self._dirty = 0
+        self._last_save = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rows > 0
+
+    def _load_index(self) -> Dict[str, list]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("dim") == self.dim:
+                return data["entries"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache index {self.index_path}: {str(e)}")
+        return {}
+
+    def _map(self) -> None:
+        # keys.sha1 is sized together with the matrix; rows without a digest (zeros) never hit
+        for path, row_bytes in ((self.matrix_path, self.dim * 4), (self.keys_path, DIGEST_SIZE)):
+            with open(path, "ab") as f:
+                if f.tell() < self._rows * row_bytes:
+                    f.truncate(self._rows * row_bytes)
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(self._rows, self.dim))
+        self._keys = np.memmap(self.keys_path, dtype=np.uint8, mode="r+", shape=(self._rows, DIGEST_SIZE))
+
+    def _open_matrix(self) -> None:
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        self._rows = size // (self.dim * 4)
+        if self._rows:
+            self._map()
+        # Entries that point past the end of the matrix (e.g. truncated file) are dropped
+        self._index = {k: v for k, v in self._index.items() if v[0] < self._rows}
+        used = {row for row, _ in self._index.values()}
+        self._free = sorted(set(range(self._rows)) - used, reverse=True)
+
+    def _grow(self, rows_needed: int) -> None:
+        new_rows = min(self.max_rows, max(self._rows + GROW_ROWS, self._rows + rows_needed))
+        if new_rows <= self._rows:
+            return
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._keys.flush()
+            self._matrix = self._keys = None
+        self._free = list(range(new_rows - 1, self._rows - 1, -1)) + self._free
+        self._rows = new_rows
+        self._map()
+
+    def _evict(self, count: int) -> None:
+        count = max(count, int(len(self._index) * EVICT_FRACTION), 1)
+        oldest = sorted(self._index.items(), key=lambda kv: kv[1][1])[:count]
+        for key, (row, _) in oldest:
+            del self._index[key]
+            self._free.append(row)
+        logger.info(f"Embedding cache evicted {len(oldest)} entries ({self.model_name})")
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached vector for each text, or None for a miss."""
+        if not self.enabled:
+            self.misses += len(texts)
+            return [None] * len(texts)
+        now = time.time()
+        found: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = text_key(text)
+                entry = self._index.get(key)
+                if entry is not None and self._keys[entry[0]].tobytes() != bytes.fromhex(key):
+                    # The row was reused for another text by a different process
+                    del self._index[key]
+                    self._dirty += 1
+                    entry = None
+                if entry is None:
+                    found.append(None)
+                    self.misses += 1
+                    continue
+                entry[1] = now
+                found.append(np.array(self._matrix[entry[0]]))
+                self.hits += 1
+        return found
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        if not self.enabled or not texts:
+            return
+        now = time.time()
+        with self._lock:
+            pending = [(text_key(t), v) for t, v in zip(texts, vectors)]
+            pending = [(k, v) for k, v in dict(pending).items() if k not in self._index]
+            if not pending:
+                return
+            needed = len(pending) - len(self._free)
+            if needed > 0:
+                self._grow(needed)
+            needed = len(pending) - len(self._free)
+            if needed > 0:
+                self._evict(needed)
+            dropped = len(pending) - len(self._free)
+            if dropped > 0:
+                # More new texts in one call than the cache holds (max_rows)
+                self.dropped += dropped
+                logger.warning(f"Embedding cache full, {dropped} vectors not cached ({self.model_name})")
+                pending = pending[:len(self._free)]
+            for key, vector in pending:
+                row = self._free.pop()
+                # Invalidate the digest before the vector changes so a crash in between leaves a miss
+                self._keys[row] = 0
+                self._matrix[row] = np.asarray(vector, dtype=np.float32)
+                self._keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self._index[key] = [row, now]
+            self._dirty += len(pending)
+            due = (
+                self._dirty >= max(SAVE_MIN_CHANGES, len(self._index) * SAVE_FRACTION)
+                and now - self._last_save >= SAVE_INTERVAL
+            )
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            try:
+                self._matrix.flush()
+                self._keys.flush()
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim, "entries": self._index}, f)
+                os.replace(tmp_path, self.index_path)
+                self._dirty = 0
+                self._last_save = time.time()
+            except Exception as e:
+                logger.warning(f"Cannot persist embedding cache index: {str(e)}")
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._index),
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "bytes": self._rows * self.dim * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "dropped": self.dropped,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_caches: Dict[Tuple[str, int], EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, dim: int) -> Optional[EmbeddingCache]:
+    """
+    Process-wide EmbeddingCache per (model, dimension).
+    Returns None when disabled (EMBED_CACHE_MAX_MB=0) or unavailable.
+    """
+    with _caches_lock:
+        key = (model_name, dim)
+        if key not in _caches:
+            try:
+                _caches[key] = EmbeddingCache(model_name, dim)
+                atexit.register(_caches[key].save)
+            except Exception as e:
+                logger.warning(f"Embedding cache unavailable: {str(e)}")
+                return None
+        cache = _caches[key]
+    return cache if cache.enabled else None
@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import logging
+import threading
+import http.client
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from .embedding_backends import EmbeddingBackend
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+REQUEST_TIMEOUT = 60
+
+
+class MicroBatcher:
+    """
+    Collects concurrent encode requests into one model call.
+    A batch is closed when it reaches max_batch texts or max_wait_ms after its first request.
+    """
+
+    def __init__(self, embedder, max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._requests: "queue.Queue" = queue.Queue()
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "encode_seconds": 0.0}
+        self._worker = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._requests.put((texts, future))
+        return future
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._run(batch)
+
+    def _run(self, batch) -> None:
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        started = time.time()
+        try:
+            vectors = self.embedder.encode_many(texts, batch_size=self.max_batch)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats["encode_seconds"] += time.time() - started
+        self.stats["requests"] += len(batch)
+        self.stats["texts"] += len(texts)
+        self.stats["batches"] += 1
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def report(self) -> Dict:
+        stats = dict(self.stats)
+        stats["avg_batch_texts"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+
+def make_handler(batcher: MicroBatcher):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without TCP_NODELAY the
+            # client's delayed ACK adds ~40ms to every keep-alive request
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _send(self, status: int, body: Dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send(404, {"error": "not found"})
+                return
+            embedder = batcher.embedder
+            self._send(200, {
+                "model": embedder.model_name,
+                "vector_size": embedder.vector_size,
+                "stats": batcher.report(),
+            })
+
+        def do_POST(self):
+            if self.path != "/encode":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                texts = json.loads(self.rfile.read(length))["texts"]
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("texts must be a list of strings")
+            except Exception as e:
+                self._send(400, {"error": str(e)})
+                return
+            try:
+                vectors = batcher.submit(texts).result(timeout=REQUEST_TIMEOUT) if texts else []
+            except Exception as e:
+                logger.error(f"Embedding service encode failed: {str(e)}")
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, {"vectors": vectors})
+
+        def log_message(self, format, *args):
+            logger.debug("embedding service: " + format % args)
+
+    return EmbeddingHandler
+
+
+def serve(
+    model_name: str,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+) -> ThreadingHTTPServer:
+    """
+    Starts the embedding server and returns it (call serve_forever() or shutdown()).
+    Binds to localhost by default: the service has no authentication.
+    """
+    from .embedder_registry import get_embedder
+
+    batcher = MicroBatcher(get_embedder(model_name, local=True), max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    server.daemon_threads = True
+    server.batcher = batcher
+    logger.info(f"Embedding service for {model_name} listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+class ServiceBackend(EmbeddingBackend):
+    """
+    Embedding backend that encodes on the embedding service over HTTP.
+    Keeps one HTTP/1.1 keep-alive connection per thread.
+    """
+    name = "remote"
+
+    def __init__(self, url: str, timeout: float = REQUEST_TIMEOUT):
+        parsed = urlparse(url)
+        self.url = url
+        self.host = parsed.hostname or DEFAULT_HOST
+        self.port = parsed.port or DEFAULT_PORT
+        self.timeout = timeout
+        self._local = threading.local()
+        health = self._request("GET", "/health")
+        super().__init__(health["model"])
+        self.vector_size = health["vector_size"]
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                payload = json.loads(response.read())
+                if response.status != 200:
+                    raise RuntimeError(f"Embedding service error {response.status}: {payload.get('error')}")
+                return payload
+            except (http.client.HTTPException, ConnectionError, OSError):
+                # Stale keep-alive connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        raise RuntimeError("unreachable")
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        vectors = self._request("POST", "/encode", {"texts": texts})["vectors"] if texts else []
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.vector_size)
+
+    def memory_bytes(self) -> Optional[int]:
+        return 0
+
+
+class RemoteEmbedder:
+    """
+    MyEmbedder-compatible client of the embedding service (EMBEDDING_SERVICE_URL).
+    The service keeps its own embedding cache, so `cache` is None while it is used.
+    If the service fails mid-run the model is loaded in-process (as get_embedder does
+    when the service is unreachable at startup) and serves every later call;
+    `backend` and `cache` then report the in-process embedder's.
+    """
+
+    def __init__(self, url: str, model_name: Optional[str] = None, timeout: float = REQUEST_TIMEOUT):
+        self.url = url
+        self.backend: EmbeddingBackend = ServiceBackend(url, timeout)
+        self.model_name = self.backend.model_name
+        self.vector_size = self.backend.vector_size
+        if model_name and model_name != self.model_name:
+            raise ValueError(f"Embedding service serves {self.model_name}, requested {model_name}")
+        self.cache = None
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+
+    def _local_embedder(self, error: Exception):
+        from .embedder_registry import get_embedder
+
+        with self._fallback_lock:
+            if self._fallback is None:
+                logger.error(f"Embedding service {self.url} failed, loading {self.model_name} in-process: {str(error)}")
+                self._fallback = get_embedder(self.model_name, local=True)
+                self.backend = self._fallback.backend
+                self.cache = self._fallback.cache
+        return self._fallback
+
+    def encode(self, text: str):
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._fallback is None:
+            try:
+                return self.backend.encode(texts, batch_size=batch_size).tolist()
+            except Exception as e:
+                fallback = self._local_embedder(e)
+        else:
+            fallback = self._fallback
+        return fallback.encode_many(texts, batch_size=batch_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Shared local embedding server with dynamic micro-batching")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--host", default=os.getenv("EMBEDDING_SERVICE_HOST") or DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBEDDING_SERVICE_PORT") or DEFAULT_PORT))
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = serve(args.model, args.host, args.port, args.max_batch, args.max_wait_ms)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+MAX_ENTRIES = 5000
+
+
+def hash_file(path: str, algorithm: str = "sha1") -> str:
+    """
+    Hashes a file through a read-only memory map, so the digest is computed
+    without copying the file into Python bytes objects.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+    return digest.hexdigest()
+
+
+class FingerprintCache:
+    """
+    Persisted (path, size, mtime, inode) -> digest cache.
+    Unchanged files are fingerprinted with a single stat() call; only files that are
+    new or modified are hashed. Entries are pruned oldest-first past MAX_ENTRIES.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(get_cache_dir(), "fingerprints.json")
+        self._lock = threading.Lock()
+        self._entries: Dict[str, list] = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable fingerprint cache {self.path}: {str(e)}")
+            return {}
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            if len(self._entries) > MAX_ENTRIES:
+                keep = sorted(self._entries.items(), key=lambda kv: kv[1][1], reverse=True)[:MAX_ENTRIES]
+                self._entries = dict(keep)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception as e:
+                logger.warning(f"Cannot persist fingerprint cache: {str(e)}")
+
+    def fingerprint(self, path: str, algorithm: str = "sha1") -> str:
+        stat = os.stat(path)
+        key = f"{algorithm}|{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{stat.st_ino}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry[1] = time.time()
+                return entry[0]
+        digest = hash_file(path, algorithm)
+        with self._lock:
+            self._entries[key] = [digest, time.time()]
+            self._dirty = True
+        self.save()
+        return digest
+
+
+_cache: Optional[FingerprintCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_fingerprint_cache() -> FingerprintCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FingerprintCache()
+        return _cache
+
+
+def file_fingerprint(path: str, algorithm: str = "sha1") -> str:
+    """
+    Content digest of a file, served from the persisted stat cache when the file is unchanged.
+    """
+    try:
+        return get_fingerprint_cache().fingerprint(path, algorithm)
+    except OSError:
+        raise
+    except Exception as e:
+        logger.warning(f"Fingerprint cache unavailable, hashing {path} directly: {str(e)}")
+        return hash_file(path, algorithm)
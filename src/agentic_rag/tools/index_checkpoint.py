@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_EVERY = 8
+INCOMPLETE_POLICIES = ("warn", "refuse")
+
+
+def get_checkpoint_interval() -> int:
+    """
+    Number of ingestion batches between checkpoints (INDEX_CHECKPOINT_EVERY).
+    Each checkpoint waits for pending upserts, so smaller values trade throughput for less redone work.
+    """
+    try:
+        return max(1, int(os.getenv("INDEX_CHECKPOINT_EVERY") or DEFAULT_CHECKPOINT_EVERY))
+    except ValueError:
+        return DEFAULT_CHECKPOINT_EVERY
+
+
+def get_incomplete_policy() -> str:
+    """INDEX_INCOMPLETE_POLICY: "warn" (default) searches incomplete collections with a warning, "refuse" returns no results"""
+    policy = (os.getenv("INDEX_INCOMPLETE_POLICY") or "warn").strip().lower()
+    if policy not in INCOMPLETE_POLICIES:
+        logger.warning(f"Unknown INDEX_INCOMPLETE_POLICY {policy!r}, using warn")
+        return "warn"
+    return policy
+
+
+class IndexCheckpoint:
+    """
+    Sidecar record of how far indexing of a collection got.
+    - "pending" describes the unit being indexed (a file fingerprint) and how many of its
+      chunks are known to be applied by the store; a restart resumes after them
+    - "complete" is the completion marker, written only after the last batch was flushed
+    - Without a sidecar (collections indexed before checkpoints existed) the status is "unknown"
+    The file is rewritten atomically and re-read when another process changed it.
+    """
+
+    def __init__(self, collection_name: str, path: Optional[str] = None):
+        self.collection_name = collection_name
+        self.path = path or os.path.join(get_cache_dir("checkpoints"), f"{collection_name}.json")
+        self.lock = threading.RLock()
+        self._mtime: Optional[int] = None
+        self.state = self._load()
+
+    def _empty_state(self) -> Dict:
+        return {"version": CHECKPOINT_VERSION, "collection": self.collection_name, "complete": False, "pending": None}
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == CHECKPOINT_VERSION and state.get("collection") == self.collection_name:
+                return state
+            logger.warning(f"Ignoring index checkpoint {self.path} written for another collection/version")
+        except FileNotFoundError:
+            self._mtime = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable index checkpoint {self.path}: {str(e)}")
+        return None
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self.state = self._load()
+
+    def _save(self) -> None:
+        self.state["updated_at"] = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def status(self) -> str:
+        """"complete", "incomplete" or "unknown" (no sidecar)"""
+        with self.lock:
+            self._refresh()
+            if self.state is None:
+                return "unknown"
+            return "complete" if self.state.get("complete") else "incomplete"
+
+    def progress(self) -> Optional[Dict]:
+        with self.lock:
+            self._refresh()
+            pending = (self.state or {}).get("pending")
+            return dict(pending) if pending else None
+
+    def begin(self, unit: str, resume: bool = True, building: bool = True) -> int:
+        """
+        Starts (or resumes) indexing `unit` and returns the number of its chunks to skip.
+        resume=False discards a previous checkpoint (e.g. the collection was emptied);
+        building=True clears the completion marker until mark_complete().
+        """
+        with self.lock:
+            self._refresh()
+            state = self.state or self._empty_state()
+            pending = state.get("pending")
+            start = 0
+            if resume and pending and pending.get("unit") == unit:
+                start = int(pending.get("chunks", 0))
+            else:
+                state["pending"] = {"unit": unit, "chunks": 0, "batches": 0, "started_at": time.time()}
+            if building:
+                state["complete"] = False
+            self.state = state
+            self._save()
+            return start
+
+    def commit(self, chunks: int, batches: int) -> None:
+        """Records that the first `chunks` chunks of the pending unit are applied by the store"""
+        with self.lock:
+            pending = (self.state or {}).get("pending")
+            if not pending:
+                return
+            pending["chunks"] = chunks
+            pending["batches"] = batches
+            self._save()
+
+    def finish_unit(self) -> None:
+        with self.lock:
+            if self.state is not None and self.state.get("pending"):
+                self.state["pending"] = None
+                self._save()
+
+    def mark_complete(self, fingerprint: str, chunks: Optional[int] = None) -> None:
+        """Writes the completion marker; call only after the store has applied every point"""
+        with self.lock:
+            state = self.state or self._empty_state()
+            state.update(complete=True, pending=None, fingerprint=fingerprint, completed_at=time.time())
+            if chunks is not None:
+                state["chunks"] = chunks
+            self.state = state
+            self._save()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.state = None
+            self._mtime = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def writer(self, storage, start: int = 0, every: Optional[int] = None) -> Callable[[List[Dict]], int]:
+        """
+        write_batch for ingest_pipeline.run_ingestion that checkpoints every `every` batches.
+        The store is flushed first, so a checkpoint never counts points that were still in flight.
+        """
+        every = every or get_checkpoint_interval()
+        pending = (self.state or {}).get("pending") or {}
+        progress = {"chunks": start, "batches": int(pending.get("batches", 0)) if start else 0, "since": 0}
+
+        def write_batch(batch: List[Dict]) -> int:
+            written = storage.add_many(batch, wait=False)
+            progress["chunks"] += len(batch)
+            progress["batches"] += 1
+            progress["since"] += 1
+            if progress["since"] >= every:
+                storage.flush()
+                self.commit(progress["chunks"], progress["batches"])
+                progress["since"] = 0
+            return written
+
+        return write_batch
+
+
+_checkpoints: Dict[str, IndexCheckpoint] = {}
+_checkpoints_lock = threading.Lock()
+
+
+def get_index_checkpoint(collection_name: str) -> IndexCheckpoint:
+    """
+    Returns the process-wide IndexCheckpoint of a collection; its lock serializes
+    indexing of the collection between sessions.
+    """
+    with _checkpoints_lock:
+        checkpoint = _checkpoints.get(collection_name)
+        if checkpoint is None:
+            checkpoint = IndexCheckpoint(collection_name)
+            _checkpoints[collection_name] = checkpoint
+        return checkpoint
@@ -0,0 +1,140 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .chunking import iter_chunks
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def get_ingest_batch_size() -> int:
+    """
+    จำนวน chunk ต่อหนึ่ง batch ของการ embed + upsert (ตั้งค่าได้ด้วย INGEST_BATCH_SIZE)
+    """
+    try:
+        return max(1, int(os.getenv("INGEST_BATCH_SIZE") or DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return DEFAULT_BATCH_SIZE
+
+
+def get_ingest_queue_size() -> int:
+    """
+    จำนวน batch สูงสุดที่รอ embed อยู่ในคิว (ตั้งค่าได้ด้วย INGEST_QUEUE_SIZE)
+    """
+    try:
+        return max(1, int(os.getenv("INGEST_QUEUE_SIZE") or DEFAULT_QUEUE_SIZE))
+    except ValueError:
+        return DEFAULT_QUEUE_SIZE
+
+
+def iter_page_chunks(
+    pages: Iterable[Dict],
+    chunk_text: Callable[[str], list],
+    workers: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    แปลง page records เป็น chunk dict ทีละช่วงหน้า (ไม่เก็บข้อความทั้งเอกสารไว้ในหน่วยความจำ)
+    แต่ละ chunk มี source, page_start/page_end และ char_start/char_end (ดู chunking.chunk_page)
+    """
+    return iter_chunks(pages, chunk_text, workers)
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_ingestion(
+    chunks: Iterable[Dict],
+    write_batch: Callable[[List[Dict]], int],
+    batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    start_id: int = 0,
+    assign_id: Optional[Callable[[int], Any]] = None,
+) -> Dict:
+    """
+    Streaming ingestion: extract -> chunk (producer thread) -> embed + upsert (caller thread).
+    - Batches are handed over through a bounded queue, so the producer blocks when
+      embedding falls behind (backpressure) and peak memory does not grow with document size
+    - Each batch is written as soon as it is ready, so the first vectors become
+      searchable before the whole corpus has been processed
+    - Point ids are assigned sequentially from start_id, or by assign_id(chunk index)
+    Returns ingestion statistics; re-raises the first producer or writer error.
+    """
+    batch_size = batch_size or get_ingest_batch_size()
+    handoff: "queue.Queue" = queue.Queue(maxsize=queue_size or get_ingest_queue_size())
+    errors: List[BaseException] = []
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for batch in iter_batches(chunks, batch_size):
+                while not stop.is_set():
+                    try:
+                        handoff.put(batch, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except BaseException as e:  # ส่งต่อ error ไปยัง thread หลัก
+            errors.append(e)
+        finally:
+            handoff.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+    started = time.time()
+    producer.start()
+
+    next_id = start_id
+    written = 0
+    batches = 0
+    try:
+        while True:
+            batch = handoff.get()
+            if batch is _DONE:
+                break
+            for chunk in batch:
+                chunk["id"] = assign_id(next_id - start_id) if assign_id else next_id
+                next_id += 1
+            written += write_batch(batch)
+            batches += 1
+            if batches == 1:
+                logger.info(f"First batch indexed after {time.time() - started:.2f}s")
+    except BaseException:
+        stop.set()
+        # ระบายคิวเพื่อให้ producer ที่รออยู่จบการทำงานได้
+        while producer.is_alive():
+            try:
+                handoff.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        raise
+    producer.join()
+    if errors:
+        raise errors[0]
+
+    elapsed = time.time() - started
+    stats = {
+        "chunks": written,
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(written / elapsed, 1) if elapsed > 0 else 0.0,
+        "next_id": next_id,
+    }
+    logger.info(f"Streaming ingestion finished: {stats}")
+    return stats
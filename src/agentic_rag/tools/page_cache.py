@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MAX_MB = 512
+
+
+class PageCache:
+    """
+    Persistent, content-addressed cache of extracted page records.
+    - Key: (file hash, page number, extractor version, OCR/extraction settings)
+    - Value: the page records (text already normalized by process_thai_text)
+    - Size-bounded: least recently used pages are evicted past max_bytes
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or os.path.join(get_cache_dir(), "page_cache.sqlite3")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("PAGE_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        # ใช้ได้จากหลาย thread (เช่น producer ของ ingestion pipeline) โดยคุมด้วย lock
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                file_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                settings TEXT NOT NULL,
+                records TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, page, settings)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self.conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_many(self, file_hash: str, pages: List[int], settings: str) -> Dict[int, List[Dict]]:
+        """Returns {page: records} for the cached subset of pages."""
+        if not self.enabled or not pages:
+            return {}
+        placeholders = ",".join("?" for _ in pages)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT page, records FROM pages WHERE file_hash = ? AND settings = ? AND page IN ({placeholders})",
+                [file_hash, settings, *pages],
+            ).fetchall()
+            if rows:
+                hit_placeholders = ",".join("?" for _ in rows)
+                self.conn.execute(
+                    f"UPDATE pages SET last_access = ? WHERE file_hash = ? AND settings = ? AND page IN ({hit_placeholders})",
+                    [time.time(), file_hash, settings, *[page for page, _ in rows]],
+                )
+                self.conn.commit()
+        return {page: json.loads(records) for page, records in rows}
+
+    def put(self, file_hash: str, page: int, settings: str, records: List[Dict]) -> None:
+        if not self.enabled:
+            return
+        data = json.dumps(records, ensure_ascii=False)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (file_hash, page, settings, records, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (file_hash, page, settings, data, len(data.encode("utf-8")), time.time()),
+            )
+            self.conn.commit()
+            self.evict()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drops least recently used pages until the cache is below max_bytes. Returns pages removed."""
+        with self._lock:
+            total = self.total_bytes()
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            # Evict down to 90% so we do not run eviction on every insert near the limit
+            target = int(self.max_bytes * 0.9)
+            for file_hash, page, settings, size in self.conn.execute(
+                "SELECT file_hash, page, settings, size FROM pages ORDER BY last_access ASC"
+            ).fetchall():
+                if total <= target:
+                    break
+                self.conn.execute(
+                    "DELETE FROM pages WHERE file_hash = ? AND page = ? AND settings = ?",
+                    (file_hash, page, settings),
+                )
+                total -= size
+                removed += 1
+            self.conn.commit()
+            return removed
+
+    def stats(self) -> Dict:
+        pages, files, size = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT file_hash), COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()
+        return {"path": self.path, "pages": pages, "files": files, "bytes": size, "max_bytes": self.max_bytes}
+
+    def list_files(self) -> List[Dict]:
+        rows = self.conn.execute(
+            "SELECT file_hash, settings, COUNT(*), SUM(size), MAX(last_access) FROM pages GROUP BY file_hash, settings"
+        ).fetchall()
+        return [
+            {"file_hash": h, "settings": s, "pages": n, "bytes": b, "last_access": t}
+            for h, s, n, b, t in rows
+        ]
+
+    def purge(self, file_hash: Optional[str] = None) -> int:
+        """Deletes all cached pages, or only those of one file. Returns pages removed."""
+        with self._lock:
+            if file_hash:
+                cur = self.conn.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+            else:
+                cur = self.conn.execute("DELETE FROM pages")
+            self.conn.commit()
+            if not file_hash:
+                self.conn.execute("VACUUM")
+            return cur.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_process_cache: Optional[PageCache] = None
+_process_cache_pid: Optional[int] = None
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    One PageCache per process (extraction workers open their own connection,
+    SQLite connections must not be shared across fork).
+    Returns None when the cache is disabled (PAGE_CACHE_MAX_MB=0) or unavailable.
+    """
+    global _process_cache, _process_cache_pid
+    if _process_cache is None or _process_cache_pid != os.getpid():
+        try:
+            _process_cache = PageCache()
+            _process_cache_pid = os.getpid()
+        except Exception as e:
+            logger.warning(f"Page cache unavailable: {str(e)}")
+            return None
+    return _process_cache if _process_cache.enabled else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or purge the PDF page extraction/OCR cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="show cache size and counts")
+    sub.add_parser("list", help="list cached files")
+    purge = sub.add_parser("purge", help="delete cached pages")
+    purge.add_argument("--file-hash", help="only purge pages of this file hash")
+    args = parser.parse_args(argv)
+
+    cache = PageCache()
+    try:
+        if args.command == "stats":
+            print(json.dumps(cache.stats(), indent=2))
+        elif args.command == "list":
+            for entry in cache.list_files():
+                print(f"{entry['file_hash']}  pages={entry['pages']}  bytes={entry['bytes']}  settings={entry['settings']}")
+        elif args.command == "purge":
+            removed = cache.purge(args.file_hash)
+            print(f"Removed {removed} cached page(s)")
+    finally:
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
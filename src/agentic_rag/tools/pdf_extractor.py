@@ -0,0 +1,471 @@
+import os
+import io
+import re
+import sys
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import pdfplumber
+import fitz  # PyMuPDF สำหรับอ่าน PDF
+import pytesseract
+from PIL import Image, ImageEnhance
+import cv2
+import numpy as np
+from .thai_text import SENT_ENGINE, WORD_ENGINE, dictionary_version, process_thai_text
+from .page_cache import get_page_cache
+from .fingerprint import file_fingerprint
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# หากจำเป็นให้กำหนด path ของ tesseract (ใน Windows ตัวอย่างเช่น)
+# ตั้งค่าไว้ระดับโมดูลเพื่อให้ worker process ที่ถูก spawn ได้ค่าเดียวกัน
+pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+# เพิ่มเลขเวอร์ชันเมื่อเปลี่ยนวิธีสกัด/ประมวลผลข้อความ เพื่อไม่ให้ใช้ผลจากแคชเก่า
+EXTRACTOR_VERSION = "3"
+OCR_LANG = "tha+eng"
+OCR_DPI = 300
+DEFAULT_PAGES_PER_SHARD = 8
+
+# โหมดการสกัด: "auto" เลือกวิธีเดียวต่อหน้า, "dual" รัน pdfplumber และ fitz ทั้งเอกสารแล้วต่อกัน (แบบเดิม)
+EXTRACT_MODES = ("auto", "dual")
+EXTRACT_PASSES = ["auto", "pdfplumber", "fitz"]
+# เกณฑ์คัดเลือก text layer
+MIN_TEXT_CHARS = 20
+MAX_BROKEN_RATIO = 0.02
+
+THAI_CHAR_RE = re.compile(r"[\u0E00-\u0E7F]")
+# สระบน/ล่างและวรรณยุกต์ที่ไม่ได้เกาะพยัญชนะ (ขึ้นต้นคำหรือถูกแยกด้วยช่องว่าง) เช่น "ไว ้", "ปที ี่"
+FLOATING_MARK_RE = re.compile(r"(?:^|\s)[\u0E31\u0E34-\u0E3A\u0E47-\u0E4E]", re.MULTILINE)
+# สระหน้า (เ แ โ ใ ไ) ที่ไม่มีพยัญชนะตามหลัง
+DANGLING_LEADING_VOWEL_RE = re.compile(r"[\u0E40-\u0E44](?![\u0E01-\u0E2E])")
+
+
+def get_extract_workers() -> int:
+    """
+    จำนวน worker process สำหรับสกัดข้อความ (ตั้งค่าได้ด้วย PDF_EXTRACT_WORKERS)
+    """
+    value = os.getenv("PDF_EXTRACT_WORKERS")
+    try:
+        workers = int(value) if value else (os.cpu_count() or 1)
+    except ValueError:
+        logger.warning(f"Invalid PDF_EXTRACT_WORKERS={value!r}, falling back to cpu_count")
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def get_extract_mode() -> str:
+    """
+    โหมดการสกัดข้อความ (ตั้งค่าได้ด้วย PDF_EXTRACT_MODE: auto หรือ dual)
+    """
+    mode = (os.getenv("PDF_EXTRACT_MODE") or "auto").lower()
+    if mode not in EXTRACT_MODES:
+        logger.warning(f"Unknown PDF_EXTRACT_MODE={mode!r}, using 'auto'")
+        return "auto"
+    return mode
+
+
+def get_pages_per_shard() -> int:
+    """
+    จำนวนหน้าต่อ shard หนึ่งงาน (ตั้งค่าได้ด้วย PDF_PAGES_PER_SHARD)
+    ค่าน้อยช่วยจำกัดหน่วยความจำสูงสุดของแต่ละ worker
+    """
+    value = os.getenv("PDF_PAGES_PER_SHARD")
+    try:
+        return max(1, int(value)) if value else DEFAULT_PAGES_PER_SHARD
+    except ValueError:
+        return DEFAULT_PAGES_PER_SHARD
+
+
+def preprocess_image(image: Image.Image) -> Image.Image:
+    """
+    ปรับปรุงคุณภาพของภาพก่อนทำ OCR เพื่อเพิ่มความแม่นยำ
+    """
+    # แปลงเป็น grayscale
+    if image.mode != 'L':
+        image = image.convert('L')
+
+    # ปรับความคมชัดและความสว่าง
+    image = ImageEnhance.Contrast(image).enhance(2.0)
+    image = ImageEnhance.Brightness(image).enhance(1.2)
+
+    # ลด noise และทำ adaptive thresholding ด้วย OpenCV
+    img_array = np.array(image)
+    img_array = cv2.fastNlMeansDenoising(img_array)
+    img_array = cv2.adaptiveThreshold(
+        img_array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2
+    )
+    return Image.fromarray(img_array)
+
+
+def ocr_image(image: Image.Image) -> str:
+    """
+    ทำ OCR ด้วยภาษาไทยและอังกฤษหลังปรับปรุงคุณภาพภาพ
+    """
+    return pytesseract.image_to_string(preprocess_image(image), lang=OCR_LANG)
+
+
+def _page_count(path: str) -> int:
+    try:
+        with fitz.open(path) as doc:
+            return len(doc)
+    except Exception as e:
+        logger.error(f"Cannot open PDF {path}: {str(e)}")
+        return 0
+
+
+def _page_record(path: str, page_num: int, pass_name: str, strategy: str, text: str, score: Optional[Dict] = None) -> Dict:
+    """
+    ผลลัพธ์ระดับหน้า: ข้อความที่ประมวลผลแล้วพร้อมข้อมูลว่าใช้วิธีใดสกัด
+    """
+    record = {
+        "source": path,
+        "page": page_num,
+        "pass": pass_name,
+        "strategy": strategy,
+        "text": process_thai_text(text) + "\n" if text and text.strip() else "",
+    }
+    record.update(score or score_text_layer(text or ""))
+    return record
+
+
+def score_text_layer(text: str) -> Dict:
+    """
+    ให้คะแนน text layer ของหน้า: จำนวนอักขระ สัดส่วนอักษรไทย และสัดส่วนสระ/วรรณยุกต์ที่หลุดตำแหน่ง
+    """
+    stripped = "".join(text.split())
+    chars = len(stripped)
+    thai = len(THAI_CHAR_RE.findall(stripped))
+    broken = len(FLOATING_MARK_RE.findall(text)) + len(DANGLING_LEADING_VOWEL_RE.findall(text))
+    return {
+        "chars": chars,
+        "thai_ratio": round(thai / chars, 4) if chars else 0.0,
+        "broken_ratio": round(broken / thai, 4) if thai else 0.0,
+    }
+
+
+def _ocr_fitz_page(doc: fitz.Document, page: fitz.Page) -> str:
+    """
+    OCR หน้าเดียว: ใช้ภาพที่ฝังในหน้าก่อน ถ้าไม่มีให้ render หน้าเป็นภาพ
+    """
+    page_images = _page_embedded_images(doc, page)
+    if page_images:
+        return "\n".join(ocr_image(img) for img in page_images)
+    pix = page.get_pixmap(dpi=OCR_DPI)
+    return ocr_image(Image.open(io.BytesIO(pix.tobytes("png"))))
+
+
+def _pdfplumber_pages(path: str, start: int, end: int) -> List[Dict]:
+    """
+    สกัดข้อความหน้า [start, end) ด้วย pdfplumber หากหน้าไม่มีข้อความให้ทำ OCR
+    """
+    records = []
+    try:
+        # pdfplumber ใช้เลขหน้าเริ่มที่ 1
+        with pdfplumber.open(path, pages=list(range(start + 1, end + 1))) as pdf:
+            for page_num, page in zip(range(start, end), pdf.pages):
+                page_text = page.extract_text()
+                if page_text and page_text.strip():
+                    records.append(_page_record(path, page_num, "pdfplumber", "pdfplumber", page_text))
+                    continue
+                try:
+                    ocr_text = ocr_image(page.to_image(resolution=OCR_DPI).original)
+                except Exception:
+                    ocr_text = ""
+                finally:
+                    # ปล่อย cache ของหน้าเพื่อคุมหน่วยความจำของ worker
+                    page.close()
+                records.append(_page_record(path, page_num, "pdfplumber", "ocr", ocr_text))
+    except Exception as e:
+        logger.error(f"pdfplumber failed on {path} pages {start}-{end}: {str(e)}")
+    return records
+
+
+def _page_embedded_images(doc: fitz.Document, page: fitz.Page) -> List[Image.Image]:
+    """
+    สกัดภาพที่ฝังอยู่ในหน้าเดียว (ไม่ดึงทั้งเอกสารเพื่อจำกัดหน่วยความจำ)
+    """
+    images = []
+    for img in page.get_images(full=True):
+        try:
+            base_image = doc.extract_image(img[0])
+            if base_image:
+                images.append(Image.open(io.BytesIO(base_image["image"])))
+        except Exception:
+            continue
+    return images
+
+
+def _fitz_pages(path: str, start: int, end: int) -> List[Dict]:
+    """
+    สกัดข้อความหน้า [start, end) ด้วย PyMuPDF หากหน้าไม่มีข้อความให้ OCR จากภาพที่ฝังหรือภาพที่ render
+    """
+    records = []
+    try:
+        with fitz.open(path) as doc:
+            for page_num in range(start, end):
+                page = doc[page_num]
+                page_text = page.get_text().strip()
+                if page_text:
+                    records.append(_page_record(path, page_num, "fitz", "fitz", page_text))
+                    continue
+                try:
+                    page_text = _ocr_fitz_page(doc, page)
+                except Exception:
+                    page_text = ""
+                records.append(_page_record(path, page_num, "fitz", "ocr", page_text))
+    except Exception as e:
+        logger.error(f"PyMuPDF failed on {path} pages {start}-{end}: {str(e)}")
+    return records
+
+
+def _auto_pages(path: str, start: int, end: int) -> List[Dict]:
+    """
+    สกัดหน้า [start, end) แบบรอบเดียว: ให้คะแนน text layer ของ fitz
+    แล้วเลือกใช้ fitz, pdfplumber หรือ OCR เพียงวิธีเดียวต่อหน้า
+    เปิดไฟล์จาก path (ไม่อ่านทั้งไฟล์เข้าหน่วยความจำ) จึงอ่านเฉพาะหน้าของ shard นี้
+    """
+    records = []
+    plumber = None
+    try:
+        with fitz.open(path) as doc:
+            for page_num in range(start, end):
+                page = doc[page_num]
+                fitz_text = page.get_text()
+                fitz_score = score_text_layer(fitz_text)
+
+                if fitz_score["chars"] < MIN_TEXT_CHARS:
+                    # แทบไม่มี text layer (หน้าสแกน) -> OCR
+                    try:
+                        ocr_text = _ocr_fitz_page(doc, page)
+                    except Exception:
+                        ocr_text = ""
+                    if ocr_text.strip() or not fitz_text.strip():
+                        records.append(_page_record(path, page_num, "auto", "ocr", ocr_text))
+                    else:
+                        records.append(_page_record(path, page_num, "auto", "fitz", fitz_text, fitz_score))
+                    continue
+
+                if fitz_score["broken_ratio"] <= MAX_BROKEN_RATIO:
+                    records.append(_page_record(path, page_num, "auto", "fitz", fitz_text, fitz_score))
+                    continue
+
+                # text layer ของ fitz มีสระลอย/เพี้ยน ลองเทียบกับ pdfplumber (เปิดเฉพาะหน้าของ shard)
+                try:
+                    if plumber is None:
+                        plumber = pdfplumber.open(path, pages=list(range(start + 1, end + 1)))
+                    plumber_page = plumber.pages[page_num - start]
+                    pp_text = plumber_page.extract_text() or ""
+                    plumber_page.close()
+                except Exception:
+                    pp_text = ""
+                pp_score = score_text_layer(pp_text)
+                if pp_score["chars"] >= MIN_TEXT_CHARS and pp_score["broken_ratio"] < fitz_score["broken_ratio"]:
+                    records.append(_page_record(path, page_num, "auto", "pdfplumber", pp_text, pp_score))
+                else:
+                    records.append(_page_record(path, page_num, "auto", "fitz", fitz_text, fitz_score))
+    except Exception as e:
+        logger.error(f"Single-pass extraction failed on {path} pages {start}-{end}: {str(e)}")
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return records
+
+
+def _cache_settings(mode: str) -> str:
+    """
+    ส่วนของคีย์แคชที่ขึ้นกับเวอร์ชันตัวสกัด การตั้งค่า OCR, engine ตัดคำ และพจนานุกรมคำ (pdpa_words.txt)
+    """
+    return (
+        f"v{EXTRACTOR_VERSION}|{mode}|ocr={OCR_LANG}@{OCR_DPI}|min={MIN_TEXT_CHARS}|broken={MAX_BROKEN_RATIO}"
+        f"|thai={WORD_ENGINE}/{SENT_ENGINE}|dict={dictionary_version()}"
+    )
+
+
+def _extract_range(path: str, start: int, end: int, mode: str) -> List[Dict]:
+    if mode == "dual":
+        return _pdfplumber_pages(path, start, end) + _fitz_pages(path, start, end)
+    return _auto_pages(path, start, end)
+
+
+def _shard_order(record: Dict) -> Tuple[int, int]:
+    # ลำดับเดียวกับการสกัดตรง: ตามรอบ (pass) แล้วตามหน้า
+    return EXTRACT_PASSES.index(record["pass"]), record["page"]
+
+
+def _cached_shard(task: Tuple[str, int, int, str, str]) -> Tuple[List[Dict], List[int]]:
+    """
+    ดึง records ของ shard จากแคช คืน (records ที่มีในแคช, หน้าที่ยังไม่มี)
+    """
+    path, start, end, mode, file_hash = task
+    cache = get_page_cache()
+    pages = list(range(start, end))
+    cached = cache.get_many(file_hash, pages, _cache_settings(mode)) if cache else {}
+    records = []
+    for page_records in cached.values():
+        records.extend(dict(r, source=path) for r in page_records)
+    records.sort(key=_shard_order)
+    return records, [p for p in pages if p not in cached]
+
+
+def _extract_shard(
+    task: Tuple[str, int, int, str, str],
+    cached: Optional[Tuple[List[Dict], List[int]]] = None,
+) -> List[Dict]:
+    """
+    งานของ worker หนึ่งชิ้น: สกัดช่วงหน้าของไฟล์ตามโหมดที่กำหนด
+    หน้าที่อยู่ในแคชแล้วจะไม่ถูกสกัด/OCR ซ้ำ ส่วนหน้าที่สกัดใหม่จะถูกบันทึกลงแคช
+    cached: ผลของ _cached_shard ที่ผู้เรียกอ่านไว้แล้ว (ไม่ต้องอ่านแคชซ้ำ)
+    records ถูกเรียงตามรอบและหน้าเสมอ แม้บางหน้าจะมาจากแคช
+    """
+    path, start, end, mode, file_hash = task
+    records, missing = cached if cached is not None else _cached_shard(task)
+    records = list(records)
+    cache = get_page_cache()
+    # สกัดเฉพาะช่วงหน้าที่ขาดต่อเนื่องกัน
+    runs = []
+    for page in missing:
+        if runs and runs[-1][1] == page:
+            runs[-1][1] = page + 1
+        else:
+            runs.append([page, page + 1])
+    for run_start, run_end in runs:
+        extracted = _extract_range(path, run_start, run_end, mode)
+        records.extend(extracted)
+        if cache:
+            by_page: Dict[int, List[Dict]] = {}
+            for r in extracted:
+                by_page.setdefault(r["page"], []).append({k: v for k, v in r.items() if k != "source"})
+            for page, page_records in by_page.items():
+                try:
+                    cache.put(file_hash, page, _cache_settings(mode), page_records)
+                except Exception as e:
+                    logger.warning(f"Cannot write page cache for {path} page {page}: {str(e)}")
+    records.sort(key=_shard_order)
+    return records
+
+
+def _make_pool(workers: int) -> ProcessPoolExecutor:
+    # รีไซเคิล worker หลังทำงานจำนวนหนึ่ง เพื่อไม่ให้หน่วยความจำจาก OCR/render สะสม
+    if sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=16)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _shard_tasks(paths: List[str], pages_per_shard: int, mode: str) -> Iterator[Tuple[int, Tuple[str, int, int, str, str]]]:
+    # สร้างงานแบบ lazy ทีละไฟล์ เพื่อไม่ต้องอ่าน/hash ทุกไฟล์ก่อนเริ่มสกัด
+    for file_idx, path in enumerate(paths):
+        page_count = _page_count(path)
+        if not page_count:
+            continue
+        file_hash = file_fingerprint(path)
+        for start in range(0, page_count, pages_per_shard):
+            yield file_idx, (path, start, min(start + pages_per_shard, page_count), mode, file_hash)
+
+
+def iter_pdf_shards(
+    paths: List[str],
+    workers: Optional[int] = None,
+    pages_per_shard: Optional[int] = None,
+    mode: Optional[str] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[Tuple[int, List[Dict]]]:
+    """
+    สกัดข้อความแบบ streaming: yield (ลำดับไฟล์, page records ของ shard) ตามลำดับไฟล์และลำดับหน้า
+    ส่งงานเข้า process pool ล่วงหน้าไม่เกิน max_pending shard (backpressure) เพื่อคุมหน่วยความจำ
+    """
+    workers = workers or get_extract_workers()
+    pages_per_shard = pages_per_shard or get_pages_per_shard()
+    mode = mode or get_extract_mode()
+
+    if workers <= 1:
+        for file_idx, task in _shard_tasks(paths, pages_per_shard, mode):
+            yield file_idx, _extract_shard(task)
+        return
+
+    max_pending = max_pending or workers * 2
+    pending = deque()
+    pool = None
+    cached_pages = 0
+    try:
+        for file_idx, task in _shard_tasks(paths, pages_per_shard, mode):
+            records, missing = _cached_shard(task)
+            if missing:
+                if pool is None:
+                    logger.info(f"Extracting page shards from {len(paths)} file(s) with {workers} workers")
+                    pool = _make_pool(workers)
+                pending.append((file_idx, pool.submit(_extract_shard, task, (records, missing))))
+            else:
+                # ทั้ง shard อยู่ในแคชแล้ว ไม่ต้องส่งไปยัง worker
+                pending.append((file_idx, records))
+                cached_pages += task[2] - task[1]
+            # ส่งผลออกตามลำดับ: ปล่อย shard หัวคิวเมื่อพร้อม หรือรอเมื่อคิวเต็ม
+            while pending and (len(pending) >= max_pending or not isinstance(pending[0][1], Future)):
+                file_idx, result = pending.popleft()
+                yield file_idx, result.result() if isinstance(result, Future) else result
+        while pending:
+            file_idx, result = pending.popleft()
+            yield file_idx, result.result() if isinstance(result, Future) else result
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if cached_pages:
+            logger.info(f"Page cache hit for {cached_pages} page(s)")
+
+
+def iter_pdf_pages(paths: List[str], **kwargs) -> Iterator[Dict]:
+    """
+    yield page records ทีละหน้าตามลำดับ (ดู iter_pdf_shards สำหรับพารามิเตอร์)
+    """
+    for _, records in iter_pdf_shards(paths, **kwargs):
+        yield from records
+
+
+def extract_pdf_pages(
+    paths: List[str],
+    workers: Optional[int] = None,
+    pages_per_shard: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> List[List[Dict]]:
+    """
+    สกัดข้อความจากหลายไฟล์ PDF โดยแบ่งหน้าออกเป็น shard แล้วกระจายไปยัง process pool
+    คืน page records ของแต่ละไฟล์ตามลำดับ paths และลำดับการอ่าน
+    """
+    pages = [[] for _ in paths]
+    for file_idx, records in iter_pdf_shards(paths, workers, pages_per_shard, mode):
+        pages[file_idx].extend(records)
+    for records in pages:
+        # โหมด dual: pdfplumber ทุกหน้าก่อน ตามด้วย fitz ทุกหน้า (เหมือนพฤติกรรมเดิม)
+        records.sort(key=lambda r: (EXTRACT_PASSES.index(r["pass"]), r["page"]))
+    return pages
+
+
+def extract_pdf_files(
+    paths: List[str],
+    workers: Optional[int] = None,
+    pages_per_shard: Optional[int] = None,
+    mode: Optional[str] = None,
+    report: Optional[List[Dict]] = None,
+) -> List[str]:
+    """
+    สกัดข้อความของแต่ละไฟล์ตามลำดับ paths หากส่ง report มาจะเติมรายงานกลยุทธ์รายหน้า (ไม่รวมข้อความ)
+    """
+    texts = []
+    for records in extract_pdf_pages(paths, workers, pages_per_shard, mode):
+        passes = [p for p in EXTRACT_PASSES if any(r["pass"] == p for r in records)]
+        texts.append("\n".join("".join(r["text"] for r in records if r["pass"] == p) for p in passes))
+        if report is not None:
+            report.extend({k: v for k, v in r.items() if k != "text"} for r in records)
+    return texts
+
+
+def summarize_strategies(report: List[Dict]) -> Dict[str, int]:
+    """
+    นับจำนวนหน้าที่ใช้แต่ละกลยุทธ์ (fitz / pdfplumber / ocr)
+    """
+    summary: Dict[str, int] = {}
+    for entry in report:
+        summary[entry["strategy"]] = summary.get(entry["strategy"], 0) + 1
+    return summary
@@ -0,0 +1,195 @@
+import os
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_QDRANT_URL = "http://localhost:6333"
+VECTOR_STORES = ("qdrant", "qdrant-local", "numpy")
+LOCAL_PREFIXES = ("path:", "file:")
+
+_local_clients: Dict[str, QdrantClient] = {}
+_local_clients_lock = threading.Lock()
+_server_clients: Dict[Tuple, QdrantClient] = {}
+_async_clients: Dict[Tuple, AsyncQdrantClient] = {}
+_server_clients_lock = threading.Lock()
+_io_loop: Optional[asyncio.AbstractEventLoop] = None
+_io_loop_lock = threading.Lock()
+
+
+def _env_flag(name: str) -> bool:
+    return (os.getenv(name) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def _server_options() -> Dict[str, Any]:
+    """
+    Connection settings shared by the sync and async server clients:
+    - QDRANT_PREFER_GRPC: talk gRPC on QDRANT_GRPC_PORT (one multiplexed HTTP/2 channel)
+    - QDRANT_POOL_SIZE: keep-alive connections of the REST connection pool
+    - QDRANT_TIMEOUT: request timeout in seconds
+    """
+    pool_size = _env_int("QDRANT_POOL_SIZE", 16)
+    return {
+        "prefer_grpc": _env_flag("QDRANT_PREFER_GRPC"),
+        "grpc_port": _env_int("QDRANT_GRPC_PORT", 6334),
+        "timeout": _env_int("QDRANT_TIMEOUT", 30),
+        "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    }
+
+
+def get_vector_store_kind() -> str:
+    """
+    Storage backend selected by VECTOR_STORE:
+    - "qdrant": Qdrant server at QDRANT_URL (default)
+    - "qdrant-local": embedded Qdrant persisted under QDRANT_PATH, no server
+    - "numpy": in-process brute-force index (see vector_store.NumpyVectorStore)
+    """
+    kind = (os.getenv("VECTOR_STORE") or "qdrant").strip().lower()
+    if kind not in VECTOR_STORES:
+        logger.warning(f"Unknown VECTOR_STORE {kind!r}, using qdrant")
+        return "qdrant"
+    return kind
+
+
+def get_local_qdrant_path() -> str:
+    return os.getenv("QDRANT_PATH") or get_cache_dir("qdrant")
+
+
+def _local_client(location: str) -> QdrantClient:
+    """
+    Embedded clients are shared per path: local mode locks its storage directory,
+    so a second client on the same path in this process would fail.
+    """
+    with _local_clients_lock:
+        client = _local_clients.get(location)
+        if client is None:
+            if location == ":memory:":
+                client = QdrantClient(location=":memory:")
+            else:
+                os.makedirs(location, exist_ok=True)
+                client = QdrantClient(path=location)
+            _local_clients[location] = client
+            logger.info(f"Using embedded Qdrant at {location}")
+        return client
+
+
+def get_qdrant_client(url: Optional[str] = None, api_key: Optional[str] = None) -> QdrantClient:
+    """
+    Qdrant client for a location:
+    - ":memory:" -> embedded in-memory instance
+    - "path:/dir" (or "file:/dir") -> embedded instance persisted in /dir
+    - any other url with VECTOR_STORE=qdrant-local/numpy -> embedded instance in QDRANT_PATH
+      (the no-server modes never open network connections)
+    - anything else -> Qdrant server over HTTP
+    """
+    if url == ":memory:":
+        return _local_client(":memory:")
+    for prefix in LOCAL_PREFIXES:
+        if url and url.startswith(prefix):
+            return _local_client(os.path.abspath(os.path.expanduser(url[len(prefix):])))
+    if get_vector_store_kind() != "qdrant":
+        return _local_client(get_local_qdrant_path())
+    return _server_client(url or DEFAULT_QDRANT_URL, api_key)
+
+
+def _server_client(url: str, api_key: Optional[str]) -> QdrantClient:
+    """
+    Server clients are shared per (url, api_key, transport) by every store and chat
+    session in the process, so they reuse one connection pool / gRPC channel.
+    QdrantClient is thread-safe for concurrent requests.
+    """
+    options = _server_options()
+    key = (url, api_key, options["prefer_grpc"])
+    with _server_clients_lock:
+        client = _server_clients.get(key)
+        if client is None:
+            client = QdrantClient(url=url, api_key=api_key, **options)
+            _server_clients[key] = client
+            logger.info(f"Connected to Qdrant at {url} ({'gRPC' if options['prefer_grpc'] else 'REST'})")
+        return client
+
+
+def get_async_qdrant_client(url: Optional[str] = None, api_key: Optional[str] = None) -> Optional[AsyncQdrantClient]:
+    """
+    Shared AsyncQdrantClient for a server location, one per process.
+    Its HTTP/gRPC connections belong to the background I/O loop (see run_async), so
+    callers on any event loop must await its requests through on_io_loop(); a client
+    per caller loop would leak a connection pool for every asyncio.run().
+    Returns None for embedded locations: local mode keeps a lock on its storage,
+    so async callers run the shared sync client in a worker thread instead.
+    """
+    if url == ":memory:" or (url and url.startswith(LOCAL_PREFIXES)) or get_vector_store_kind() != "qdrant":
+        return None
+    url = url or DEFAULT_QDRANT_URL
+    options = _server_options()
+    key = (url, api_key, options["prefer_grpc"])
+    with _server_clients_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = _create_on_io_loop(lambda: AsyncQdrantClient(url=url, api_key=api_key, **options))
+            _async_clients[key] = client
+        return client
+
+
+def _run_io_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def _get_io_loop() -> asyncio.AbstractEventLoop:
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = asyncio.new_event_loop()
+            threading.Thread(target=_run_io_loop, args=(_io_loop,), name="qdrant-io", daemon=True).start()
+    return _io_loop
+
+
+def _create_on_io_loop(factory: Callable[[], Any]) -> Any:
+    """Constructs an async client inside the I/O loop (gRPC channels bind to the loop they are created in)"""
+    loop = _get_io_loop()
+    try:
+        if asyncio.get_running_loop() is loop:
+            return factory()
+    except RuntimeError:
+        pass
+
+    async def create() -> Any:
+        return factory()
+
+    return asyncio.run_coroutine_threadsafe(create(), loop).result()
+
+
+def run_async(coro: Awaitable) -> concurrent.futures.Future:
+    """
+    Schedules a coroutine on the process-wide background I/O loop and returns a
+    concurrent Future, so synchronous code (Streamlit, LangGraph nodes) can start
+    Qdrant I/O and keep going — e.g. save chat history while the LLM is generating.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_io_loop())
+
+
+async def on_io_loop(coro: Awaitable) -> Any:
+    """
+    Awaits a coroutine that uses the shared AsyncQdrantClient from any event loop:
+    it runs on the background I/O loop, and cancelling the caller cancels it there.
+    """
+    loop = _get_io_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
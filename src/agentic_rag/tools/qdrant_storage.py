@@ -1,19 +1,300 @@
-from typing import Optional, List, Dict, Any
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, Distance, VectorParams
-from sentence_transformers import SentenceTransformer
+import abc
+from typing import Optional, List, Dict, Any, Iterable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client.local.qdrant_local import QdrantLocal
+from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, MatchAny, Range, Distance, VectorParams, PointIdsList, FilterSelector, HasIdCondition, PayloadSchemaType, SparseVectorParams, SparseVector, Modifier, QueryRequest
+from .bm25 import HYBRID_CANDIDATES, SPARSE_VECTOR_NAME, document_sparse_vector, get_retrieval_mode, query_sparse_vector, reciprocal_rank_fusion
+from .embedding_backends import DEFAULT_BACKEND, create_backend, get_backend_name
+from .embedding_cache import get_embedding_cache
+from .qdrant_clients import get_async_qdrant_client, get_qdrant_client, on_io_loop
+from .collection_profiles import get_profile, hnsw_config, quantization_config, search_params
+from .collection_versions import CollectionVersions, build_lock
+import os
+import time
+import asyncio
 import hashlib
+import logging
+import threading
 import uuid
 
+logger = logging.getLogger("DocumentSearchTool")
+
+# Payload fields used for filtered search and citations (see chunking.chunk_page)
+PAYLOAD_INDEXES = {
+    "source": PayloadSchemaType.KEYWORD,
+    "page_start": PayloadSchemaType.INTEGER,
+    "page_end": PayloadSchemaType.INTEGER,
+}
+RANGE_KEYS = ("gt", "gte", "lt", "lte")
+
+DEFAULT_EMBED_BATCH_SIZE = 32
+DEFAULT_UPSERT_BATCH_SIZE = 256
+DEFAULT_UPSERT_WORKERS = 4
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
 class MyEmbedder:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
-        self.vector_size = self.model.get_sentence_embedding_dimension()
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: Optional[str] = None):
+        self.model_name = model_name
+        try:
+            self.backend = create_backend(model_name, backend)
+        except Exception as e:
+            if (backend or get_backend_name()) == DEFAULT_BACKEND:
+                raise
+            logger.error(f"Embedding backend {backend or get_backend_name()} unavailable, falling back to {DEFAULT_BACKEND}: {str(e)}")
+            self.backend = create_backend(model_name, DEFAULT_BACKEND)
+        self.vector_size = self.backend.vector_size
+        # Persistent (model, sha1(text)) -> vector store; None when disabled.
+        # Non-reference backends get their own cache so their vectors never mix with fp32 ones.
+        cache_name = model_name if self.backend.name == DEFAULT_BACKEND else f"{model_name}@{self.backend.name}"
+        self.cache = get_embedding_cache(cache_name, self.vector_size)
 
     def encode(self, text: str):
-        return self.model.encode(text).tolist()
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Encodes texts, serving unchanged texts from the embedding cache and
+        running the model only on the misses.
+        """
+        if self.cache is None:
+            return self.backend.encode(texts, batch_size=batch_size).tolist()
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.backend.encode([texts[i] for i in missing], batch_size=batch_size)
+            self.cache.put_many([texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+class VectorStore(abc.ABC):
+    """
+    Interface shared by the vector storage backends (QdrantStorage, vector_store.NumpyVectorStore).
+    Chunks are dicts with "text" and an optional "id"; the whole chunk is stored as payload.
+    A backend missing one of the abstract methods fails when it is instantiated.
+    """
+    collection_name: str
+    is_local = False
+    # Physical version behind collection_name (set by rebuild()); "" for unversioned collections
+    generation = ""
+
+    def add(self, chunk: dict):
+        self.add_many([chunk])
+
+    @abc.abstractmethod
+    def add_many(self, chunks: List[dict], wait: bool = True) -> int:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def supports_sparse(self) -> bool:
+        return False
+
+    @property
+    def retrieval_mode(self) -> str:
+        """RETRIEVAL_MODE, downgraded to dense when the store has no BM25 index"""
+        mode = get_retrieval_mode()
+        return mode if self.supports_sparse else "dense"
+
+    def search(
+        self,
+        query: str,
+        limit: int = 3,
+        filter: Optional[dict] = None,
+        score_threshold: float = 0,
+        query_vector=None,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Dense, sparse (BM25) or hybrid search according to RETRIEVAL_MODE.
+        Hybrid takes limit * HYBRID_CANDIDATES candidates from each side and fuses them
+        with reciprocal rank fusion; score_threshold applies to the dense side.
+        query_vector: embedding of `query` the caller already has (skips encoding it again).
+        with_vectors: results are copies of the payloads with the stored dense vector under "vector".
+        """
+        mode = self.retrieval_mode
+        if mode == "dense":
+            return self._dense_search(query, limit, filter, score_threshold, query_vector, with_vectors)
+        if mode == "sparse":
+            return self._sparse_search(query, limit, filter, with_vectors)
+        candidates = limit * HYBRID_CANDIDATES
+        return reciprocal_rank_fusion(
+            [
+                self._dense_search(query, candidates, filter, score_threshold, query_vector, with_vectors),
+                self._sparse_search(query, candidates, filter, with_vectors),
+            ],
+            limit,
+        )
+
+    @abc.abstractmethod
+    def _dense_search(
+        self,
+        query: str,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        query_vector=None,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _sparse_search(self, query: str, limit: int, filter: Optional[dict], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        return []
+
+    def search_many(
+        self,
+        queries: List[str],
+        limit: int = 3,
+        filter: Optional[dict] = None,
+        score_threshold: float = 0,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Searches several queries at once: one batched encode of all queries and one
+        batched lookup in the backend (_search_batch), fused per query like search().
+        Returns [{"query", "results", "timings": {"encode_ms", "search_ms", "total_ms"}}];
+        encode/search timings are each query's share of the batched calls.
+        with_vectors: as in search(); each item also carries its "query_vector" (None in sparse mode).
+        """
+        if not queries:
+            return []
+        mode = self.retrieval_mode
+        candidates = limit * HYBRID_CANDIDATES if mode == "hybrid" else limit
+        started = time.perf_counter()
+        vectors = self.embedder.encode_many(list(queries)) if mode != "sparse" else [None] * len(queries)
+        encoded = time.perf_counter()
+        dense, sparse = self._search_batch(list(queries), vectors, mode, candidates, filter, score_threshold, with_vectors)
+        searched = time.perf_counter()
+        share = 1000 / len(queries)
+        batch = []
+        for i, query in enumerate(queries):
+            fuse_started = time.perf_counter()
+            if mode == "dense":
+                results = dense[i][:limit]
+            elif mode == "sparse":
+                results = sparse[i][:limit]
+            else:
+                results = reciprocal_rank_fusion([dense[i], sparse[i]], limit)
+            encode_ms = (encoded - started) * share
+            search_ms = (searched - encoded) * share
+            item = {
+                "query": query,
+                "results": results,
+                "timings": {
+                    "encode_ms": round(encode_ms, 3),
+                    "search_ms": round(search_ms, 3),
+                    "total_ms": round(encode_ms + search_ms + (time.perf_counter() - fuse_started) * 1000, 3),
+                },
+            }
+            if with_vectors:
+                item["query_vector"] = vectors[i]
+            batch.append(item)
+        return batch
+
+    @abc.abstractmethod
+    def _search_batch(
+        self,
+        queries: List[str],
+        vectors: List,
+        mode: str,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        with_vectors: bool = False,
+    ):
+        """
+        (dense result lists, sparse result lists) per query for search_many.
+        """
+        raise NotImplementedError
+
+    async def asearch(self, query: str, limit: int = 3, filter: Optional[dict] = None, score_threshold: float = 0) -> List[Dict[str, Any]]:
+        """Async search; backends without native async I/O run search() in a worker thread."""
+        return await asyncio.to_thread(self.search, query, limit, filter, score_threshold)
+
+    async def aadd_many(self, chunks: List[dict], wait: bool = True) -> int:
+        return await asyncio.to_thread(self.add_many, chunks, wait)
+
+    @abc.abstractmethod
+    def delete_points(self, ids: List) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_where(self, filter: dict, keep_ids: Optional[List] = None) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def rebuild(self, populate: Callable[["VectorStore"], Any], retention: Optional[int] = None) -> str:
+        """
+        Re-indexes the collection: populate(store) writes every chunk into the given store.
+        Backends without versioning rebuild in place, so searches see partial data meanwhile.
+        Returns the name of the collection that now serves the data.
+        """
+        self.reset()
+        populate(self)
+        self.flush()
+        return self.collection_name
+
+    @abc.abstractmethod
+    def has_data(self) -> bool:
+        raise NotImplementedError
+
+    def _point_id(self, chunk: dict):
+        point_id = chunk.get('id')
+        if point_id is None:
+            point_id = self._generate_id(chunk)
+        # Qdrant requires point_id to be int or UUID string; ใช้ hash เป็น UUID-like string แบบคงที่
+        if isinstance(point_id, int):
+            return point_id
+        try:
+            return str(uuid.UUID(str(point_id)))
+        except Exception:
+            # แปลง hash เป็น UUID แบบคงที่ (uuid5) เพื่อให้ upsert ทับรายการเดิม ไม่สร้างซ้ำ
+            return str(uuid.uuid5(uuid.NAMESPACE_OID, str(point_id)))
+
+    def bulk_ingest(self, chunks: Iterable[dict], batch_size: int = 512) -> Dict[str, Any]:
+        """
+        Indexes an iterable of chunk dicts (with optional "id") and returns throughput statistics.
+        """
+        started = time.time()
+        before = dict(self.ingest_stats)
+        batch: List[dict] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                self.add_many(batch, wait=False)
+                batch = []
+        self.add_many(batch, wait=False)
+        self.flush()
+        return self.throughput(started, before)
+
+    def throughput(self, started: float, before: Dict[str, Any]) -> Dict[str, Any]:
+        elapsed = time.time() - started
+        written = self.ingest_stats["chunks"] - before["chunks"]
+        stats = {
+            "chunks": written,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(written / elapsed, 1) if elapsed > 0 else 0.0,
+            "embed_seconds": round(self.ingest_stats["embed_seconds"] - before["embed_seconds"], 3),
+            "upsert_requests": self.ingest_stats["upsert_requests"] - before["upsert_requests"],
+        }
+        logger.info(f"Bulk ingest into {self.collection_name}: {stats}")
+        return stats
 
-class QdrantStorage:
+    def _generate_id(self, chunk: dict) -> str:
+        return hashlib.sha1(chunk['text'].encode('utf-8')).hexdigest()
+
+class QdrantStorage(VectorStore):
     """
     Handles embeddings for memory entries using Qdrant.
     """
@@ -23,83 +304,442 @@ class QdrantStorage:
         qdrant_location: str,
         qdrant_api_key: str,
         embedder: Optional[MyEmbedder] = None,
+        profile: Optional[str] = None,
     ):
         self.type = type
-        self.embedder = embedder or MyEmbedder()
-        self.client = QdrantClient(
-            url=qdrant_location,
-            api_key=qdrant_api_key
-        )
+        if embedder is None:
+            from .embedder_registry import get_embedder
+            embedder = get_embedder()
+        self.embedder = embedder
+        # qdrant_location: server URL, ":memory:" or "path:/dir" for embedded mode (see qdrant_clients)
+        self.qdrant_location = qdrant_location
+        self.qdrant_api_key = qdrant_api_key
+        self.client = get_qdrant_client(qdrant_location, qdrant_api_key)
         self.collection_name = f"rag_{type}"
         self.vector_size = self.embedder.vector_size
+        # HNSW / quantization / on-disk settings from config/collections.yaml
+        self.profile = get_profile(self.collection_name, profile)
+        self.search_params = search_params(self.profile)
+        self.embed_batch_size = _env_int("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE)
+        self.upsert_batch_size = _env_int("UPSERT_BATCH_SIZE", DEFAULT_UPSERT_BATCH_SIZE)
+        self.upsert_workers = _env_int("UPSERT_WORKERS", DEFAULT_UPSERT_WORKERS)
+        if self.is_local:
+            # Embedded (local/in-memory) mode is not safe for concurrent writes
+            self.upsert_workers = 1
+        self._upsert_pool: Optional[ThreadPoolExecutor] = None
+        self._pending: List = []
+        self._pending_lock = threading.Lock()
+        self._last_points: List[PointStruct] = []
+        self.ingest_stats = {"chunks": 0, "embed_seconds": 0.0, "upsert_requests": 0}
+        # collection_name may be an alias over blue/green versions (see collection_versions)
+        self.versions = CollectionVersions(self.client, self.collection_name)
         self._ensure_collection()
 
+    @property
+    def is_local(self) -> bool:
+        return isinstance(getattr(self.client, "_client", None), QdrantLocal)
+
     def _ensure_collection(self):
-        if not self.client.collection_exists(self.collection_name):
-            self.client.recreate_collection(
+        """
+        Creates the collection with its profile. Profiles only apply at creation;
+        existing collections keep their settings until they are re-created.
+        """
+        self.generation = self.versions.current() or ""
+        if not self.generation and not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.vector_size,
-                    distance=Distance.COSINE
-                )
+                    distance=Distance.COSINE,
+                    on_disk=self.profile["on_disk"],
+                ),
+                sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)},
+                hnsw_config=hnsw_config(self.profile),
+                quantization_config=quantization_config(self.profile),
+                on_disk_payload=self.profile["on_disk_payload"],
             )
+            logger.info(f"Created collection {self.collection_name} with profile {self.profile['name']}")
+        self._has_sparse = self._collection_has_sparse()
+        self._ensure_payload_indexes()
+
+    def _collection_has_sparse(self) -> bool:
+        """
+        Collections created before hybrid retrieval have no BM25 sparse vector
+        (it cannot be added in place); they keep working with dense search until re-indexed.
+        """
+        try:
+            params = self.client.get_collection(self.collection_name).config.params
+            if SPARSE_VECTOR_NAME in (params.sparse_vectors or {}):
+                return True
+            logger.info(f"Collection {self.collection_name} has no {SPARSE_VECTOR_NAME} sparse vectors; using dense search")
+        except Exception as e:
+            logger.warning(f"Cannot read sparse vector config of {self.collection_name}: {str(e)}")
+        return False
+
+    @property
+    def supports_sparse(self) -> bool:
+        return self._has_sparse
+
+    def _vector(self, chunk: dict, dense):
+        if not self._has_sparse:
+            return dense
+        indices, values = document_sparse_vector(chunk['text'])
+        return {"": dense, SPARSE_VECTOR_NAME: SparseVector(indices=indices, values=values)}
+
+    def _ensure_payload_indexes(self):
+        """
+        Creates the keyword/integer payload indexes that back filtered search by document and page.
+        Existing collections get the missing indexes added in place.
+        """
+        try:
+            existing = self.client.get_collection(self.collection_name).payload_schema or {}
+            for field, schema in PAYLOAD_INDEXES.items():
+                if field not in existing:
+                    self.client.create_payload_index(
+                        collection_name=self.collection_name,
+                        field_name=field,
+                        field_schema=schema,
+                    )
+        except Exception as e:
+            logger.warning(f"Cannot create payload indexes for {self.collection_name}: {str(e)}")
 
     def add(self, chunk: dict):
         vector = self.embedder.encode(chunk['text'])
-        point_id = chunk.get('id') or self._generate_id(chunk)
-        # Qdrant requires point_id to be int or UUID string; ใช้ hash เป็น UUID-like string แบบคงที่
-        if isinstance(point_id, int):
-            valid_id = point_id
-        else:
-            try:
-                valid_id = str(uuid.UUID(str(point_id)))
-            except Exception:
-                # ใช้ hash เดิมเป็น string id เพื่อให้ upsert ทับรายการเดิม ไม่สร้างซ้ำ
-                valid_id = str(point_id)
         self.client.upsert(
             collection_name=self.collection_name,
             points=[PointStruct(
-                id=valid_id,
-                vector=vector,
+                id=self._point_id(chunk),
+                vector=self._vector(chunk, vector),
                 payload=chunk
             )]
         )
 
-    def search(
+    def add_many(self, chunks: List[dict], wait: bool = True) -> int:
+        """
+        Embeds chunks in batches of embed_batch_size and upserts them in parallel
+        batches of upsert_batch_size with wait=False.
+        With wait=True the call returns after flush(); otherwise the upserts stay
+        in flight and the caller must call flush() once at the end of ingestion.
+        Returns the number of points submitted.
+        """
+        if not chunks:
+            return 0
+        started = time.time()
+        vectors = self.embedder.encode_many([chunk['text'] for chunk in chunks], batch_size=self.embed_batch_size)
+        self.ingest_stats["embed_seconds"] += time.time() - started
+        points = [
+            PointStruct(id=self._point_id(chunk), vector=self._vector(chunk, vector), payload=chunk)
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        if self._upsert_pool is None:
+            self._upsert_pool = ThreadPoolExecutor(max_workers=self.upsert_workers, thread_name_prefix="qdrant-upsert")
+        for i in range(0, len(points), self.upsert_batch_size):
+            batch = points[i:i + self.upsert_batch_size]
+            future = self._upsert_pool.submit(
+                self.client.upsert, collection_name=self.collection_name, points=batch, wait=False
+            )
+            with self._pending_lock:
+                self._pending.append(future)
+                self._last_points = batch
+            self.ingest_stats["upsert_requests"] += 1
+        self.ingest_stats["chunks"] += len(points)
+        if wait:
+            self.flush()
+        return len(points)
+
+    def flush(self) -> None:
+        """
+        Barrier for add_many(wait=False): waits for every in-flight upsert request,
+        then re-sends the last batch with wait=True. Updates are applied in order,
+        so once it returns all earlier points are searchable.
+        Raises the first upsert error.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+            last_points, self._last_points = self._last_points, []
+        errors = []
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        if last_points:
+            self.client.upsert(collection_name=self.collection_name, points=last_points, wait=True)
+
+    @staticmethod
+    def _payload(point, with_vectors: bool) -> Dict[str, Any]:
+        if not with_vectors:
+            return point.payload
+        vector = point.vector
+        if isinstance(vector, dict):
+            # Collections with a sparse vector store the dense one under the default name
+            vector = vector.get("")
+        return dict(point.payload, vector=vector)
+
+    def _dense_search(
         self,
         query: str,
-        limit: int = 3,
-        filter: Optional[dict] = None,
-        score_threshold: float = 0,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        query_vector=None,
+        with_vectors: bool = False,
     ) -> List[Dict[str, Any]]:
-        vector = self.embedder.encode(query)
-        qdrant_filter = None
-        if filter:
-            qdrant_filter = Filter(
-                must=[FieldCondition(key=k, match=MatchValue(value=v)) for k, v in filter.items()]
-            )
+        vector = query_vector if query_vector is not None else self.embedder.encode(query)
+        qdrant_filter = self._build_filter(filter)
         results = self.client.search(
             collection_name=self.collection_name,
             query_vector=vector,
             limit=limit,
             query_filter=qdrant_filter,
-            score_threshold=score_threshold
+            score_threshold=score_threshold,
+            search_params=self.search_params,
+            with_vectors=with_vectors,
+        )
+        return [self._payload(r, with_vectors) for r in results]
+
+    def _sparse_query(self, query: str) -> Optional[SparseVector]:
+        indices, values = query_sparse_vector(query)
+        if not indices:
+            return None
+        return SparseVector(indices=indices, values=values)
+
+    def _sparse_search(self, query: str, limit: int, filter: Optional[dict], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        sparse = self._sparse_query(query)
+        if sparse is None:
+            return []
+        results = self.client.query_points(
+            collection_name=self.collection_name,
+            query=sparse,
+            using=SPARSE_VECTOR_NAME,
+            limit=limit,
+            query_filter=self._build_filter(filter),
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        return [self._payload(r, with_vectors) for r in results.points]
+
+    def _search_batch(
+        self,
+        queries: List[str],
+        vectors: List,
+        mode: str,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        with_vectors: bool = False,
+    ):
+        """
+        Dense and sparse requests for every query go to Qdrant's batch query endpoint
+        in a single round-trip.
+        """
+        qdrant_filter = self._build_filter(filter)
+        requests: List[QueryRequest] = []
+        slots = []  # (kind, query index) of each request
+        for i, query in enumerate(queries):
+            if mode != "sparse":
+                requests.append(QueryRequest(
+                    query=vectors[i],
+                    filter=qdrant_filter,
+                    limit=limit,
+                    score_threshold=score_threshold or None,
+                    params=self.search_params,
+                    with_payload=True,
+                    with_vector=with_vectors,
+                ))
+                slots.append(("dense", i))
+            if mode != "dense":
+                sparse = self._sparse_query(query)
+                if sparse is not None:
+                    requests.append(QueryRequest(
+                        query=sparse,
+                        using=SPARSE_VECTOR_NAME,
+                        filter=qdrant_filter,
+                        limit=limit,
+                        with_payload=True,
+                        with_vector=with_vectors,
+                    ))
+                    slots.append(("sparse", i))
+        dense: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        sparse_results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        if requests:
+            responses = self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+            for (kind, i), response in zip(slots, responses):
+                (dense if kind == "dense" else sparse_results)[i] = [self._payload(point, with_vectors) for point in response.points]
+        return dense, sparse_results
+
+    async def asearch(
+        self,
+        query: str,
+        limit: int = 3,
+        filter: Optional[dict] = None,
+        score_threshold: float = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Same as search() over AsyncQdrantClient: the query is embedded in a worker thread
+        and the request does not block the event loop (embedded mode falls back to a thread).
+        """
+        aclient = get_async_qdrant_client(self.qdrant_location, self.qdrant_api_key)
+        if aclient is None:
+            return await super().asearch(query, limit, filter, score_threshold)
+        mode = self.retrieval_mode
+        candidates = limit if mode != "hybrid" else limit * HYBRID_CANDIDATES
+        qdrant_filter = self._build_filter(filter)
+
+        async def dense() -> List[Dict[str, Any]]:
+            vector = await asyncio.to_thread(self.embedder.encode, query)
+            results = await on_io_loop(aclient.search(
+                collection_name=self.collection_name,
+                query_vector=vector,
+                limit=candidates,
+                query_filter=qdrant_filter,
+                score_threshold=score_threshold,
+                search_params=self.search_params,
+            ))
+            return [r.payload for r in results]
+
+        async def sparse() -> List[Dict[str, Any]]:
+            sparse_query = await asyncio.to_thread(self._sparse_query, query)
+            if sparse_query is None:
+                return []
+            results = await on_io_loop(aclient.query_points(
+                collection_name=self.collection_name,
+                query=sparse_query,
+                using=SPARSE_VECTOR_NAME,
+                limit=candidates,
+                query_filter=qdrant_filter,
+                with_payload=True,
+            ))
+            return [r.payload for r in results.points]
+
+        if mode == "dense":
+            return await dense()
+        if mode == "sparse":
+            return await sparse()
+        return reciprocal_rank_fusion(list(await asyncio.gather(dense(), sparse())), limit)
+
+    async def aadd_many(self, chunks: List[dict], wait: bool = True) -> int:
+        """
+        Async add_many: upsert batches are sent concurrently (at most upsert_workers
+        in flight) with wait=False; with wait=True the last batch is re-sent with
+        wait=True as the ordering barrier, like flush().
+        """
+        aclient = get_async_qdrant_client(self.qdrant_location, self.qdrant_api_key)
+        if aclient is None:
+            return await super().aadd_many(chunks, wait)
+        if not chunks:
+            return 0
+        started = time.time()
+        vectors = await asyncio.to_thread(
+            self.embedder.encode_many, [chunk['text'] for chunk in chunks], self.embed_batch_size
+        )
+        self.ingest_stats["embed_seconds"] += time.time() - started
+        points = [
+            PointStruct(id=self._point_id(chunk), vector=self._vector(chunk, vector), payload=chunk)
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        batches = [points[i:i + self.upsert_batch_size] for i in range(0, len(points), self.upsert_batch_size)]
+        semaphore = asyncio.Semaphore(self.upsert_workers)
+
+        async def upsert(batch: List[PointStruct]) -> None:
+            async with semaphore:
+                await on_io_loop(aclient.upsert(collection_name=self.collection_name, points=batch, wait=False))
+
+        await asyncio.gather(*(upsert(batch) for batch in batches))
+        if wait:
+            await on_io_loop(aclient.upsert(collection_name=self.collection_name, points=batches[-1], wait=True))
+        self.ingest_stats["upsert_requests"] += len(batches)
+        self.ingest_stats["chunks"] += len(points)
+        return len(points)
+
+    def _build_filter(self, filter: Optional[dict]) -> Optional[Filter]:
+        """
+        {"source": "a.pdf"} -> exact match, {"source": ["a.pdf", "b.pdf"]} -> any of,
+        {"page_start": {"lte": 10}} -> numeric range.
+        """
+        if not filter:
+            return None
+        conditions = []
+        for key, value in filter.items():
+            if isinstance(value, dict):
+                conditions.append(FieldCondition(key=key, range=Range(**{k: v for k, v in value.items() if k in RANGE_KEYS})))
+            elif isinstance(value, (list, tuple, set)):
+                conditions.append(FieldCondition(key=key, match=MatchAny(any=list(value))))
+            else:
+                conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+        return Filter(must=conditions)
+
+    def delete_points(self, ids: List) -> None:
+        if ids:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=[self._point_id({"id": i}) for i in ids]),
+            )
+
+    def delete_where(self, filter: dict, keep_ids: Optional[List] = None) -> None:
+        """
+        Deletes every point matching the payload filter, except keep_ids.
+        """
+        qdrant_filter = self._build_filter(filter)
+        if keep_ids:
+            qdrant_filter.must_not = [HasIdCondition(has_id=keep_ids)]
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=qdrant_filter),
         )
-        return [r.payload for r in results]
 
     def reset(self) -> None:
-        self.client.delete_collection(self.collection_name)
+        # Deleting the live version also drops the alias; the name becomes a plain collection again
+        self.client.delete_collection(self.versions.current() or self.collection_name)
         self._ensure_collection()
 
-    def _generate_id(self, chunk: dict) -> str:
-        return hashlib.sha1(chunk['text'].encode('utf-8')).hexdigest()
+    def rebuild(self, populate: Callable[[VectorStore], Any], retention: Optional[int] = None) -> str:
+        """
+        Blue/green re-index: populate(staging) fills a fresh collection version
+        (same profile) while the alias keeps serving the current one; once the new
+        version is flushed and non-empty the alias is swapped atomically and superseded
+        versions are garbage-collected (COLLECTION_RETENTION). A failed build is dropped
+        and the live version is left untouched. Returns the new version name.
+        """
+        with build_lock(self.collection_name):
+            name = self.versions.new_version_name()
+            staging = QdrantStorage(
+                type=f"{self.type}{name[len(self.collection_name):]}",
+                qdrant_location=self.qdrant_location,
+                qdrant_api_key=self.qdrant_api_key,
+                embedder=self.embedder,
+                profile=self.profile["name"],
+            )
+            started = time.time()
+            try:
+                populate(staging)
+                staging.flush()
+                if not staging.has_data():
+                    raise RuntimeError(f"Rebuild of {self.collection_name} produced no points")
+            except Exception:
+                self.client.delete_collection(name)
+                raise
+            finally:
+                if staging._upsert_pool is not None:
+                    staging._upsert_pool.shutdown(wait=False)
+            self.versions.swap(name)
+            self.generation = name
+            self._has_sparse = self._collection_has_sparse()
+            try:
+                self.versions.gc(retention)
+            except Exception as e:
+                logger.warning(f"Cannot garbage-collect versions of {self.collection_name}: {str(e)}")
+            logger.info(f"Rebuilt {self.collection_name} as {name} in {time.time() - started:.2f}s")
+            return name
 
     def has_data(self) -> bool:
         """
         Returns True if the Qdrant collection contains any points, False otherwise.
         """
         try:
-            if not self.client.collection_exists(self.collection_name):
+            if not self.generation and not self.client.collection_exists(self.collection_name):
                 return False
             # ใช้ count API ซึ่งเสถียรกว่าและไม่ขึ้นอยู่กับรูปแบบผลลัพธ์
             count_result = self.client.count(self.collection_name, exact=False)
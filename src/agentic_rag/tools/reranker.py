@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# Multilingual (รวมภาษาไทย) MiniLM cross-encoder ขนาดเล็ก รันบน CPU ได้
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+DEFAULT_RERANK_CANDIDATES = 30
+DEFAULT_RERANK_MAX_LENGTH = 256
+# เมื่องบเวลาไม่พอจนข้ามการ rerank ติดกัน N ครั้ง จะ rerank top_k คู่หนึ่งครั้งเพื่อวัดเวลาต่อคู่ใหม่
+REPROBE_EVERY = 16
+
+_rerankers: Dict[str, "Reranker"] = {}
+_failed_models: set = set()
+_registry_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def rerank_enabled() -> bool:
+    return (os.getenv("RERANK") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def rerank_candidates(limit: int) -> int:
+    """จำนวนผู้สมัครที่ดึงจาก vector search ก่อน rerank (ไม่น้อยกว่า limit)"""
+    return max(limit, _env_int("RERANK_CANDIDATES", DEFAULT_RERANK_CANDIDATES))
+
+
+class Reranker:
+    """
+    Cross-encoder ให้คะแนนคู่ (คำถาม, chunk) ทั้งชุดในการเรียก predict ครั้งเดียว (batch เดียว)
+    - max_length ตัดข้อความ chunk เพื่อคุมเวลาบน CPU
+    - budget_ms: ประมาณเวลาต่อคู่จากรอบก่อน ๆ (EMA) แล้วลดจำนวนผู้สมัครให้อยู่ในงบเวลา;
+      ถ้างบไม่พอแม้แต่ top_k คู่ จะคืนอันดับเดิมจาก vector search (รอบแรกยังไม่มีค่าประมาณจึงไม่จำกัด)
+    - warm-up หนึ่งครั้งตอนโหลด เวลาเริ่มต้นของโมเดลจึงไม่ถูกนับเป็นเวลาต่อคู่
+    - ข้ามติดกัน REPROBE_EVERY ครั้งแล้วจะวัดใหม่ด้วย top_k คู่ ค่าประมาณที่สูงเกินจริงจึงไม่ปิด rerank ถาวร
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, max_length: Optional[int] = None):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.max_length = max_length or _env_int("RERANK_MAX_LENGTH", DEFAULT_RERANK_MAX_LENGTH)
+        self.model = CrossEncoder(model_name, max_length=self.max_length, device="cpu")
+        self.model.predict([("warm-up", "warm-up")], show_progress_bar=False)
+        self.pair_ms: Optional[float] = None
+        self.stats = {"calls": 0, "pairs": 0, "seconds": 0.0, "budget_cuts": 0, "skipped": 0, "reprobes": 0}
+        self._skips_in_row = 0
+        self._lock = threading.Lock()
+
+    def _fit_budget(self, candidates: int, top_k: int, budget_ms: Optional[float]) -> Tuple[int, bool]:
+        """(จำนวนผู้สมัครที่จะ rerank หรือ 0 เมื่อควรข้าม, เป็นรอบวัดใหม่หรือไม่) เรียกภายใต้ self._lock"""
+        if not budget_ms or self.pair_ms is None:
+            return candidates, False
+        count = min(candidates, int(budget_ms / self.pair_ms))
+        if count >= min(top_k, candidates):
+            self._skips_in_row = 0
+            return count, False
+        self._skips_in_row += 1
+        if self._skips_in_row >= REPROBE_EVERY:
+            self._skips_in_row = 0
+            self.stats["reprobes"] += 1
+            return min(top_k, candidates), True
+        self.stats["skipped"] += 1
+        return 0, False
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        top_k: int,
+        budget_ms: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        เรียง chunks (เรียงตาม vector search มาแล้ว) ใหม่ตามคะแนน cross-encoder และคืน top_k
+        chunk ที่ได้มีคีย์ "rerank_score"
+        """
+        if len(chunks) <= 1:
+            return chunks[:top_k]
+        with self._lock:
+            count, reprobe = self._fit_budget(len(chunks), top_k, budget_ms)
+            if not count:
+                return chunks[:top_k]
+            if count < len(chunks):
+                self.stats["budget_cuts"] += 1
+        pool = chunks[:count]
+        started = time.perf_counter()
+        scores = self.model.predict(
+            [(query, chunk["text"]) for chunk in pool],
+            batch_size=len(pool),
+            show_progress_bar=False,
+        )
+        elapsed = time.perf_counter() - started
+        per_pair = elapsed * 1000 / len(pool)
+        with self._lock:
+            # รอบวัดใหม่แทนค่าประมาณเดิมทั้งหมด เพราะค่าเดิมคือสิ่งที่ทำให้ข้ามมาตลอด
+            if self.pair_ms is None or reprobe:
+                self.pair_ms = per_pair
+            else:
+                self.pair_ms = 0.8 * self.pair_ms + 0.2 * per_pair
+            self.stats["calls"] += 1
+            self.stats["pairs"] += len(pool)
+            self.stats["seconds"] += elapsed
+        ranked = sorted(zip(scores, pool), key=lambda item: float(item[0]), reverse=True)
+        return [dict(chunk, rerank_score=float(score)) for score, chunk in ranked[:top_k]]
+
+
+def get_reranker(model_name: Optional[str] = None) -> Optional[Reranker]:
+    """
+    Reranker ที่ใช้ร่วมกันทั้ง process (โหลดโมเดลครั้งเดียว) หรือ None เมื่อปิด RERANK
+    หรือโหลดโมเดลไม่สำเร็จ (การค้นหาจะใช้อันดับจาก vector search ตามเดิม)
+    """
+    if not rerank_enabled():
+        return None
+    model_name = model_name or os.getenv("RERANK_MODEL") or DEFAULT_RERANK_MODEL
+    reranker = _rerankers.get(model_name)
+    if reranker is not None or model_name in _failed_models:
+        return reranker
+    with _registry_lock:
+        if model_name not in _rerankers and model_name not in _failed_models:
+            try:
+                started = time.time()
+                _rerankers[model_name] = Reranker(model_name)
+                logger.info(f"Loaded rerank model {model_name} in {time.time() - started:.2f}s")
+            except Exception as e:
+                _failed_models.add(model_name)
+                logger.error(f"Cannot load rerank model {model_name}, reranking disabled: {str(e)}")
+        return _rerankers.get(model_name)
+
+
+def rerank_budget_ms() -> Optional[float]:
+    """RERANK_BUDGET_MS: งบเวลาของการ rerank ต่อคำถาม (0 หรือไม่ตั้ง = ไม่จำกัด)"""
+    try:
+        budget = float(os.getenv("RERANK_BUDGET_MS") or 0)
+    except ValueError:
+        return None
+    return budget or None
@@ -0,0 +1,274 @@
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .cache_dir import get_cache_dir
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MAX_MB = 64
+DEFAULT_TTL = 3600
+DEFAULT_DISK_MAX_MB = 256
+# ล้างรายการหมดอายุทั้งแคชทุก ๆ N ครั้งที่ put (นอกจากการตรวจตอน get)
+SWEEP_INTERVAL = 256
+
+_MISSING = object()
+
+
+class DiskTier:
+    """
+    ชั้นแคชบนดิสก์ (SQLite, WAL) ที่ใช้ร่วมกันทุก namespace ใน process และอยู่รอดข้ามการ restart
+    - value เก็บเป็น pickle (ไฟล์อยู่ใน RAG_CACHE_DIR ซึ่งถือเป็นพื้นที่ที่เชื่อถือได้ เช่นเดียวกับแคชอื่น)
+    - จำกัดขนาดด้วย max_bytes โดยลบรายการที่ใช้ล่าสุดนานที่สุดก่อน และลบรายการหมดอายุทิ้ง
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or os.path.join(get_cache_dir(), "result_cache.sqlite3")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RESULT_CACHE_DISK_MAX_MB") or DEFAULT_DISK_MAX_MB) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._writes = 0
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, float]:
+        """คืน (value, expires) หรือ (_MISSING, 0)"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, expires FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return _MISSING, 0.0
+            if row[1] <= time.time():
+                self.conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self.conn.commit()
+                return _MISSING, 0.0
+            self.conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key)
+            )
+            self.conn.commit()
+        return pickle.loads(row[0]), row[1]
+
+    def put(self, namespace: str, key: str, data: bytes, expires: float) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, data, len(data), expires, time.time()),
+            )
+            self.conn.commit()
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                self.evict()
+
+    def delete(self, namespace: str, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self.conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            else:
+                self.conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            self.conn.commit()
+
+    def evict(self) -> int:
+        """ลบรายการหมดอายุ แล้วลบรายการเก่าสุดจนเหลือไม่เกิน 90% ของ max_bytes"""
+        with self._lock:
+            removed = self.conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),)).rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                for namespace, key, size in self.conn.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY last_access ASC"
+                ).fetchall():
+                    if total <= target:
+                        break
+                    self.conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                    total -= size
+                    removed += 1
+            self.conn.commit()
+            return removed
+
+
+_disk_tier: Optional[DiskTier] = None
+_disk_tier_pid: Optional[int] = None
+_disk_tier_lock = threading.Lock()
+
+
+def get_disk_tier() -> Optional[DiskTier]:
+    """
+    DiskTier หนึ่งตัวต่อ process (connection ของ SQLite ห้ามใช้ข้าม fork)
+    คืน None เมื่อปิด (RESULT_CACHE_DISK_MAX_MB=0) หรือเปิดไฟล์ไม่ได้
+    """
+    global _disk_tier, _disk_tier_pid
+    with _disk_tier_lock:
+        if _disk_tier is None or _disk_tier_pid != os.getpid():
+            try:
+                _disk_tier = DiskTier()
+                _disk_tier_pid = os.getpid()
+            except Exception as e:
+                logger.warning(f"Result cache disk tier unavailable: {str(e)}")
+                return None
+    return _disk_tier if _disk_tier.enabled else None
+
+
+class ResultCache:
+    """
+    แคชแบบ LRU + TTL จำกัดจำนวนไบต์ ปลอดภัยเมื่อใช้จากหลาย thread
+    - ขนาดของแต่ละรายการคือขนาด pickle ของค่า (ใช้เป็นข้อมูลของชั้นดิสก์ด้วย)
+    - รายการหมดอายุถูกตัดตอน get และกวาดทั้งแคชทุก SWEEP_INTERVAL ครั้งที่ put
+      หน่วยความจำจึงคงที่ไม่ว่าจะเปิดนานแค่ไหน
+    - disk=True: เขียนผ่าน (write-through) ไปยัง DiskTier และโหลดกลับเมื่อหน่วยความจำไม่มี
+    """
+
+    def __init__(self, namespace: str, max_bytes: Optional[int] = None, ttl: Optional[float] = None, disk: bool = True):
+        self.namespace = namespace
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RESULT_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESULT_CACHE_TTL") or DEFAULT_TTL)
+        self.disk = get_disk_tier() if disk else None
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _insert(self, key: str, expires: float, size: int, value: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[2]
+                self._remove(key)
+                self.stats["expired"] += 1
+        if self.disk is not None:
+            try:
+                value, expires = self.disk.get(self.namespace, key)
+            except Exception as e:
+                logger.warning(f"Result cache disk read failed: {str(e)}")
+                value = _MISSING
+            if value is not _MISSING:
+                with self._lock:
+                    self._insert(key, expires, len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)), value)
+                    self.stats["disk_hits"] += 1
+                return value
+        with self._lock:
+            self.stats["misses"] += 1
+        return default
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._insert(key, expires, len(data), value)
+            self._puts += 1
+            if self._puts % SWEEP_INTERVAL == 0:
+                self._sweep()
+        if self.disk is not None:
+            try:
+                self.disk.put(self.namespace, key, data, expires)
+            except Exception as e:
+                logger.warning(f"Result cache disk write failed: {str(e)}")
+
+    def _sweep(self) -> int:
+        now = time.time()
+        expired = [key for key, (expires, _, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    def prune(self) -> int:
+        """ลบรายการหมดอายุในหน่วยความจำทันที คืนจำนวนที่ลบ"""
+        with self._lock:
+            return self._sweep()
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.disk is not None:
+            self.disk.delete(self.namespace)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["disk_hits"]
+            total = hits + self.stats["misses"]
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=round(hits / total, 4) if total else 0.0,
+            )
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(namespace: str, disk: bool = True) -> ResultCache:
+    """
+    ResultCache ที่ใช้ร่วมกันทุก DocumentSearchTool/session ใน process ต่อ namespace
+    (เช่น "query:<collection>")
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = ResultCache(namespace, disk=disk)
+            _caches[namespace] = cache
+        return cache
+
+
+def result_cache_metrics() -> Dict[str, Dict[str, Any]]:
+    """สถิติของทุก ResultCache: {"result|namespace": metrics}"""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {f"result|{namespace}": cache.metrics() for namespace, cache in caches.items()}
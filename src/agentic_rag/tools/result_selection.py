@@ -0,0 +1,135 @@
+import os
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_SCORE_GAP = 0.1
+DEFAULT_DUPLICATE_SIMILARITY = 0.95
+# ดึงผู้สมัครมากกว่า limit เท่านี้ เพื่อให้ MMR มีตัวเลือกแทน chunk ที่ซ้ำกัน
+POOL_FACTOR = 2
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def selection_enabled() -> bool:
+    return (os.getenv("RETRIEVAL_MMR") or "true").strip().lower() not in ("0", "false", "no", "off")
+
+
+def selection_settings() -> Dict[str, float]:
+    """
+    RETRIEVAL_MMR_LAMBDA: น้ำหนักความเกี่ยวข้องเทียบกับความหลากหลาย (1 = ไม่สนความซ้ำ)
+    RETRIEVAL_MIN_SCORE: ความเกี่ยวข้องขั้นต่ำกับคำถาม (cosine หรือคะแนน rerank ช่วง 0-1, 0 = ไม่ตัด)
+    RETRIEVAL_SCORE_GAP: ตัดผลลัพธ์เมื่อคะแนนลดลงจากลำดับก่อนหน้ามากกว่านี้ (0 = ไม่ใช้ adaptive k)
+    RETRIEVAL_DUPLICATE_SIM: chunk ที่ cosine กับ chunk ที่เลือกแล้วเกินนี้ถือว่าซ้ำ (เช่นจากการสกัดสองรอบ)
+    RETRIEVAL_MIN_K: จำนวนผลลัพธ์ขั้นต่ำของ adaptive k
+    """
+    return {
+        "lambda": _env_float("RETRIEVAL_MMR_LAMBDA", DEFAULT_MMR_LAMBDA),
+        "min_score": _env_float("RETRIEVAL_MIN_SCORE", 0.0),
+        "score_gap": _env_float("RETRIEVAL_SCORE_GAP", DEFAULT_SCORE_GAP),
+        "duplicate": _env_float("RETRIEVAL_DUPLICATE_SIM", DEFAULT_DUPLICATE_SIMILARITY),
+        "min_k": max(1, int(_env_float("RETRIEVAL_MIN_K", 1))),
+    }
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def drop_vectors(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ลบเวกเตอร์ที่ได้จาก search(with_vectors=True) ออกก่อนส่งผลลัพธ์ต่อ/เก็บลงแคช"""
+    return [{key: value for key, value in chunk.items() if key != "vector"} if "vector" in chunk else chunk for chunk in chunks]
+
+
+def _candidate_vectors(candidates: List[Dict[str, Any]], embedder) -> np.ndarray:
+    """ใช้เวกเตอร์ที่ vector DB คืนมากับผลลัพธ์ และ encode เฉพาะ chunk ที่ไม่มี"""
+    vectors = [chunk.get("vector") for chunk in candidates]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        encoded = embedder.encode_many([candidates[i].get("text", "") for i in missing])
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+    return _normalize(vectors)
+
+
+def _rerank_relevance(candidates: List[Dict[str, Any]]):
+    """
+    คะแนน cross-encoder ของผู้สมัครในช่วง 0-1 (logit ผ่าน sigmoid) หรือ None เมื่อไม่ได้ rerank ครบทุกตัว
+    """
+    scores = [chunk.get("rerank_score") for chunk in candidates]
+    if any(score is None for score in scores):
+        return None
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.min() < 0 or scores.max() > 1:
+        scores = 1.0 / (1.0 + np.exp(-scores))
+    return scores
+
+
+def select_chunks(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    embedder,
+    limit: int,
+    query_vector=None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    คัด chunk ก่อนส่งเป็น context ให้ LLM:
+     1. ตัด chunk ที่ความเกี่ยวข้องกับคำถามต่ำกว่า min_score
+     2. เลือกด้วย maximal marginal relevance (ข้าม chunk ที่ซ้ำกับที่เลือกแล้ว)
+     3. adaptive k: หยุดเมื่อคะแนนความเกี่ยวข้องลดลงเป็นช่วงกว้างกว่า score_gap
+    เวกเตอร์ของ chunk ใช้คีย์ "vector" ที่ได้จาก search(with_vectors=True) (encode เฉพาะที่ไม่มี)
+    และ query_vector คือ embedding ของ query ที่ใช้ค้นหาไปแล้ว (None = encode ใหม่)
+    เมื่อผู้สมัครผ่าน reranker แล้ว (มี "rerank_score") ความเกี่ยวข้องคือคะแนน rerank
+    ส่วน cosine ใช้เฉพาะวัดความซ้ำกัน ลำดับของ cross-encoder จึงไม่ถูกแทนด้วย dense cosine
+    คืน (chunks, report) โดย report บอกจำนวนตัวอักษรของ prompt ที่ประหยัดได้เทียบกับ candidates[:limit]
+    """
+    baseline_chars = sum(len(chunk.get("text", "")) for chunk in candidates[:limit])
+    report = {"candidates": len(candidates), "kept": 0, "chars_before": baseline_chars, "chars_after": 0, "chars_saved": 0}
+    if not candidates:
+        return [], report
+    settings = selection_settings()
+    vectors = _candidate_vectors(candidates, embedder)
+    relevance = _rerank_relevance(candidates)
+    if relevance is None:
+        query_vector = _normalize(embedder.encode(query) if query_vector is None else query_vector)[0]
+        relevance = vectors @ query_vector
+    remaining = [i for i in range(len(candidates)) if relevance[i] >= settings["min_score"]]
+    selected: List[int] = []
+    while remaining and len(selected) < limit:
+        if selected:
+            redundancy = (vectors[remaining] @ vectors[selected].T).max(axis=1)
+            keep = redundancy < settings["duplicate"]
+            remaining = [i for i, fresh in zip(remaining, keep) if fresh]
+            if not remaining:
+                break
+            redundancy = redundancy[keep]
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        mmr = settings["lambda"] * relevance[remaining] - (1 - settings["lambda"]) * redundancy
+        selected.append(remaining.pop(int(np.argmax(mmr))))
+    if settings["score_gap"] > 0 and len(selected) > settings["min_k"]:
+        # adaptive k ตามลำดับความเกี่ยวข้อง: ตัดที่ช่องว่างคะแนนใหญ่แรกหลังขั้นต่ำ min_k
+        by_relevance = sorted(selected, key=lambda i: -relevance[i])
+        cutoff = len(by_relevance)
+        for position in range(settings["min_k"], len(by_relevance)):
+            if relevance[by_relevance[position - 1]] - relevance[by_relevance[position]] > settings["score_gap"]:
+                cutoff = position
+                break
+        kept = set(by_relevance[:cutoff])
+        selected = [i for i in selected if i in kept]
+    chunks = [dict(candidates[i], relevance=round(float(relevance[i]), 4)) for i in selected]
+    chunks = drop_vectors(chunks)
+    report["kept"] = len(chunks)
+    report["chars_after"] = sum(len(chunk.get("text", "")) for chunk in chunks)
+    report["chars_saved"] = baseline_chars - report["chars_after"]
+    return chunks, report
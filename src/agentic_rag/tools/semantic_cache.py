@@ -0,0 +1,162 @@
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from pythainlp.util import reorder_vowels
+
+from .bm25 import THAI_DIGITS
+
+logger = logging.getLogger("DocumentSearchTool")
+
+DEFAULT_MAX_ENTRIES = 1024
+# cosine distance สูงสุดที่ถือว่าเป็นคำถามเดียวกัน (similarity >= 0.92)
+DEFAULT_MAX_DISTANCE = 0.08
+
+ZERO_WIDTH = re.compile("[\\u200b\\u200c\\u200d\\ufeff]")
+TRAILING = re.compile(r"(?:\s|[?？!！.。,]|ครับ|คับ|ค่ะ|คะ|นะ|จ้ะ|จ้า)+$")
+
+
+def cache_enabled() -> bool:
+    return (os.getenv("SEMANTIC_CACHE") or "true").strip().lower() not in ("0", "false", "no", "off")
+
+
+def normalize_query(text: str) -> str:
+    """
+    รูปแบบมาตรฐานของคำถาม: จัดลำดับสระ, ลบอักขระความกว้างศูนย์, เลขไทยเป็นเลขอารบิก,
+    ตัวพิมพ์เล็ก, ยุบช่องว่าง และตัดคำลงท้าย/เครื่องหมายท้ายประโยค ("ครับ", "คะ", "?")
+    """
+    text = ZERO_WIDTH.sub("", reorder_vowels(text or "")).translate(THAI_DIGITS).lower()
+    text = " ".join(text.split())
+    return TRAILING.sub("", text) or text
+
+
+class SemanticQueryCache:
+    """
+    แคชผลการค้นหาตามความหมายของคำถาม (ต่อ collection + namespace)
+    - คำถามที่ normalize แล้วตรงกันได้ผลทันทีโดยไม่ต้อง embed
+    - ไม่ตรงกัน: embed คำถามแล้วหาในดัชนีเวกเตอร์แบบ flat (matrix-vector product เดียว
+      เร็วระดับไมโครวินาทีสำหรับไม่กี่พันรายการ) หากใกล้กว่า max_distance ใช้ผลเดิม
+    - ทุกรายการผูกกับ corpus version; เมื่อ version เปลี่ยน (เอกสารเปลี่ยน) แคชถูกล้าง
+    - LRU จำกัด max_entries รายการ, thread-safe
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_distance: float = DEFAULT_MAX_DISTANCE):
+        self.max_entries = max(1, max_entries)
+        self.max_distance = max_distance
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()  # normalized -> (slot, value)
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: list = []
+        self._lock = threading.Lock()
+        self.stats = {"hits_exact": 0, "hits_semantic": 0, "misses": 0, "invalidations": 0}
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            if self.version is not None and self._entries:
+                self.stats["invalidations"] += 1
+                logger.info(f"Semantic cache invalidated ({len(self._entries)} entries, corpus changed)")
+            self._entries.clear()
+            self._vectors = None
+            self._slot_keys = []
+            self.version = version
+
+    def lookup(
+        self,
+        query: str,
+        version: str,
+        encode: Callable[[str], Any],
+    ) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """
+        คืน (ผลลัพธ์ที่แคชไว้หรือ None, เวกเตอร์คำถาม) เวกเตอร์ส่งต่อให้ store() เพื่อไม่ต้อง embed ซ้ำ
+        encode รับคำถามที่ normalize แล้ว; ผู้เรียกอาจ embed ข้อความที่ใช้ค้นจริงแทน เพื่อใช้เวกเตอร์ค้นต่อ
+        (ต้องใช้วิธีเดียวกันทุกครั้งสำหรับ namespace เดียวกัน)
+        """
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits_exact"] += 1
+                return entry[1], None
+        vector = np.asarray(encode(key), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            if version == self.version and self._vectors is not None and self._slot_keys:
+                scores = self._vectors[:len(self._slot_keys)] @ vector
+                best = int(np.argmax(scores))
+                if 1.0 - float(scores[best]) <= self.max_distance:
+                    match = self._slot_keys[best]
+                    entry = self._entries.get(match)
+                    if entry is not None:
+                        self._entries.move_to_end(match)
+                        self.stats["hits_semantic"] += 1
+                        return entry[1], vector
+            self.stats["misses"] += 1
+        return None, vector
+
+    def store(self, query: str, version: str, value: Any, vector: Optional[np.ndarray] = None,
+              encode: Optional[Callable[[str], Any]] = None) -> None:
+        key = normalize_query(query)
+        if vector is None:
+            if encode is None:
+                return
+            vector = np.asarray(encode(key), dtype=np.float32)
+            vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                slot = self._entries[key][0]
+            elif len(self._entries) >= self.max_entries:
+                # ใช้ช่องของรายการที่ใช้งานน้อยที่สุด
+                _, (slot, _) = self._entries.popitem(last=False)
+            else:
+                slot = len(self._slot_keys)
+                self._slot_keys.append(None)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+            self._entries[key] = (slot, value)
+            self._entries.move_to_end(key)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.stats["hits_exact"] + self.stats["hits_semantic"]
+            total = hits + self.stats["misses"]
+            return dict(self.stats, entries=len(self._entries), hit_rate=round(hits / total, 4) if total else 0.0)
+
+
+_caches: Dict[Tuple[str, str], SemanticQueryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_semantic_cache(collection: str, namespace: str = "") -> Optional[SemanticQueryCache]:
+    """
+    แคชที่ใช้ร่วมกันทุก tool/session ของ collection เดียวกันใน process (None เมื่อปิด SEMANTIC_CACHE)
+    namespace แยกแคชของการค้นหาที่มีพารามิเตอร์ต่างกัน (limit, filter)
+    """
+    if not cache_enabled():
+        return None
+    with _caches_lock:
+        cache = _caches.get((collection, namespace))
+        if cache is None:
+            try:
+                max_distance = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE") or DEFAULT_MAX_DISTANCE)
+                max_entries = int(os.getenv("SEMANTIC_CACHE_SIZE") or DEFAULT_MAX_ENTRIES)
+            except ValueError:
+                max_distance, max_entries = DEFAULT_MAX_DISTANCE, DEFAULT_MAX_ENTRIES
+            cache = SemanticQueryCache(max_entries, max_distance)
+            _caches[(collection, namespace)] = cache
+        return cache
+
+
+def cache_metrics() -> Dict[str, Dict[str, Any]]:
+    """hit rate ของทุกแคช: {"collection|namespace": metrics}"""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {f"{collection}|{namespace}": cache.metrics() for (collection, namespace), cache in caches.items()}
@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from pythainlp import sent_tokenize
+from pythainlp.corpus import thai_words
+from pythainlp.tokenize import Tokenizer
+from pythainlp.util import reorder_vowels
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# คำศัพท์กฎหมาย/PDPA ที่ต้องการให้ตัดคำเป็นคำเดียว
+CUSTOM_DICT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "pdpa_words.txt")
+# engine ที่ใช้พจนานุกรม (รองรับ custom dict)
+DICT_ENGINES = ("newmm", "longest", "mm")
+DEFAULT_CACHE_SIZE = 1024
+# ต่ำกว่านี้ประมวลผลใน process เดียวเร็วกว่าค่าเปิด process pool
+MIN_PARALLEL_TEXTS = 32
+# ตรวจว่าไฟล์พจนานุกรมถูกแก้ไขหรือไม่ได้บ่อยสุดทุก ๆ กี่วินาที
+DICT_CHECK_INTERVAL = 1.0
+
+WORD_ENGINE = os.getenv("THAI_WORD_ENGINE") or "newmm"
+SENT_ENGINE = os.getenv("THAI_SENT_ENGINE") or "crfcut"
+
+_tokenizer: Optional[Tokenizer] = None
+_tokenizer_lock = threading.Lock()
+# (mtime_ns, size) ของไฟล์พจนานุกรม -> sha1 ของเนื้อหา, และเวอร์ชันที่ใช้สร้าง _tokenizer/แคช
+_dict_stat: Optional[Tuple[int, int]] = None
+_dict_hash = "none"
+_dict_loaded: Optional[str] = None
+_dict_checked = 0.0
+
+
+def load_custom_words(path: str = CUSTOM_DICT_PATH) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except FileNotFoundError:
+        logger.warning(f"Custom Thai dictionary not found: {path}")
+        return []
+
+
+def build_tokenizer(engine: str = WORD_ENGINE, use_custom_dict: bool = True) -> Tokenizer:
+    """
+    สร้าง Tokenizer ของ pythainlp พร้อมพจนานุกรมคำกฎหมาย/PDPA (เฉพาะ engine ที่ใช้พจนานุกรม)
+    """
+    if use_custom_dict and engine in DICT_ENGINES:
+        words = set(thai_words()) | set(load_custom_words())
+        return Tokenizer(custom_dict=words, engine=engine)
+    return Tokenizer(engine=engine)
+
+
+def dictionary_version(path: str = CUSTOM_DICT_PATH) -> str:
+    """
+    sha1 ของไฟล์พจนานุกรม (คำนวณใหม่เมื่อ mtime/ขนาดเปลี่ยน) ใช้เป็นส่วนของคีย์แคชข้อความรายหน้า
+    """
+    global _dict_stat, _dict_hash
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return "none"
+    if signature != _dict_stat:
+        with open(path, "rb") as f:
+            _dict_hash = hashlib.sha1(f.read()).hexdigest()[:12]
+        _dict_stat = signature
+    return _dict_hash
+
+
+def _check_dictionary() -> None:
+    """
+    เมื่อพจนานุกรมถูกแก้ไข: สร้าง tokenizer ใหม่และล้างแคชการตัดคำ (ตรวจไม่เกินทุก DICT_CHECK_INTERVAL วินาที)
+    """
+    global _tokenizer, _dict_loaded, _dict_checked
+    now = time.monotonic()
+    if now - _dict_checked < DICT_CHECK_INTERVAL:
+        return
+    _dict_checked = now
+    version = dictionary_version()
+    if version == _dict_loaded:
+        return
+    with _tokenizer_lock:
+        if version != _dict_loaded:
+            if _dict_loaded is not None:
+                logger.info("Thai custom dictionary changed, rebuilding tokenizer")
+            _tokenizer = None
+            _tokenize.cache_clear()
+            _process_thai_text.cache_clear()
+            _dict_loaded = version
+
+
+def get_tokenizer() -> Tokenizer:
+    """
+    Tokenizer ที่โหลดไว้ครั้งเดียวต่อ process (สร้าง trie ของพจนานุกรมมีค่าใช้จ่ายสูง)
+    สร้างใหม่เมื่อไฟล์พจนานุกรมเปลี่ยน
+    """
+    global _tokenizer
+    _check_dictionary()
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = build_tokenizer()
+    return _tokenizer
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """
+    ตัดคำ (memoized) คืนเป็น tuple เพื่อให้แชร์ผลลัพธ์ใน cache ได้อย่างปลอดภัย
+    """
+    _check_dictionary()
+    return _tokenize(text)
+
+
+@lru_cache(maxsize=int(os.getenv("THAI_TEXT_CACHE_SIZE") or DEFAULT_CACHE_SIZE))
+def _tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(get_tokenizer().word_tokenize(text))
+
+
+def process_thai_text(text: str) -> str:
+    """
+    ประมวลผลข้อความภาษาไทย:
+     - ปรับสระลอยให้ถูกต้อง
+     - แบ่งประโยคและแยกคำด้วย pythainlp
+    """
+    _check_dictionary()
+    return _process_thai_text(text)
+
+
+@lru_cache(maxsize=int(os.getenv("THAI_TEXT_CACHE_SIZE") or DEFAULT_CACHE_SIZE))
+def _process_thai_text(text: str) -> str:
+    try:
+        fixed_text = reorder_vowels(text)
+        sentences = sent_tokenize(fixed_text, engine=SENT_ENGINE)
+        tokenizer = get_tokenizer()
+        return " ".join(" ".join(tokenizer.word_tokenize(sentence)) for sentence in sentences)
+    except Exception as e:
+        logger.error(f"Error in process_thai_text: {str(e)}")
+        return text  # Return original text if processing fails
+
+
+def process_thai_texts(texts: List[str], workers: Optional[int] = None) -> List[str]:
+    """
+    ประมวลผลหลายข้อความพร้อมกันใน process pool (คืนผลตามลำดับเดิม)
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(texts) < MIN_PARALLEL_TEXTS:
+        return [process_thai_text(text) for text in texts]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(process_thai_text, texts, chunksize=max(1, len(texts) // (workers * 4))))
+
+
+def cache_info() -> dict:
+    return {"process_thai_text": _process_thai_text.cache_info()._asdict(), "tokenize": _tokenize.cache_info()._asdict()}
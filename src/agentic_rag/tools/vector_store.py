@@ -0,0 +1,364 @@
+import os
+import json
+import atexit
+import time
+import shutil
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .cache_dir import get_cache_dir
+from .collection_versions import VERSION_SEPARATOR
+from .qdrant_clients import get_vector_store_kind
+from .qdrant_storage import QdrantStorage, RANGE_KEYS, VectorStore
+
+logger = logging.getLogger("DocumentSearchTool")
+
+# Initial row capacity of the in-memory matrix; it doubles when full
+MIN_CAPACITY = 1024
+
+
+def matches_filter(payload: Dict[str, Any], filter: Optional[dict]) -> bool:
+    """
+    In-process equivalent of QdrantStorage._build_filter:
+    scalar -> equality, list -> any of, {"gte"/"lte"/"gt"/"lt": n} -> numeric range.
+    """
+    if not filter:
+        return True
+    for key, expected in filter.items():
+        value = payload.get(key)
+        if isinstance(expected, dict):
+            if value is None:
+                return False
+            bounds = {k: v for k, v in expected.items() if k in RANGE_KEYS}
+            if ("gt" in bounds and not value > bounds["gt"]) or ("gte" in bounds and not value >= bounds["gte"]):
+                return False
+            if ("lt" in bounds and not value < bounds["lt"]) or ("lte" in bounds and not value <= bounds["lte"]):
+                return False
+        elif isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process brute-force vector index with the QdrantStorage API.
+    - Vectors are L2-normalized float32 rows; search is one matrix-vector product
+      (cosine similarity), which is sub-millisecond for a few thousand chunks
+    - Persisted per collection as vectors.npy + points.json, loaded fully into RAM
+      (no memory map is kept, so the files can be replaced while the store is open)
+    - Rows live in a buffer that grows in doubling capacity steps, so appending is
+      amortised O(1) per row; deleted rows are masked and compacted on the next save
+    - add_many() only updates memory (points are searchable immediately, whatever `wait`);
+      files are written by flush() (end of ingestion, checkpoints), deletes and at exit
+    - BM25 inverted index over the same rows (bm25.npz) for sparse / hybrid search
+    Intended for small corpora, tests and benchmarks; no server is needed.
+    """
+    is_local = True
+
+    def __init__(self, type: str, embedder=None, directory: Optional[str] = None):
+        if embedder is None:
+            from .embedder_registry import get_embedder
+            embedder = get_embedder()
+        self.type = type
+        self.embedder = embedder
+        self.collection_name = f"rag_{type}"
+        self.vector_size = embedder.vector_size
+        self.directory = directory or get_cache_dir("vectors", self.collection_name)
+        self.vectors_path = os.path.join(self.directory, "vectors.npy")
+        self.points_path = os.path.join(self.directory, "points.json")
+        self.bm25_path = os.path.join(self.directory, "bm25.npz")
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.ingest_stats = {"chunks": 0, "embed_seconds": 0.0, "upsert_requests": 0}
+        self._load()
+
+    @property
+    def _vectors(self) -> np.ndarray:
+        return self._buffer[:len(self._ids)]
+
+    @property
+    def _alive(self) -> np.ndarray:
+        return self._alive_buffer[:len(self._ids)]
+
+    def _set_rows(self, vectors: np.ndarray) -> None:
+        """Replaces the buffer with exactly these rows (all alive); call before assigning _ids"""
+        self._buffer = vectors
+        self._alive_buffer = np.ones(len(vectors), dtype=bool)
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= len(self._buffer):
+            return
+        capacity = max(rows, 2 * len(self._buffer), MIN_CAPACITY)
+        count = len(self._ids)
+        buffer = np.empty((capacity, self.vector_size), dtype=np.float32)
+        buffer[:count] = self._buffer[:count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:count] = self._alive_buffer[:count]
+        self._buffer, self._alive_buffer = buffer, alive
+
+    def _load(self) -> None:
+        vectors = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._ids: List = []
+        self._payloads: List[Dict] = []
+        try:
+            with open(self.points_path, "r", encoding="utf-8") as f:
+                points = json.load(f)
+            loaded = np.load(self.vectors_path)
+            if loaded.shape == (len(points["ids"]), self.vector_size):
+                vectors = loaded
+                self._ids = points["ids"]
+                self._payloads = points["payloads"]
+            else:
+                logger.warning(f"Ignoring inconsistent vector store {self.directory}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable vector store {self.directory}: {str(e)}")
+        self._set_rows(vectors)
+        self._bm25 = self._load_bm25()
+        self._positions = {point_id: i for i, point_id in enumerate(self._ids)}
+
+    def _load_bm25(self) -> BM25Index:
+        try:
+            index = BM25Index.load(self.bm25_path)
+            if len(index) == len(self._ids):
+                return index
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Rebuilding unreadable BM25 index {self.bm25_path}: {str(e)}")
+        # Stores saved before hybrid retrieval: build the index from the stored texts
+        index = BM25Index()
+        if self._payloads:
+            index.add([payload.get("text", "") for payload in self._payloads])
+            self._dirty = True
+        return index
+
+    def _save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            keep = np.flatnonzero(self._alive)
+            vectors = np.ascontiguousarray(self._vectors[keep], dtype=np.float32)
+            ids = [self._ids[i] for i in keep]
+            payloads = [self._payloads[i] for i in keep]
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_vectors = f"{self.vectors_path}.tmp.npy"
+            tmp_points = f"{self.points_path}.tmp"
+            tmp_bm25 = f"{self.bm25_path}.tmp.npz"
+            if len(keep) != len(self._ids):
+                self._bm25.remap(keep)
+            np.save(tmp_vectors, vectors)
+            with open(tmp_points, "w", encoding="utf-8") as f:
+                json.dump({"ids": ids, "payloads": payloads}, f, ensure_ascii=False)
+            self._bm25.save(tmp_bm25)
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_points, self.points_path)
+            os.replace(tmp_bm25, self.bm25_path)
+            self._set_rows(vectors)
+            self._ids, self._payloads = ids, payloads
+            self._positions = {point_id: i for i, point_id in enumerate(ids)}
+            self._dirty = False
+
+    def add_many(self, chunks: List[dict], wait: bool = True) -> int:
+        if not chunks:
+            return 0
+        started = time.time()
+        vectors = np.asarray(self.embedder.encode_many([chunk["text"] for chunk in chunks]), dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        self.ingest_stats["embed_seconds"] += time.time() - started
+        with self._lock:
+            # The same id twice in one batch keeps only the last chunk, as an upsert would
+            batch = {}
+            for chunk, vector in zip(chunks, vectors):
+                batch[self._point_id(chunk)] = (dict(chunk), vector)
+            new_rows = []
+            for point_id, (payload, vector) in batch.items():
+                position = self._positions.get(point_id)
+                if position is not None:
+                    # Upsert semantics: replacing a point masks its old row
+                    self._alive[position] = False
+                new_rows.append((point_id, payload, vector))
+            start = len(self._ids)
+            self._reserve(start + len(new_rows))
+            self._buffer[start:start + len(new_rows)] = np.stack([row[2] for row in new_rows])
+            self._alive_buffer[start:start + len(new_rows)] = True
+            for offset, (point_id, payload, _) in enumerate(new_rows):
+                self._ids.append(point_id)
+                self._payloads.append(payload)
+                self._positions[point_id] = start + offset
+            self._bm25.add([payload.get("text", "") for _, payload, _ in new_rows])
+            self._dirty = True
+            self.ingest_stats["chunks"] += len(chunks)
+            self.ingest_stats["upsert_requests"] += 1
+        return len(chunks)
+
+    def flush(self) -> None:
+        self._save()
+
+    @property
+    def supports_sparse(self) -> bool:
+        return True
+
+    def _mask(self, filter: Optional[dict]) -> np.ndarray:
+        mask = self._alive
+        if filter:
+            mask = mask & np.fromiter(
+                (matches_filter(payload, filter) for payload in self._payloads), dtype=bool, count=len(self._payloads)
+            )
+        return mask
+
+    def _result(self, position: int, with_vectors: bool) -> Dict[str, Any]:
+        if not with_vectors:
+            return self._payloads[position]
+        return dict(self._payloads[position], vector=self._vectors[position])
+
+    def _sparse_search(self, query: str, limit: int, filter: Optional[dict], with_vectors: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._result(i, with_vectors) for i, _ in self._bm25.search(query, limit, self._mask(filter))]
+
+    def _dense_search(
+        self,
+        query: str,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        query_vector=None,
+        with_vectors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        vector = query_vector if query_vector is not None else self.embedder.encode(query)
+        return self._dense_rank([vector], limit, filter, score_threshold, with_vectors)[0]
+
+    def _dense_rank(
+        self,
+        vectors: List,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        with_vectors: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        with self._lock:
+            mask = self._mask(filter)
+            available = int(mask.sum())
+            if not available:
+                return [[] for _ in vectors]
+            # Score every row against every query (one matmul) and push masked rows to the bottom
+            scores = np.where(mask[:, None], self._vectors @ queries.T, -np.inf)
+            k = min(limit, available)
+            ranked = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+                ranked.append([
+                    self._result(i, with_vectors)
+                    for i in top
+                    if not score_threshold or column[i] >= score_threshold
+                ])
+            return ranked
+
+    def _search_batch(
+        self,
+        queries: List[str],
+        vectors: List,
+        mode: str,
+        limit: int,
+        filter: Optional[dict],
+        score_threshold: float,
+        with_vectors: bool = False,
+    ):
+        dense = self._dense_rank(vectors, limit, filter, score_threshold, with_vectors) if mode != "sparse" else [[] for _ in queries]
+        sparse = [[] for _ in queries]
+        if mode != "dense":
+            with self._lock:
+                mask = self._mask(filter)
+                sparse = [[self._result(i, with_vectors) for i, _ in self._bm25.search(query, limit, mask)] for query in queries]
+        return dense, sparse
+
+    def delete_points(self, ids: List) -> None:
+        with self._lock:
+            for point_id in ids:
+                position = self._positions.pop(self._point_id({"id": point_id}), None)
+                if position is not None:
+                    self._alive[position] = False
+                    self._dirty = True
+        self._save()
+
+    def delete_where(self, filter: dict, keep_ids: Optional[List] = None) -> None:
+        keep = {self._point_id({"id": i}) for i in keep_ids or []}
+        with self._lock:
+            for position in np.flatnonzero(self._alive):
+                if self._ids[position] not in keep and matches_filter(self._payloads[position], filter):
+                    self._alive[position] = False
+                    self._positions.pop(self._ids[position], None)
+                    self._dirty = True
+        self._save()
+
+    def reset(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._load()
+
+    def rebuild(self, populate, retention: Optional[int] = None) -> str:
+        """
+        Builds the new index in a sibling directory, then swaps directories and reloads
+        under the lock, so searches never see a partial index. Superseded versions are
+        not retained (retention is ignored).
+        """
+        generation = str(int(time.time() * 1000))
+        staging_dir = f"{self.directory}{VERSION_SEPARATOR}{generation}"
+        staging = NumpyVectorStore(f"{self.type}{VERSION_SEPARATOR}{generation}", self.embedder, directory=staging_dir)
+        try:
+            populate(staging)
+            staging.flush()
+            if not staging.has_data():
+                raise RuntimeError(f"Rebuild of {self.collection_name} produced no points")
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        retired = f"{self.directory}.retired"
+        with self._lock:
+            shutil.rmtree(retired, ignore_errors=True)
+            if os.path.exists(self.directory):
+                os.replace(self.directory, retired)
+            os.replace(staging_dir, self.directory)
+            self._load()
+            self.generation = generation
+        shutil.rmtree(retired, ignore_errors=True)
+        logger.info(f"Rebuilt {self.collection_name} ({len(self._ids)} points)")
+        return self.collection_name
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return bool(self._alive.any())
+
+
+_numpy_stores: Dict[str, NumpyVectorStore] = {}
+_numpy_stores_lock = threading.Lock()
+
+
+def create_vector_store(type: str, embedder, qdrant_location: Optional[str] = None, qdrant_api_key: Optional[str] = None):
+    """
+    Storage backend for a collection according to VECTOR_STORE.
+    NumPy stores are shared per collection within the process (like a server would be),
+    so concurrent tools see the same points.
+    """
+    kind = get_vector_store_kind()
+    if kind == "numpy":
+        with _numpy_stores_lock:
+            store = _numpy_stores.get(f"rag_{type}")
+            if store is None:
+                store = NumpyVectorStore(type, embedder)
+                _numpy_stores[store.collection_name] = store
+                # Points added without a final flush() are still written at exit
+                atexit.register(store.flush)
+            return store
+    return QdrantStorage(type=type, qdrant_location=qdrant_location, qdrant_api_key=qdrant_api_key, embedder=embedder)
@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from agentic_rag.tools.embedder_registry import DEFAULT_MODEL
+from agentic_rag.tools.embedding_backends import OnnxInt8Backend, SentenceTransformerBackend
+
+# Same gate as benchmarks/bench_embedder_backends.py --min-cosine
+MIN_COSINE = 0.98
+
+SENTENCES = [
+    "ผู้ควบคุมข้อมูลส่วนบุคคลต้องแจ้งวัตถุประสงค์ของการเก็บรวบรวมข้อมูลให้เจ้าของข้อมูลทราบ",
+    "เจ้าของข้อมูลส่วนบุคคลมีสิทธิถอนความยินยอมเมื่อใดก็ได้",
+    "ห้ามมิให้เก็บรวบรวมข้อมูลส่วนบุคคลเกี่ยวกับเชื้อชาติ ศาสนา หรือข้อมูลสุขภาพ โดยไม่ได้รับความยินยอมโดยชัดแจ้ง",
+    "มาตรา ๒๖ ข้อมูลอ่อนไหว",
+    "การส่งข้อมูลส่วนบุคคลไปยังต่างประเทศ",
+]
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    try:
+        reference = SentenceTransformerBackend(DEFAULT_MODEL)
+    except Exception as e:  # no network and no cached model
+        pytest.skip(f"cannot load {DEFAULT_MODEL}: {e}")
+    quantized = OnnxInt8Backend(DEFAULT_MODEL, model_dir=str(tmp_path_factory.mktemp("onnx")))
+    return reference, quantized
+
+
+def test_onnx_int8_matches_torch_on_thai(backends):
+    reference, quantized = backends
+    expected = reference.encode(SENTENCES)
+    actual = quantized.encode(SENTENCES)
+    assert actual.shape == expected.shape
+    expected = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+    actual = actual / np.linalg.norm(actual, axis=1, keepdims=True)
+    cosine = (expected * actual).sum(axis=1)
+    assert cosine.min() >= MIN_COSINE, f"min cosine {cosine.min():.4f} < {MIN_COSINE}"